@@ -0,0 +1,248 @@
+import heapq
+import os
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Tuple, Iterable, NamedTuple, Optional
+
+from columnar import to_epoch
+
+INF = float("inf")
+
+
+class RouteBucket:
+    """Pending cargo for one route, in allocation order
+
+    Two segment trees sit over the bucket: the minimum weight and the latest
+    deadline (as a rank) of each range of still-pending cargo. Searches skip
+    whole ranges that are too heavy or already past their deadline. The two
+    bounds can come from different items, so a range may pass both checks
+    without holding any item that passes both. A search then descends into it
+    and backtracks. That makes a search O(n) in the worst case. It is O(log n)
+    when every range that passes both checks holds a matching item, e.g. when
+    all of the route's pending cargo meets the flight's deadline.
+    """
+
+    __slots__ = ("cargo", "size", "weights", "deadlines", "deadline_order", "remaining")
+
+    def __init__(self, cargo: List):
+        self.cargo = cargo
+        self.remaining = len(cargo)
+        self.deadline_order = sorted({item.deadline for item in cargo})
+        ranks = {deadline: rank for rank, deadline in enumerate(self.deadline_order)}
+        size = 1
+        while size < max(len(cargo), 1):
+            size <<= 1
+        self.size = size
+        weights = [INF] * (2 * size)
+        deadlines = [-1] * (2 * size)
+        for i, item in enumerate(cargo):
+            weights[size + i] = item.weight
+            deadlines[size + i] = ranks[item.deadline]
+        for i in range(size - 1, 0, -1):
+            left, right = weights[2 * i], weights[2 * i + 1]
+            weights[i] = left if left <= right else right
+            left, right = deadlines[2 * i], deadlines[2 * i + 1]
+            deadlines[i] = left if left >= right else right
+        self.weights = weights
+        self.deadlines = deadlines
+
+    def min_weight(self) -> float:
+        """Smallest weight still waiting on this route"""
+        return self.weights[1]
+
+    def deadline_rank(self, arrival_time) -> int:
+        """Lowest deadline rank that still meets a flight arriving at arrival_time"""
+        return bisect_left(self.deadline_order, arrival_time)
+
+    def find_first(self, start: int, limit: float, min_rank: int = 0) -> int:
+        """Position of the first pending cargo at or after start that weighs at most
+        limit and has a deadline rank of at least min_rank, or -1"""
+        size = self.size
+        if start >= size:
+            return -1
+        weights, deadlines = self.weights, self.deadlines
+        i = start + size
+        while True:
+            if weights[i] <= limit and deadlines[i] >= min_rank:
+                if i >= size:
+                    return i - size
+                i <<= 1
+                continue
+            # Climb while we are a right child, then step to the right sibling
+            while i & 1:
+                i >>= 1
+            if i == 0:
+                return -1
+            i += 1
+
+    def remove(self, position: int):
+        """Mark the cargo at position as allocated"""
+        weights, deadlines = self.weights, self.deadlines
+        i = position + self.size
+        weights[i] = INF
+        deadlines[i] = -1
+        i >>= 1
+        while i:
+            left, right = weights[2 * i], weights[2 * i + 1]
+            weight = left if left <= right else right
+            left, right = deadlines[2 * i], deadlines[2 * i + 1]
+            deadline = left if left >= right else right
+            if weights[i] == weight and deadlines[i] == deadline:
+                break
+            weights[i] = weight
+            deadlines[i] = deadline
+            i >>= 1
+        self.remaining -= 1
+
+    def pending(self) -> List:
+        """Cargo on this route that has not been allocated, in allocation order"""
+        size, weights = self.size, self.weights
+        return [item for i, item in enumerate(self.cargo) if weights[size + i] != INF]
+
+
+def build_route_buckets(cargo_requests: Iterable) -> Dict[Tuple[str, str], RouteBucket]:
+    """Group cargo by (departure_airport, arrival_airport), ordered by priority then insertion"""
+    routes: Dict[Tuple[str, str], List] = {}
+    # sorted() is stable, so equal priorities keep their original order just like the scan did
+    for cargo in sorted(cargo_requests, key=lambda x: x.priority):
+        key = (cargo.departure_airport, cargo.arrival_airport)
+        bucket = routes.get(key)
+        if bucket is None:
+            routes[key] = [cargo]
+        else:
+            bucket.append(cargo)
+    return {key: RouteBucket(items) for key, items in routes.items()}
+
+
+def fill_flight(flight, bucket: RouteBucket) -> List:
+    """Greedily load one flight from its route bucket, removing what was loaded"""
+    loaded = []
+    available_capacity = flight.cargo_capacity
+    min_rank = bucket.deadline_rank(flight.arrival_time)
+    cargo = bucket.cargo
+    position = bucket.find_first(0, available_capacity, min_rank)
+    while position != -1:
+        item = cargo[position]
+        loaded.append(item)
+        available_capacity -= item.weight
+        bucket.remove(position)
+        if bucket.min_weight() > available_capacity:
+            break
+        position = bucket.find_first(position + 1, available_capacity, min_rank)
+    return loaded
+
+
+def allocate_greedy(flights: Iterable, cargo_requests: Iterable) -> Dict[str, List]:
+    """Priority-first greedy allocation, indexed by route
+
+    Produces the same result as scanning every cargo request for every flight,
+    but each flight only visits cargo on its own route, and whole ranges of it
+    that are too heavy for its remaining capacity or due before it lands are
+    skipped (see RouteBucket for the bound of each search).
+    """
+    buckets = build_route_buckets(cargo_requests)
+    allocation = {}
+    for flight in flights:
+        bucket = buckets.get((flight.departure_airport, flight.arrival_airport))
+        if bucket is None or bucket.remaining == 0:
+            allocation[flight.flight_number] = []
+            continue
+        allocation[flight.flight_number] = fill_flight(flight, bucket)
+    return allocation
+
+
+class _Leg(NamedTuple):
+    cargo_capacity: float
+    arrival_time: int  # epoch microseconds
+
+
+class _Item(NamedTuple):
+    position: int  # in the order the route's cargo was requested
+    weight: float
+    deadline: int  # epoch microseconds
+
+
+# One route packed for a worker process: flight indexes, their cargo capacities
+# and arrival times, then the route's cargo weights, deadlines and priorities
+PackedRoute = Tuple[array, array, array, array, array, array]
+
+
+def _allocate_packed(routes: List[PackedRoute]) -> List[Tuple[array, List[List[int]]]]:
+    """Greedy allocation of packed routes, as (flight indexes, cargo positions per flight)"""
+    results = []
+    for flight_indexes, capacities, arrivals, weights, deadlines, priorities in routes:
+        # Same order as build_route_buckets: priority, then insertion
+        order = sorted(range(len(weights)), key=priorities.__getitem__)
+        bucket = RouteBucket([_Item(position, weights[position], deadlines[position]) for position in order])
+        loads = []
+        for capacity, arrival in zip(capacities, arrivals):
+            if bucket.remaining == 0:
+                loads.append([])
+                continue
+            loads.append([item.position for item in fill_flight(_Leg(capacity, arrival), bucket)])
+        results.append((flight_indexes, loads))
+    return results
+
+
+def allocate_parallel(flights: Iterable, cargo_requests: Iterable, workers: Optional[int] = None,
+                      partitions_per_worker: int = 4) -> Dict[str, List]:
+    """allocate_greedy spread over a process pool, with identical results
+
+    Cargo can only go on flights of its own route, so routes are allocated
+    independently: they are packed into typed arrays (no records are pickled)
+    and sorted by priority in the workers,
+    shared out largest first between workers * partitions_per_worker
+    partitions, and the loads are merged back in flight order.
+    """
+    flights = flights if isinstance(flights, list) else list(flights)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        return allocate_greedy(flights, cargo_requests)
+
+    route_cargo: Dict[Tuple[str, str], List] = {}
+    for cargo in cargo_requests:
+        route_cargo.setdefault((cargo.departure_airport, cargo.arrival_airport), []).append(cargo)
+    route_flights: Dict[Tuple[str, str], List[int]] = {}
+    for index, flight in enumerate(flights):
+        key = (flight.departure_airport, flight.arrival_airport)
+        if key in route_cargo:
+            route_flights.setdefault(key, []).append(index)
+
+    packed = []
+    for key, indexes in route_flights.items():
+        cargo_list = route_cargo[key]
+        packed.append((len(indexes) + len(cargo_list), key, (
+            array("q", indexes),
+            array("d", (flights[i].cargo_capacity for i in indexes)),
+            array("q", (to_epoch(flights[i].arrival_time) for i in indexes)),
+            array("d", (cargo.weight for cargo in cargo_list)),
+            array("q", (to_epoch(cargo.deadline) for cargo in cargo_list)),
+            array("b", (cargo.priority for cargo in cargo_list))
+        )))
+
+    # Longest processing time first: each route goes to the lightest partition so far
+    count = min(len(packed), workers * partitions_per_worker)
+    partitions = [[] for _ in range(count)]
+    partition_keys = [[] for _ in range(count)]
+    heap = [(0, number) for number in range(count)]
+    for size, key, route in sorted(packed, key=lambda entry: (-entry[0], entry[1])):
+        load, number = heapq.heappop(heap)
+        partitions[number].append(route)
+        partition_keys[number].append(key)
+        heapq.heappush(heap, (load + size, number))
+
+    loads: List[Optional[List]] = [None] * len(flights)
+    if partitions:
+        with ProcessPoolExecutor(max_workers=min(workers, count)) as pool:
+            for keys, results in zip(partition_keys, pool.map(_allocate_packed, partitions)):
+                for key, (flight_indexes, positions) in zip(keys, results):
+                    cargo_list = route_cargo[key]
+                    for index, flight_positions in zip(flight_indexes, positions):
+                        loads[index] = [cargo_list[position] for position in flight_positions]
+
+    # Built in flight order so duplicate flight numbers resolve as in allocate_greedy
+    allocation = {}
+    for index, flight in enumerate(flights):
+        allocation[flight.flight_number] = loads[index] or []
+    return allocation
@@ -0,0 +1,88 @@
+from typing import List, Dict, Tuple
+
+import numpy as np
+
+from columnar import FlightColumns, CargoColumns
+from rotations import fleet_suggestions
+
+# Threshold behind the cargo utilization suggestions
+CARGO_UTILIZATION_THRESHOLD = 0.5
+
+
+def column(values, dtype) -> np.ndarray:
+    """Zero-copy NumPy view of a typed array column"""
+    return np.frombuffer(values, dtype=dtype) if len(values) else np.zeros(0, dtype=dtype)
+
+
+def flights_per_aircraft(flights: FlightColumns) -> Dict[str, int]:
+    """Number of flights scheduled for each aircraft type"""
+    counts = np.bincount(column(flights.aircraft_type, np.uint16), minlength=len(flights.codes))
+    return {flights.codes.name(code): int(count) for code, count in enumerate(counts) if count}
+
+
+def airport_movements(flights: FlightColumns) -> Dict[str, int]:
+    """Departures plus arrivals at each airport"""
+    size = len(flights.codes)
+    counts = (np.bincount(column(flights.departure_airport, np.uint16), minlength=size) +
+              np.bincount(column(flights.arrival_airport, np.uint16), minlength=size))
+    return {flights.codes.name(code): int(count) for code, count in enumerate(counts) if count}
+
+
+def _route_totals(departures: np.ndarray, arrivals: np.ndarray, weights: np.ndarray,
+                  size: int) -> np.ndarray:
+    route = departures.astype(np.int64) * size + arrivals
+    return np.bincount(route, weights=weights, minlength=size * size)
+
+
+def route_demand_vs_capacity(flights: FlightColumns,
+                             cargo: CargoColumns) -> Dict[Tuple[str, str], Tuple[float, float]]:
+    """(cargo weight requested, cargo capacity flown) per (departure, arrival) route"""
+    size = len(flights.codes)
+    capacity = _route_totals(column(flights.departure_airport, np.uint16),
+                             column(flights.arrival_airport, np.uint16),
+                             column(flights.cargo_capacity, np.float64), size)
+    demand = _route_totals(column(cargo.departure_airport, np.uint16),
+                           column(cargo.arrival_airport, np.uint16),
+                           column(cargo.weight, np.float64), size)
+    name = flights.codes.name
+    return {(name(route // size), name(route % size)): (float(demand[route]), float(capacity[route]))
+            for route in np.flatnonzero((demand > 0) | (capacity > 0))}
+
+
+def flight_loads(flights: FlightColumns, allocation: Dict[str, List]) -> np.ndarray:
+    """Allocated cargo weight per flight, in flight order"""
+    numbers = flights.flight_number
+    counts = np.fromiter((len(allocation.get(number, ())) for number in numbers),
+                         dtype=np.int64, count=len(numbers))
+    weights = np.fromiter((cargo.weight for number in numbers for cargo in allocation.get(number, ())),
+                          dtype=np.float64, count=int(counts.sum()))
+    owner = np.repeat(np.arange(len(numbers)), counts)
+    return np.bincount(owner, weights=weights, minlength=len(numbers))
+
+
+def load_factors(flights: FlightColumns, allocation: Dict[str, List]) -> np.ndarray:
+    """Share of each flight's cargo capacity that is allocated"""
+    capacity = column(flights.cargo_capacity, np.float64)
+    loads = flight_loads(flights, allocation)
+    return np.divide(loads, capacity, out=np.zeros_like(loads), where=capacity > 0)
+
+
+def suggest_improvements(flights: FlightColumns, fleet_report: Dict[str, Dict[str, int]],
+                         allocation: Dict[str, List]) -> List[str]:
+    """The expert system's schedule suggestions, evaluated on columns
+
+    fleet_report is TailAssignment.fleet_report for the same flights.
+    """
+    # Check fleet utilization
+    suggestions = fleet_suggestions(fleet_report)
+
+    # Check cargo capacity utilization
+    capacity = column(flights.cargo_capacity, np.float64)
+    loads = flight_loads(flights, allocation)
+    in_allocation = np.fromiter((number in allocation for number in flights.flight_number),
+                                dtype=bool, count=len(flights))
+    low = np.flatnonzero(in_allocation & (loads < capacity * CARGO_UTILIZATION_THRESHOLD))
+    for index in low:
+        suggestions.append(f"Flight {flights.flight_number[index]} has low cargo capacity utilization")
+
+    return suggestions
@@ -0,0 +1,407 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Optional, Iterator
+
+import profiling
+from importer import iter_rows, parse_flight
+from optimizer import allocation_objective
+
+DEFAULT_DATABASE = "airline_scheduling"
+
+
+@dataclass
+class Scenario:
+    """One independent scheduling run over a window of the schedule"""
+    name: str
+    departure_from: Optional[datetime] = None
+    departure_until: Optional[datetime] = None
+    airports: Optional[List[str]] = None
+    mode: str = "greedy"  # allocation mode, "greedy", "parallel" or "optimal"
+    time_budget: float = 5.0  # seconds, for the optimal mode
+    proposed: Optional[str] = None  # CSV / JSON-lines file of flights to check against the window
+    route: bool = False  # also route leftover cargo over connecting flights
+    max_legs: int = 2
+    columnar: bool = False
+    save_plan: bool = False  # store the allocation as a versioned plan
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Scenario":
+        """Build a scenario from JSON; times are ISO 8601, or hours from now via "hours" """
+        data = dict(data)
+        hours = data.pop("hours", None)
+        if hours is not None:
+            data.setdefault("departure_from", datetime.now())
+            data.setdefault("departure_until", datetime.now() + timedelta(hours=hours))
+        for field in ("departure_from", "departure_until"):
+            if isinstance(data.get(field), str):
+                data[field] = datetime.fromisoformat(data[field])
+        return cls(**data)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialise {type(value).__name__}")
+
+
+def fleet_overcommitment(expert_system, fleet_data: Dict[str, int]) -> Dict[str, Dict[str, int]]:
+    """Aircraft types with more flights airborne at once than aircraft in the fleet"""
+    overcommitted = {}
+    for aircraft_type, departures in expert_system.flight_index.departures.items():
+        windows = expert_system.flight_index.windows[aircraft_type]
+        if not windows:
+            continue
+        end = max(arrival for _, arrival, _ in windows)
+        peak = expert_system.flight_index.max_concurrent(aircraft_type, departures[0], end)
+        if peak > fleet_data.get(aircraft_type, 0):
+            overcommitted[aircraft_type] = {"peak": peak, "fleet": fleet_data.get(aircraft_type, 0)}
+    return overcommitted
+
+
+def allocation_workers(scenario_workers: int) -> int:
+    """Processes the "parallel" mode may use in each of scenario_workers concurrent scenarios
+
+    The CPUs are shared out so nested pools never run more processes than
+    there are CPUs; a budget of one allocates serially in the scenario's
+    own process.
+    """
+    return max(1, (os.cpu_count() or 1) // max(scenario_workers, 1))
+
+
+def run_scenario(scenario: Scenario, connection_string: Optional[str] = None,
+                 database_name: str = DEFAULT_DATABASE, columns: bool = False, metrics: bool = False,
+                 workers: Optional[int] = None) -> Dict:
+    """Load a scenario's window, check it, allocate cargo and collect suggestions
+
+    Runs in its own process when called from run_scenarios, so it opens its
+    own connection. connection_string is a storage URL (see
+    storage.open_storage); with memory:// each run starts from an empty
+    store. The result is JSON-serialisable; with columns the allocation is
+    given as parallel per-field lists instead of per flight. With metrics
+    the result carries the run's profiling.metrics snapshot under "metrics".
+    workers caps the processes of the "parallel" mode (default: one per
+    CPU); run_scenarios and serve pass allocation_workers so scenario pools
+    and allocation pools together stay within the CPUs.
+    """
+    # Imported here so the parent process never opens a database connection before forking
+    from expert_system import AirlineSchedulingExpertSystem
+
+    if metrics:
+        profiling.metrics.reset()
+        profiling.enable()
+    timings = {}
+    started = time.perf_counter()
+
+    def stage(name: str):
+        nonlocal started
+        now = time.perf_counter()
+        timings[name] = now - started
+        started = now
+
+    expert_system = AirlineSchedulingExpertSystem(columnar=scenario.columnar, connection_string=connection_string,
+                                                  database_name=database_name, load=False)
+    try:
+        stage("connect")
+        expert_system.load_data(scenario.departure_from, scenario.departure_until, scenario.airports)
+        stage("load")
+
+        fleet_data = expert_system.get_fleet_data()
+        feasibility = {
+            "congested_slots": expert_system.slot_congestion_report(),
+            "overcommitted_fleet": fleet_overcommitment(expert_system, fleet_data),
+            "aircraft_required": expert_system.fleet_requirements(),
+        }
+        if scenario.proposed:
+            proposed = [parse_flight(row) for row in iter_rows(scenario.proposed)]
+            errors = expert_system.flights_feasibility_errors(proposed)
+            feasibility["proposed"] = [{"flight_number": flight.flight_number, "feasible": error is None,
+                                        "error": error} for flight, error in zip(proposed, errors)]
+        stage("feasibility")
+
+        allocation = expert_system.optimize_cargo_allocation(scenario.mode, scenario.time_budget, workers)
+        stage("optimize")
+
+        suggestions = expert_system.suggest_improvements()
+        stage("suggestions")
+
+        result = {
+            "scenario": scenario.name,
+            "parameters": asdict(scenario),
+            "flights": len(expert_system.flights),
+            "cargo": len(expert_system.cargo_requests),
+            "allocated_cargo": sum(len(cargo_list) for cargo_list in allocation.values()),
+            "objective": allocation_objective(allocation),
+            "feasibility": feasibility,
+            "suggestions": suggestions,
+        }
+        if columns:
+            result["allocation"] = {
+                "flight_number": [number for number, cargo_list in allocation.items() for _ in cargo_list],
+                "cargo_id": [cargo.cargo_id for cargo_list in allocation.values() for cargo in cargo_list],
+                "weight": [cargo.weight for cargo_list in allocation.values() for cargo in cargo_list],
+                "priority": [cargo.priority for cargo_list in allocation.values() for cargo in cargo_list],
+            }
+        else:
+            result["allocation"] = {number: [cargo.cargo_id for cargo in cargo_list]
+                                    for number, cargo_list in allocation.items() if cargo_list}
+
+        if scenario.save_plan:
+            result["plan_version"] = expert_system.db.save_allocation_plan(
+                allocation, scenario.mode, result["objective"], dict(timings), scenario.name)
+            stage("save_plan")
+
+        if scenario.route:
+            itineraries = expert_system.route_cargo(scenario.max_legs)
+            result["itineraries"] = {cargo_id: [flight.flight_number for flight in flights]
+                                     for cargo_id, flights in itineraries.items()}
+            stage("route")
+    finally:
+        expert_system.close()
+
+    result["timings"] = timings
+    result["total_time"] = sum(timings.values())
+    if metrics:
+        result["metrics"] = profiling.metrics.snapshot()
+    return result
+
+
+def _failed(scenario: Scenario, error: Exception) -> Dict:
+    return {"scenario": scenario.name, "error": f"{type(error).__name__}: {error}"}
+
+
+def run_scenarios(scenarios: List[Scenario], workers: int = 1, connection_string: Optional[str] = None,
+                  database_name: str = DEFAULT_DATABASE, columns: bool = False,
+                  metrics: bool = False) -> Iterator[Dict]:
+    """Run scenarios in a pool of worker processes, yielding each result as it finishes
+
+    A scenario that fails yields a record with an "error" field instead of
+    stopping the others.
+    """
+    if workers <= 1:
+        for scenario in scenarios:
+            try:
+                yield run_scenario(scenario, connection_string, database_name, columns, metrics)
+            except Exception as e:
+                yield _failed(scenario, e)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_scenario, scenario, connection_string, database_name, columns,
+                               metrics, allocation_workers(workers)): scenario
+                   for scenario in scenarios}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                yield _failed(futures[future], e)
+
+
+def run_what_ifs(path: str, hours: Optional[float] = None, airports: Optional[List[str]] = None,
+                 connection_string: Optional[str] = None, database_name: str = DEFAULT_DATABASE,
+                 workers: int = 1) -> List[Dict]:
+    """Evaluate the what-if scenarios in a JSON-lines file against one load of the schedule
+
+    Each line names a scenario and its changes, e.g. {"name": "more 777s",
+    "add_aircraft": {"Boeing 777": 3}} (see whatif.WhatIf.apply). Every
+    scenario forks the same snapshot; the unchanged schedule comes first as
+    "base". The storage is closed before the workers are forked.
+    """
+    from expert_system import AirlineSchedulingExpertSystem
+    from whatif import evaluate_all
+
+    expert_system = AirlineSchedulingExpertSystem(connection_string=connection_string,
+                                                  database_name=database_name, load=False)
+    try:
+        if hours is not None:
+            expert_system.load_upcoming(hours, airports)
+        else:
+            expert_system.load_data(airports=airports)
+        snapshot = expert_system.snapshot()
+    finally:
+        expert_system.close()
+    scenarios = [snapshot.fork("base")]
+    for number, row in enumerate(iter_rows(path), 1):
+        name = row.get("name", f"what-if {number}")
+        try:
+            scenarios.append(snapshot.fork(name).apply(row))
+        except ValueError as e:
+            raise ValueError(f"{name}: {e}") from e
+    return evaluate_all(scenarios, workers)
+
+
+def load_scenarios(path: str) -> List[Scenario]:
+    """Scenarios from a JSON-lines file, one object per line"""
+    return [Scenario.from_dict(row) for row in iter_rows(path)]
+
+
+def serve(port: int, workers: int, connection_string: str, database_name: str):
+    """Serve scheduling runs over HTTP until interrupted
+
+    POST /run with a scenario object, or a list of them, returns the results
+    as a JSON list. GET /health returns {"status": "ok"}.
+    """
+    pool = ProcessPoolExecutor(max_workers=workers)
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, body):
+            payload = json.dumps(body, default=_json_default).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._reply(200, {"status": "ok"})
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/run":
+                self._reply(404, {"error": "not found"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                scenarios = [Scenario.from_dict(item) for item in (body if isinstance(body, list) else [body])]
+            except (ValueError, TypeError) as e:
+                self._reply(400, {"error": str(e)})
+                return
+            futures = [pool.submit(run_scenario, scenario, connection_string, database_name,
+                                   workers=allocation_workers(workers))
+                       for scenario in scenarios]
+            results = []
+            for scenario, future in zip(scenarios, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append(_failed(scenario, e))
+            self._reply(200, results)
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    print(f"Serving scheduling runs on http://127.0.0.1:{port}/run", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.shutdown(cancel_futures=True)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Run scheduling scenarios without the GUI")
+    parser.add_argument("--scenarios", help="JSON-lines file of scenarios; without it one scenario "
+                                            "is built from the options below")
+    parser.add_argument("--name", default="default")
+    parser.add_argument("--hours", type=float, help="only flights departing in the next HOURS hours")
+    parser.add_argument("--airports", nargs="+")
+    parser.add_argument("--mode", choices=["greedy", "parallel", "optimal"], default="greedy")
+    parser.add_argument("--time-budget", type=float, default=5.0)
+    parser.add_argument("--proposed", help="CSV / JSON-lines file of flights to check")
+    parser.add_argument("--route", action="store_true", help="also route leftover cargo over connections")
+    parser.add_argument("--save-plan", action="store_true", help="store each allocation as a versioned plan")
+    parser.add_argument("--diff-plans", type=int, nargs=2, metavar=("OLD", "NEW"),
+                        help="print what changed between two stored plans instead")
+    parser.add_argument("--what-if", metavar="FILE",
+                        help="JSON-lines file of changes to compare against the schedule window instead "
+                             "(one load, forked per line)")
+    parser.add_argument("--workers", type=int, default=1, help="scenarios run in parallel processes")
+    parser.add_argument("--output", default="-", help="JSON-lines output file (default stdout)")
+    parser.add_argument("--format", choices=["jsonl", "columns"], default="jsonl",
+                        help="columns writes each allocation as parallel per-field lists")
+    parser.add_argument("--storage", "--mongo", dest="storage",
+                        help="storage URL: mongodb://..., sqlite:///file.db or memory:// "
+                             "(default $AIRLINE_SCHEDULING_STORAGE, else local MongoDB)")
+    parser.add_argument("--database", default=DEFAULT_DATABASE)
+    parser.add_argument("--serve", type=int, metavar="PORT", help="serve runs over HTTP instead")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="time each stage and write the totals to FILE (.prom for Prometheus text, else JSON)")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="profile the run into FILE (runs scenarios in this process, ignoring --workers)")
+    parser.add_argument("--profile-mode", choices=["cprofile", "sample"], default="cprofile",
+                        help="cProfile stats (for pstats) or sampled stacks (for flame graphs)")
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args.serve, max(args.workers, 1), args.storage, args.database)
+        return
+
+    if args.diff_plans:
+        from storage import open_storage
+        db = open_storage(args.storage, database_name=args.database)
+        try:
+            started = time.perf_counter()
+            diff = db.diff_allocation_plans(*args.diff_plans)
+            print(json.dumps({"old": args.diff_plans[0], "new": args.diff_plans[1], "summary": diff.summary(),
+                              "added": diff.added, "removed": diff.removed, "moved": diff.moved}))
+            print(f"diff in {time.perf_counter() - started:.3f}s", file=sys.stderr)
+        finally:
+            db.close()
+        return
+
+    if args.what_if:
+        from whatif import comparison_table
+        started = time.perf_counter()
+        results = run_what_ifs(args.what_if, args.hours, args.airports, args.storage, args.database,
+                               max(args.workers, 1))
+        output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+        try:
+            for result in results:
+                output.write(json.dumps(result, default=_json_default) + "\n")
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        print(comparison_table(results), file=sys.stderr)
+        print(f"{len(results)} what-ifs in {time.perf_counter() - started:.3f}s", file=sys.stderr)
+        return
+
+    if args.scenarios:
+        scenarios = load_scenarios(args.scenarios)
+    else:
+        scenarios = [Scenario.from_dict({
+            "name": args.name, "hours": args.hours, "airports": args.airports, "mode": args.mode,
+            "time_budget": args.time_budget, "proposed": args.proposed, "route": args.route,
+            "save_plan": args.save_plan
+        })]
+
+    workers = 1 if args.profile else args.workers
+    profiler = profiling.Profiler(args.profile_mode) if args.profile else None
+    totals = profiling.Metrics(enabled=True)
+    started = time.perf_counter()
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    if profiler is not None:
+        profiler.start()
+    try:
+        for result in run_scenarios(scenarios, workers, args.storage, args.database,
+                                    args.format == "columns", bool(args.metrics)):
+            if "metrics" in result:
+                totals.merge(result["metrics"])
+            output.write(json.dumps(result, default=_json_default) + "\n")
+            output.flush()
+            if "error" in result:
+                print(f"{result['scenario']}: failed, {result['error']}", file=sys.stderr)
+            else:
+                stages = ", ".join(f"{name} {seconds:.3f}s" for name, seconds in result["timings"].items())
+                print(f"{result['scenario']}: {stages}", file=sys.stderr)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if profiler is not None:
+            profiler.stop()
+            profiler.dump(args.profile)
+    print(f"{len(scenarios)} scenarios in {time.perf_counter() - started:.3f}s", file=sys.stderr)
+    if args.metrics:
+        totals.export(args.metrics)
+        print(totals.report(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,453 @@
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from typing import List, Dict, Tuple
+
+from database import Flight, Cargo, DatabaseHandler
+from allocation import allocate_greedy, allocate_parallel
+from optimizer import allocation_objective, solve_allocation
+from routing import CargoRouter
+from flight_index import AircraftIntervalIndex
+from columnar import FlightColumns, CargoColumns
+from synthetic import NetworkSpec, generate_schedule, generate_demand
+
+# Suite scales: network size, flights per bank and cargo requests
+SUITE_SCALES = {
+    "small": (NetworkSpec(airports=10, hubs=1, flights_per_bank=10), 10000),
+    "medium": (NetworkSpec(airports=40, hubs=3, flights_per_bank=40), 100000),
+    "large": (NetworkSpec(airports=120, hubs=6, flights_per_bank=120, days=14), 1000000),
+}
+
+AIRPORTS = ["Mumbai", "Delhi", "Pune", "Chennai"]
+AIRCRAFT = {"Boeing 737": 20.0, "Airbus A320": 16.0, "Boeing 777": 60.0}
+
+
+def make_airports(count: int) -> List[str]:
+    """Airport names for a synthetic network of count airports"""
+    return AIRPORTS[:count] if count <= len(AIRPORTS) else [f"AP{i:03d}" for i in range(count)]
+
+
+def generate_flights(count: int, seed: int = 1, start: datetime = None,
+                     airports: List[str] = AIRPORTS) -> List[Flight]:
+    """Generate random flights between airports"""
+    rng = random.Random(seed)
+    start = start or datetime(2024, 1, 1)
+    flights = []
+    for i in range(count):
+        departure, arrival = rng.sample(airports, 2)
+        aircraft = rng.choice(list(AIRCRAFT))
+        departure_time = start + timedelta(minutes=rng.randrange(30 * 24 * 60))
+        flights.append(Flight(
+            flight_number=f"BM{i:07d}",
+            departure_airport=departure,
+            arrival_airport=arrival,
+            departure_time=departure_time,
+            arrival_time=departure_time + timedelta(minutes=rng.randrange(60, 240)),
+            aircraft_type=aircraft,
+            capacity=180,
+            cargo_capacity=AIRCRAFT[aircraft]
+        ))
+    return flights
+
+
+def generate_cargo(count: int, seed: int = 2, start: datetime = None,
+                   airports: List[str] = AIRPORTS) -> List[Cargo]:
+    """Generate random cargo requests between airports"""
+    rng = random.Random(seed)
+    start = start or datetime(2024, 1, 1)
+    cargo_list = []
+    for i in range(count):
+        departure, arrival = rng.sample(airports, 2)
+        cargo_list.append(Cargo(
+            cargo_id=f"BC{i:08d}",
+            weight=round(rng.uniform(0.1, 8.0), 2),
+            departure_airport=departure,
+            arrival_airport=arrival,
+            priority=rng.randint(1, 5),
+            deadline=start + timedelta(minutes=rng.randrange(2 * 24 * 60, 32 * 24 * 60))
+        ))
+    return cargo_list
+
+
+def scan_allocation(flights: List[Flight], cargo_requests: List[Cargo]) -> Dict[str, List[Cargo]]:
+    """The original flights x cargo scan, kept as the reference for comparisons"""
+    allocation = {}
+    unallocated_cargo = cargo_requests.copy()
+    unallocated_cargo.sort(key=lambda x: x.priority)
+    for flight in flights:
+        available_capacity = flight.cargo_capacity
+        allocation[flight.flight_number] = []
+        for cargo in unallocated_cargo[:]:
+            if (cargo.departure_airport == flight.departure_airport and
+                cargo.arrival_airport == flight.arrival_airport and
+                cargo.weight <= available_capacity and
+                cargo.deadline >= flight.arrival_time):
+                allocation[flight.flight_number].append(cargo)
+                available_capacity -= cargo.weight
+                unallocated_cargo.remove(cargo)
+    return allocation
+
+
+def same_allocation(left: Dict[str, List[Cargo]], right: Dict[str, List[Cargo]]) -> bool:
+    """Compare two allocations by cargo ID"""
+    if left.keys() != right.keys():
+        return False
+    return all([c.cargo_id for c in left[k]] == [c.cargo_id for c in right[k]] for k in left)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_allocation(sizes: List[int], max_scan: int):
+    print(f"{'cargo':>10} {'flights':>8} {'indexed (s)':>12} {'scan (s)':>10} {'match':>6}")
+    for size in sizes:
+        flights = generate_flights(max(100, size // 20))
+        cargo_list = generate_cargo(size)
+        indexed, indexed_time = timed(allocate_greedy, flights, cargo_list)
+        scan_time, match = "-", "-"
+        if size <= max_scan:
+            scanned, elapsed = timed(scan_allocation, flights, cargo_list)
+            scan_time = f"{elapsed:.3f}"
+            match = "yes" if same_allocation(indexed, scanned) else "NO"
+        print(f"{size:>10} {len(flights):>8} {indexed_time:>12.3f} {scan_time:>10} {match:>6}")
+
+
+def bench_parallel(cargo_count: int, workers: List[int], airport_count: int = 40):
+    """Compare process-pool allocation with the serial greedy allocation it must match"""
+    airports = make_airports(airport_count)
+    flights = generate_flights(max(100, cargo_count // 20), airports=airports)
+    cargo_list = generate_cargo(cargo_count, airports=airports)
+    serial, serial_time = timed(allocate_greedy, flights, cargo_list)
+    print(f"parallel: {cargo_count} cargo, {len(flights)} flights, serial {serial_time:.3f}s")
+    for count in workers:
+        parallel, elapsed = timed(allocate_parallel, flights, cargo_list, count)
+        match = "yes" if same_allocation(parallel, serial) and list(parallel) == list(serial) else "NO"
+        print(f"  {count:>3} workers {elapsed:>8.3f}s  speedup {serial_time / elapsed:>5.2f}x  match {match}")
+
+
+def bench_feasibility(scheduled: int, proposed: int):
+    """Time conflict checks for a batch of proposed flights against the indexed schedule"""
+    fleet_data = {aircraft: 60 for aircraft in AIRCRAFT}
+    index, build_time = timed(AircraftIntervalIndex, generate_flights(scheduled))
+    batch = generate_flights(proposed, seed=3)
+    start = time.perf_counter()
+    accepted = sum(index.has_capacity(f.aircraft_type, f.departure_time, f.arrival_time,
+                                      fleet_data[f.aircraft_type]) for f in batch)
+    elapsed = time.perf_counter() - start
+    print(f"feasibility: {proposed} proposed vs {scheduled} scheduled, "
+          f"index {build_time:.3f}s, checks {elapsed:.3f}s, {accepted} within fleet")
+
+
+def bench_solver(schedules: List[Tuple[int, int]], time_budget: float):
+    """Compare the solver's objective and run time with the greedy baseline"""
+    print(f"{'flights':>8} {'cargo':>8} {'greedy obj':>12} {'greedy (s)':>10} "
+          f"{'solver obj':>12} {'solver (s)':>10} {'gain':>7}")
+    for flight_count, cargo_count in schedules:
+        flights = generate_flights(flight_count)
+        cargo_list = generate_cargo(cargo_count)
+        greedy, greedy_time = timed(allocate_greedy, flights, cargo_list)
+        greedy_objective = allocation_objective(greedy)
+        result = solve_allocation(flights, cargo_list, time_budget)
+        gain = (result.objective / greedy_objective - 1) * 100 if greedy_objective else 0.0
+        print(f"{flight_count:>8} {cargo_count:>8} {greedy_objective:>12.1f} {greedy_time:>10.3f} "
+              f"{result.objective:>12.1f} {result.solve_time:>10.3f} {gain:>6.2f}%")
+
+
+def bench_routing(flight_count: int, cargo_count: int, airport_count: int, max_legs: int = 2):
+    """Time multi-leg routing of a cargo batch over a synthetic network"""
+    airports = make_airports(airport_count)
+    flights = generate_flights(flight_count, airports=airports)
+    cargo_list = generate_cargo(cargo_count, airports=airports)
+    router, build_time = timed(CargoRouter, flights)
+    router.max_legs = max_legs
+    itineraries, route_time = timed(router.route_all, cargo_list)
+    connecting = sum(1 for legs in itineraries.values() if len(legs) > 1)
+    print(f"routing: {cargo_count} cargo over {flight_count} flights / {airport_count} airports, "
+          f"index {build_time:.3f}s, routing {route_time:.3f}s, "
+          f"{len(itineraries)} routed ({connecting} connecting)")
+
+
+def benchmark_client(mongo_uri: str = None):
+    """A MongoClient for mongo_uri, or an in-process mongomock client when none is given"""
+    if mongo_uri:
+        from pymongo import MongoClient
+        return MongoClient(mongo_uri)
+    try:
+        import mongomock
+    except ImportError:
+        return None
+    return mongomock.MongoClient()
+
+
+def bench_mongo_lookups(count: int, mongo_uri: str = None, probes: int = 1000):
+    """Lookup and delete latency by flight_number, with and without indexes"""
+    client = benchmark_client(mongo_uri)
+    if client is None:
+        print("mongo: skipped (pass --mongo URI or install mongomock)")
+        return
+    database_name = "airline_scheduling_benchmark"
+    client.drop_database(database_name)
+    db = DatabaseHandler(client=client, database_name=database_name)
+    flights = generate_flights(count)
+    _, insert_time = timed(db.add_flights_bulk, flights, 10000)
+    rng = random.Random(4)
+
+    def probe(label: str):
+        numbers = [flights[rng.randrange(count)].flight_number for _ in range(probes)]
+        start = time.perf_counter()
+        for number in numbers:
+            db.flights_collection.find_one({"flight_number": number})
+        lookup = (time.perf_counter() - start) / probes
+        start = time.perf_counter()
+        for number in numbers[:probes // 10]:
+            db.delete_flight(number)
+        delete = (time.perf_counter() - start) / max(probes // 10, 1)
+        print(f"  {label:<16} lookup {lookup * 1000:8.3f} ms   delete {delete * 1000:8.3f} ms")
+
+    print(f"mongo: {count} flights inserted in {insert_time:.1f}s")
+    probe("no indexes")
+    db.ensure_indexes()
+    probe("indexed")
+    client.drop_database(database_name)
+
+
+def git_revision() -> str:
+    """Current commit, so results can be tracked run over run"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_suite(scales: List[str], topologies: List[str], client, proposed: int = 1000,
+              time_budget: float = 2.0, storage: str = "mongo") -> List[Dict]:
+    """Time the expert system's main operations on synthetic networks
+
+    Every scale and topology gets a fresh database, seeded from the same
+    generator seeds, so runs are comparable. storage is "mongo" (a database
+    on client), "sqlite" (a file in a temporary directory) or "memory".
+    Returns one record per measurement.
+    """
+    from expert_system import AirlineSchedulingExpertSystem
+
+    revision = git_revision()
+    results = []
+    scratch = tempfile.TemporaryDirectory()
+    for scale in scales:
+        base_spec, cargo_count = SUITE_SCALES[scale]
+        for topology in topologies:
+            spec = replace(base_spec, topology=topology)
+            schedule = generate_schedule(spec)
+            generate_demand(schedule, cargo_count)
+            # Proposed flights come from a differently seeded schedule over the same airports
+            candidates = generate_schedule(replace(spec, seed=spec.seed + 100)).flights
+            candidates = [replace(flight, flight_number=f"PR{i:07d}")
+                          for i, flight in enumerate(candidates[:proposed])]
+
+            database_name = f"airline_scheduling_suite_{scale}_{topology}"
+            if storage == "mongo":
+                client.drop_database(database_name)
+                expert_system = AirlineSchedulingExpertSystem(client=client, database_name=database_name,
+                                                              load=False)
+            else:
+                url = f"sqlite:///{scratch.name}/{database_name}.db" if storage == "sqlite" else "memory://"
+                expert_system = AirlineSchedulingExpertSystem(connection_string=url, load=False)
+
+            def record(benchmark: str, seconds: float, operations: int = 1):
+                results.append({
+                    "benchmark": benchmark,
+                    "scale": scale,
+                    "topology": topology,
+                    "storage": storage,
+                    "flights": len(schedule.flights),
+                    "cargo": len(schedule.cargo),
+                    "operations": operations,
+                    "seconds": round(seconds, 6),
+                    "per_operation_ms": round(seconds / operations * 1000, 6),
+                    "revision": revision,
+                    "python": platform.python_version(),
+                    "timestamp": datetime.now().isoformat(timespec="seconds"),
+                })
+
+            db = expert_system.db
+            db.update_fleet(schedule.fleet)
+            db.update_airports(schedule.airport_capacity)
+            _, elapsed = timed(db.add_flights_bulk, schedule.flights, 10000)
+            record("bulk_insert_flights", elapsed, len(schedule.flights))
+            _, elapsed = timed(db.add_cargo_bulk, schedule.cargo, 10000)
+            record("bulk_insert_cargo", elapsed, len(schedule.cargo))
+
+            _, elapsed = timed(expert_system.load_data)
+            record("load_data", elapsed)
+
+            start = time.perf_counter()
+            for flight in candidates:
+                expert_system.check_flight_feasibility(flight)
+            record("check_flight_feasibility", time.perf_counter() - start, len(candidates))
+
+            _, elapsed = timed(expert_system.optimize_cargo_allocation, "greedy")
+            record("optimize_cargo_allocation_greedy", elapsed)
+            _, elapsed = timed(expert_system.optimize_cargo_allocation, "optimal", time_budget)
+            record("optimize_cargo_allocation_optimal", elapsed)
+
+            _, elapsed = timed(expert_system.suggest_improvements)
+            record("suggest_improvements", elapsed)
+
+            # One change, then the incremental greedy update for its route
+            expert_system.delete_cargo(schedule.cargo[0].cargo_id)
+            _, elapsed = timed(expert_system.optimize_cargo_allocation, "greedy")
+            record("reoptimize_after_delete", elapsed)
+
+            expert_system.close()
+            if storage == "mongo":
+                client.drop_database(database_name)
+    scratch.cleanup()
+    return results
+
+
+def _suite_key(entry: Dict) -> Tuple:
+    # Results from before storage backends were selectable ran on MongoDB
+    return entry["benchmark"], entry["scale"], entry["topology"], entry.get("storage", "mongo")
+
+
+def compare_results(results: List[Dict], baseline_path: str, threshold: float) -> List[str]:
+    """Measurements slower than threshold times the baseline file's, as messages"""
+    baseline = {}
+    with open(baseline_path, encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                entry = json.loads(line)
+                baseline[_suite_key(entry)] = entry
+    regressions = []
+    for entry in results:
+        previous = baseline.get(_suite_key(entry))
+        if previous and previous["per_operation_ms"] > 0:
+            ratio = entry["per_operation_ms"] / previous["per_operation_ms"]
+            if ratio > threshold:
+                regressions.append(f"{entry['benchmark']} ({entry['scale']}, {entry['topology']}, "
+                                   f"{entry.get('storage', 'mongo')}): "
+                                   f"{ratio:.2f}x slower than {previous['revision']}")
+    return regressions
+
+
+@dataclass
+class DictFlight:
+    """Flight as it was before slots, for memory comparisons"""
+    flight_number: str
+    departure_airport: str
+    arrival_airport: str
+    departure_time: datetime
+    arrival_time: datetime
+    aircraft_type: str
+    capacity: int
+    cargo_capacity: float
+
+
+def measure(build) -> int:
+    """Bytes still allocated after build() returns, keeping its result alive"""
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current
+
+
+def bench_memory(count: int):
+    """Per-record footprint of the record types and columnar stores"""
+    flights = generate_flights(count)
+    cargo_list = generate_cargo(count)
+
+    def as_dict_flights():
+        # Copy the timestamps so each record owns its values, as loaded records do
+        return [DictFlight(f.flight_number + "", f.departure_airport, f.arrival_airport,
+                           f.departure_time + timedelta(0), f.arrival_time + timedelta(0),
+                           f.aircraft_type, f.capacity, f.cargo_capacity) for f in flights]
+
+    def as_slotted_flights():
+        return [Flight(f.flight_number + "", f.departure_airport, f.arrival_airport,
+                       f.departure_time + timedelta(0), f.arrival_time + timedelta(0),
+                       f.aircraft_type, f.capacity, f.cargo_capacity) for f in flights]
+
+    def as_slotted_cargo():
+        return [Cargo(c.cargo_id + "", c.weight + 0.0, c.departure_airport, c.arrival_airport,
+                      c.priority, c.deadline + timedelta(0)) for c in cargo_list]
+
+    print(f"memory per record ({count} records, ID strings shared and not counted):")
+    for label, build in (("flight, dataclass with __dict__", as_dict_flights),
+                         ("flight, slotted dataclass", as_slotted_flights),
+                         ("flight, columnar", lambda: FlightColumns(flights)),
+                         ("cargo, slotted dataclass", as_slotted_cargo),
+                         ("cargo, columnar", lambda: CargoColumns(cargo_list))):
+        print(f"  {label:<34} {measure(build) / count:8.1f} bytes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Airline scheduling benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--max-scan", type=int, default=10000,
+                        help="largest cargo count to also run through the original scan")
+    parser.add_argument("--parallel-cargo", type=int, default=1000000,
+                        help="cargo requests for the process-pool allocation benchmark")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--scheduled", type=int, default=50000,
+                        help="flights already on the schedule for the feasibility benchmark")
+    parser.add_argument("--proposed", type=int, default=10000,
+                        help="proposed flights checked in the feasibility benchmark")
+    parser.add_argument("--memory-records", type=int, default=100000,
+                        help="records used to measure per-record memory")
+    parser.add_argument("--time-budget", type=float, default=5.0,
+                        help="solver time budget in seconds")
+    parser.add_argument("--mongo", metavar="URI",
+                        help="MongoDB to run the index benchmark against (default: mongomock)")
+    parser.add_argument("--mongo-records", type=int, default=1000000,
+                        help="flights inserted for the index benchmark")
+    parser.add_argument("--suite", action="store_true",
+                        help="run the end-to-end suite on synthetic networks instead, writing JSON lines")
+    parser.add_argument("--scales", nargs="+", choices=list(SUITE_SCALES), default=["small", "medium"])
+    parser.add_argument("--topologies", nargs="+", choices=["hub", "mesh"], default=["hub", "mesh"])
+    parser.add_argument("--storage", choices=["mongo", "sqlite", "memory"], default="mongo",
+                        help="storage backend the suite runs on")
+    parser.add_argument("--output", default="-", help="suite results file, appended to (default stdout)")
+    parser.add_argument("--baseline", help="earlier suite results to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="slowdown against the baseline reported as a regression")
+    args = parser.parse_args()
+
+    if args.suite:
+        client = benchmark_client(args.mongo) if args.storage == "mongo" else None
+        if client is None and args.storage == "mongo":
+            sys.exit("The suite needs mongomock (pip install -r requirements-dev.txt) or --mongo URI")
+        results = run_suite(args.scales, args.topologies, client, time_budget=args.time_budget,
+                            storage=args.storage)
+        output = sys.stdout if args.output == "-" else open(args.output, "a", encoding="utf-8")
+        for entry in results:
+            output.write(json.dumps(entry) + "\n")
+        if output is not sys.stdout:
+            output.close()
+        if args.baseline:
+            regressions = compare_results(results, args.baseline, args.threshold)
+            for message in regressions:
+                print(f"REGRESSION {message}", file=sys.stderr)
+            sys.exit(1 if regressions else 0)
+        sys.exit(0)
+
+    bench_allocation(args.sizes, args.max_scan)
+    bench_parallel(args.parallel_cargo, args.workers)
+    bench_feasibility(args.scheduled, args.proposed)
+    bench_memory(args.memory_records)
+    bench_solver([(100, 3000), (1000, 30000), (5000, 200000)], args.time_budget)
+    bench_routing(5000, 100000, 30)
+    bench_mongo_lookups(args.mongo_records, args.mongo)
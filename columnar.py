@@ -0,0 +1,264 @@
+from array import array
+from itertools import compress
+from datetime import datetime, timedelta
+from typing import List, Dict, Iterable, Iterator, Optional
+
+from database import Flight, Cargo
+
+# Timestamps are stored as integer microseconds since this epoch. Like the
+# rest of the system they are naive datetimes, as returned by MongoDB.
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def to_epoch(value: datetime) -> int:
+    """Microseconds since EPOCH for a naive datetime"""
+    return (value - EPOCH) // MICROSECOND
+
+
+def from_epoch(value: int) -> datetime:
+    """Inverse of to_epoch"""
+    return EPOCH + timedelta(microseconds=value)
+
+
+def _fits(typecode: str, value) -> bool:
+    """Whether value can be stored in an array of typecode"""
+    try:
+        array(typecode, [value])
+    except (OverflowError, TypeError):
+        return False
+    return True
+
+
+def _select(column, keep: List[bool]):
+    """The entries of a column (array or list) where keep is true, as a new column of the same kind"""
+    if isinstance(column, array):
+        return array(column.typecode, compress(column, keep))
+    return list(compress(column, keep))
+
+
+class CodeTable:
+    """Interns airport and aircraft names as small integer codes"""
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.codes: Dict[str, int] = {}
+
+    def code(self, name: str) -> int:
+        """Code for name, assigning a new one the first time it is seen"""
+        code = self.codes.get(name)
+        if code is None:
+            code = self.codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+    def name(self, code: int) -> str:
+        """Name behind a code"""
+        return self.names[code]
+
+    def __len__(self):
+        return len(self.names)
+
+
+class FlightColumns:
+    """Flights stored column by column in typed arrays
+
+    Behaves like the list of flights the expert system keeps: it supports
+    len(), iteration, indexing, append and del, materializing a Flight only
+    when one is read. Only this base list is compact: the indexes and the
+    incremental allocation built over it still hold Flight objects.
+    """
+
+    COLUMNS = ("flight_number", "departure_airport", "arrival_airport", "departure_time",
+               "arrival_time", "aircraft_type", "capacity", "cargo_capacity")
+
+    def __init__(self, flights: Iterable[Flight] = (), codes: CodeTable = None):
+        self.codes = codes if codes is not None else CodeTable()
+        self.flight_number: List[str] = []
+        self.departure_airport = array("H")
+        self.arrival_airport = array("H")
+        self.departure_time = array("q")
+        self.arrival_time = array("q")
+        self.aircraft_type = array("H")
+        self.capacity = array("i")
+        self.cargo_capacity = array("d")
+        self.extend(flights)
+
+    @staticmethod
+    def column_error(flight: Flight) -> Optional[str]:
+        """Why a flight does not fit the typed columns, or None if it does"""
+        if not _fits("i", flight.capacity):
+            return "capacity does not fit a 32-bit integer"
+        if not _fits("d", flight.cargo_capacity):
+            return "cargo capacity must be a number"
+        return None
+
+    def append(self, flight: Flight):
+        """Add a flight at the end"""
+        code = self.codes.code
+        self.flight_number.append(flight.flight_number)
+        self.departure_airport.append(code(flight.departure_airport))
+        self.arrival_airport.append(code(flight.arrival_airport))
+        self.departure_time.append(to_epoch(flight.departure_time))
+        self.arrival_time.append(to_epoch(flight.arrival_time))
+        self.aircraft_type.append(code(flight.aircraft_type))
+        self.capacity.append(flight.capacity)
+        self.cargo_capacity.append(flight.cargo_capacity)
+
+    def extend(self, flights: Iterable[Flight]):
+        for flight in flights:
+            self.append(flight)
+
+    def __len__(self):
+        return len(self.flight_number)
+
+    def position(self, flight_number: str) -> int:
+        """Index of the first flight numbered flight_number, or -1, without materializing any"""
+        try:
+            return self.flight_number.index(flight_number)
+        except ValueError:
+            return -1
+
+    def __getitem__(self, index: int) -> Flight:
+        name = self.codes.name
+        return Flight(
+            flight_number=self.flight_number[index],
+            departure_airport=name(self.departure_airport[index]),
+            arrival_airport=name(self.arrival_airport[index]),
+            departure_time=from_epoch(self.departure_time[index]),
+            arrival_time=from_epoch(self.arrival_time[index]),
+            aircraft_type=name(self.aircraft_type[index]),
+            capacity=self.capacity[index],
+            cargo_capacity=self.cargo_capacity[index]
+        )
+
+    def __delitem__(self, index: int):
+        for column in (self.flight_number, self.departure_airport, self.arrival_airport,
+                       self.departure_time, self.arrival_time, self.aircraft_type,
+                       self.capacity, self.cargo_capacity):
+            del column[index]
+
+    def __iter__(self) -> Iterator[Flight]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def expire(self, before: datetime) -> List[Flight]:
+        """Remove and return the flights departing before `before`, keeping the rest in order
+
+        Only the expired flights are materialized; the kept ones are copied
+        column by column.
+        """
+        cutoff = to_epoch(before)
+        keep = [time >= cutoff for time in self.departure_time]
+        if all(keep):
+            return []
+        flights = [self[index] for index, kept in enumerate(keep) if not kept]
+        for name in self.COLUMNS:
+            setattr(self, name, _select(getattr(self, name), keep))
+        return flights
+
+    def copy(self) -> "FlightColumns":
+        """An independent copy of the columns, sharing the code table"""
+        copy = FlightColumns(codes=self.codes)
+        for name in self.COLUMNS:
+            setattr(copy, name, getattr(self, name)[:])
+        return copy
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the numeric columns"""
+        return sum(column.itemsize * len(column) for column in (
+            self.departure_airport, self.arrival_airport, self.departure_time,
+            self.arrival_time, self.aircraft_type, self.capacity, self.cargo_capacity))
+
+
+class CargoColumns:
+    """Cargo requests stored column by column in typed arrays, list-like like FlightColumns"""
+
+    COLUMNS = ("cargo_id", "weight", "departure_airport", "arrival_airport", "priority", "deadline")
+
+    def __init__(self, cargo_list: Iterable[Cargo] = (), codes: CodeTable = None):
+        self.codes = codes if codes is not None else CodeTable()
+        self.cargo_id: List[str] = []
+        self.weight = array("d")
+        self.departure_airport = array("H")
+        self.arrival_airport = array("H")
+        self.priority = array("b")
+        self.deadline = array("q")
+        self.extend(cargo_list)
+
+    @staticmethod
+    def column_error(cargo: Cargo) -> Optional[str]:
+        """Why a cargo request does not fit the typed columns, or None if it does"""
+        if not _fits("d", cargo.weight):
+            return "weight must be a number"
+        if not _fits("b", cargo.priority):
+            return "priority does not fit an 8-bit integer"
+        return None
+
+    def append(self, cargo: Cargo):
+        """Add a cargo request at the end"""
+        code = self.codes.code
+        self.cargo_id.append(cargo.cargo_id)
+        self.weight.append(cargo.weight)
+        self.departure_airport.append(code(cargo.departure_airport))
+        self.arrival_airport.append(code(cargo.arrival_airport))
+        self.priority.append(cargo.priority)
+        self.deadline.append(to_epoch(cargo.deadline))
+
+    def extend(self, cargo_list: Iterable[Cargo]):
+        for cargo in cargo_list:
+            self.append(cargo)
+
+    def __len__(self):
+        return len(self.cargo_id)
+
+    def position(self, cargo_id: str) -> int:
+        """Index of the first request with cargo_id, or -1, without materializing any"""
+        try:
+            return self.cargo_id.index(cargo_id)
+        except ValueError:
+            return -1
+
+    def __getitem__(self, index: int) -> Cargo:
+        name = self.codes.name
+        return Cargo(
+            cargo_id=self.cargo_id[index],
+            weight=self.weight[index],
+            departure_airport=name(self.departure_airport[index]),
+            arrival_airport=name(self.arrival_airport[index]),
+            priority=self.priority[index],
+            deadline=from_epoch(self.deadline[index])
+        )
+
+    def __delitem__(self, index: int):
+        for column in (self.cargo_id, self.weight, self.departure_airport,
+                       self.arrival_airport, self.priority, self.deadline):
+            del column[index]
+
+    def __iter__(self) -> Iterator[Cargo]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def expire(self, before: datetime) -> List[Cargo]:
+        """Remove and return the requests due before `before`, keeping the rest in order"""
+        cutoff = to_epoch(before)
+        keep = [deadline >= cutoff for deadline in self.deadline]
+        if all(keep):
+            return []
+        cargo_list = [self[index] for index, kept in enumerate(keep) if not kept]
+        for name in self.COLUMNS:
+            setattr(self, name, _select(getattr(self, name), keep))
+        return cargo_list
+
+    def copy(self) -> "CargoColumns":
+        """An independent copy of the columns, sharing the code table"""
+        copy = CargoColumns(codes=self.codes)
+        for name in self.COLUMNS:
+            setattr(copy, name, getattr(self, name)[:])
+        return copy
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the numeric columns"""
+        return sum(column.itemsize * len(column) for column in (
+            self.weight, self.departure_airport, self.arrival_airport,
+            self.priority, self.deadline))
@@ -1,10 +1,20 @@
-from pymongo import MongoClient
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterable, Iterator, Tuple
 from dataclasses import dataclass
 
+import profiling
+
+# Records are slotted (no per-instance __dict__) since millions of them can be held in memory
 @dataclass
 class Flight:
+    __slots__ = ("flight_number", "departure_airport", "arrival_airport", "departure_time",
+                 "arrival_time", "aircraft_type", "capacity", "cargo_capacity")
     flight_number: str
     departure_airport: str
     arrival_airport: str
@@ -16,6 +26,35 @@ class Flight:
 
 @dataclass
 class Cargo:
+    __slots__ = ("cargo_id", "weight", "departure_airport", "arrival_airport", "priority", "deadline")
+    cargo_id: str
+    weight: float  # in tons
+    departure_airport: str
+    arrival_airport: str
+    priority: int  # 1 (highest) to 5 (lowest)
+    deadline: datetime
+
+# Read-only copies of the records, for holders that share them with the live
+# schedule (see ScheduleSnapshot's frozen option); they compare and hash by value
+@dataclass(frozen=True)
+class FrozenFlight:
+    __slots__ = Flight.__slots__
+    flight_number: str
+    departure_airport: str
+    arrival_airport: str
+    departure_time: datetime
+    arrival_time: datetime
+    aircraft_type: str
+    capacity: int
+    cargo_capacity: float  # in tons
+
+    def __reduce__(self):
+        # The default pickling sets slots one by one, which a frozen instance refuses
+        return FrozenFlight, tuple(getattr(self, name) for name in self.__slots__)
+
+@dataclass(frozen=True)
+class FrozenCargo:
+    __slots__ = Cargo.__slots__
     cargo_id: str
     weight: float  # in tons
     departure_airport: str
@@ -23,49 +62,478 @@ class Cargo:
     priority: int  # 1 (highest) to 5 (lowest)
     deadline: datetime
 
-class DatabaseHandler:
-    def __init__(self, connection_string="mongodb://localhost:27017/"):
-        self.client = MongoClient(connection_string)
-        self.db = self.client['airline_scheduling']
+    def __reduce__(self):
+        return FrozenCargo, tuple(getattr(self, name) for name in self.__slots__)
+
+def freeze_flight(flight) -> FrozenFlight:
+    """A read-only copy of a flight"""
+    return FrozenFlight(*(getattr(flight, name) for name in Flight.__slots__))
+
+def freeze_cargo(cargo) -> FrozenCargo:
+    """A read-only copy of a cargo request"""
+    return FrozenCargo(*(getattr(cargo, name) for name in Cargo.__slots__))
+
+# Only the fields the dataclasses need are sent back by the server
+FLIGHT_PROJECTION = {"_id": 0, "flight_number": 1, "departure_airport": 1, "arrival_airport": 1,
+                     "departure_time": 1, "arrival_time": 1, "aircraft_type": 1,
+                     "capacity": 1, "cargo_capacity": 1}
+CARGO_PROJECTION = {"_id": 0, "cargo_id": 1, "weight": 1, "departure_airport": 1,
+                    "arrival_airport": 1, "priority": 1, "deadline": 1}
+
+@dataclass
+class PlanDiff:
+    """Cargo that changed between two allocation plans, by cargo ID"""
+    added: Dict[str, str]  # cargo_id -> flight, allocated only in the newer plan
+    removed: Dict[str, str]  # cargo_id -> flight, allocated only in the older plan
+    moved: Dict[str, Tuple[str, str]]  # cargo_id -> (old flight, new flight)
+    unchanged: int
+
+    def summary(self) -> Dict[str, int]:
+        return {"added": len(self.added), "removed": len(self.removed),
+                "moved": len(self.moved), "unchanged": self.unchanged}
+
+@dataclass
+class RecordResult:
+    key: str  # flight_number or cargo_id
+    success: bool
+    error: Optional[str] = None
+
+def validate_flight(flight: Flight) -> Optional[str]:
+    """Return why a flight record is malformed, or None if it is well formed"""
+    if not isinstance(flight.flight_number, str) or not flight.flight_number:
+        return "missing flight number"
+    if not flight.departure_airport or not flight.arrival_airport:
+        return "missing airport"
+    if not isinstance(flight.departure_time, datetime) or not isinstance(flight.arrival_time, datetime):
+        return "departure and arrival times must be datetimes"
+    if not flight.aircraft_type:
+        return "missing aircraft type"
+    if not isinstance(flight.capacity, int) or flight.capacity < 0:
+        return "capacity must be a non-negative integer"
+    if not isinstance(flight.cargo_capacity, (int, float)) or flight.cargo_capacity < 0:
+        return "cargo capacity must be a non-negative number"
+    return None
+
+def validate_cargo(cargo: Cargo) -> Optional[str]:
+    """Return why a cargo record is malformed, or None if it is well formed"""
+    if not isinstance(cargo.cargo_id, str) or not cargo.cargo_id:
+        return "missing cargo ID"
+    if not isinstance(cargo.weight, (int, float)) or cargo.weight <= 0:
+        return "weight must be a positive number"
+    if not cargo.departure_airport or not cargo.arrival_airport:
+        return "missing airport"
+    if not isinstance(cargo.priority, int) or not 1 <= cargo.priority <= 5:
+        return "priority must be between 1 and 5"
+    if not isinstance(cargo.deadline, datetime):
+        return "deadline must be a datetime"
+    return None
+
+class ReferenceCache:
+    """Small TTL cache for the fleet and airport documents, which rarely change"""
+
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self.entries: Dict[str, tuple] = {}  # name -> (value, loaded_at)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_time = 0.0
+        self.max_refresh_time = 0.0
+
+    def get(self, name: str, loader) -> Dict:
+        """Cached value of name, calling loader() if it is missing or older than the TTL"""
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                self.hits += 1
+                return dict(entry[0])
+            self.misses += 1
+        return dict(self.refresh(name, loader))
+
+    def refresh(self, name: str, loader) -> Dict:
+        """Reload name now, timing the round trip"""
+        start = time.monotonic()
+        value = loader()
+        elapsed = time.monotonic() - start
+        profiling.observe("db.reference_refresh", elapsed)
+        with self.lock:
+            self.entries[name] = (value, time.monotonic())
+            self.refreshes += 1
+            self.refresh_time += elapsed
+            self.max_refresh_time = max(self.max_refresh_time, elapsed)
+        return value
+
+    def invalidate(self, name: Optional[str] = None):
+        """Drop one cached entry, or all of them"""
+        with self.lock:
+            if name is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(name, None)
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counts and refresh latency in seconds"""
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "avg_refresh_time": self.refresh_time / self.refreshes if self.refreshes else 0.0,
+                "max_refresh_time": self.max_refresh_time
+            }
+
+# Flights per stored chunk of an allocation plan, keeping documents far below MongoDB's 16MB limit
+PLAN_CHUNK_SIZE = 1000
+
+# Fleet and airport data each live in a single document with a fixed _id,
+# so updates are one atomic replace instead of a delete followed by an insert
+FLEET_DOCUMENT_ID = "fleet"
+AIRPORTS_DOCUMENT_ID = "airports"
+
+DEFAULT_FLEET = {
+    "Boeing 737": 5,
+    "Airbus A320": 3,
+    "Boeing 777": 2
+}
+# Indian cities
+DEFAULT_AIRPORTS = {
+    "Mumbai": 50,
+    "Delhi": 45,
+    "Pune": 30,
+    "Chennai": 40
+}
+
+class StorageBackend(ABC):
+    """Where flights, cargo, fleet and airport data and allocation plans are kept
+
+    DatabaseHandler keeps them in MongoDB; storage.py has an in-memory and a
+    SQLite backend, and open_storage picks one from a URL. Backends implement
+    the abstract methods here and share the rest: the reference-data cache,
+    whole-table reads and plan diffs. Backends may be
+    used from several threads at once: the GUI pages its lists on one thread
+    while the expert system works on another. MongoClient is thread-safe,
+    the SQLite backend gives each thread its own connection, and the memory
+    backend holds a lock around its tables.
+    """
+
+    def __init__(self, reference_ttl: float = 60.0):
+        self.reference_cache = ReferenceCache(reference_ttl)
+
+    def initialize_database(self, overwrite: bool = False):
+        """Store the default fleet and airport data
+
+        Existing fleet and airport data are kept unless overwrite is set, so
+        this is safe to call on every start.
+        """
+        self.ensure_indexes()
+        if overwrite or not self._load_fleet_data():
+            self.update_fleet(DEFAULT_FLEET)
+        if overwrite or not self._load_airport_data():
+            self.update_airports(DEFAULT_AIRPORTS)
+
+    def ensure_indexes(self):
+        """Create whatever lookups and windowed loads rely on (idempotent)"""
+
+    def get_fleet_data(self) -> Dict[str, int]:
+        """Retrieve fleet data, from the reference cache when it is fresh"""
+        return self.reference_cache.get("fleet", self._load_fleet_data)
+
+    def get_airport_data(self) -> Dict[str, int]:
+        """Retrieve airport data, from the reference cache when it is fresh"""
+        return self.reference_cache.get("airports", self._load_airport_data)
+
+    @abstractmethod
+    def _load_fleet_data(self) -> Dict[str, int]:
+        ...
+
+    @abstractmethod
+    def _load_airport_data(self) -> Dict[str, int]:
+        ...
+
+    def reference_cache_stats(self) -> Dict[str, float]:
+        """Hit/miss and refresh-latency stats for fleet and airport data"""
+        return self.reference_cache.stats()
+
+    def watch_reference_data(self, poll_interval: float = 30.0):
+        """Keep fleet and airport data fresh when other processes change them
+
+        Nothing to do unless the storage is shared: this process's own
+        updates already invalidate the cache.
+        """
+
+    def stop_watching(self):
+        """Stop the background reference-data watcher"""
+
+    @abstractmethod
+    def update_fleet(self, fleet_data: Dict[str, int]):
+        ...
+
+    @abstractmethod
+    def update_airports(self, airport_data: Dict[str, int]):
+        ...
+
+    @abstractmethod
+    def add_flight(self, flight: Flight) -> bool:
+        ...
+
+    @abstractmethod
+    def add_cargo(self, cargo: Cargo) -> bool:
+        ...
+
+    @abstractmethod
+    def add_flights_bulk(self, flights: Iterable[Flight], chunk_size: int = 1000) -> List[RecordResult]:
+        ...
+
+    @abstractmethod
+    def add_cargo_bulk(self, cargo_list: Iterable[Cargo], chunk_size: int = 1000) -> List[RecordResult]:
+        ...
+
+    @abstractmethod
+    def iter_flights(self, departure_from: Optional[datetime] = None,
+                     departure_until: Optional[datetime] = None,
+                     airports: Optional[Iterable[str]] = None,
+                     batch_size: int = 1000) -> Iterator[Flight]:
+        ...
+
+    @abstractmethod
+    def iter_cargo(self, deadline_from: Optional[datetime] = None,
+                   deadline_until: Optional[datetime] = None,
+                   airports: Optional[Iterable[str]] = None,
+                   batch_size: int = 1000) -> Iterator[Cargo]:
+        ...
+
+    @abstractmethod
+    def archive_flights(self, before: datetime, batch_size: int = 1000) -> int:
+        """Move flights departing before `before` out of the live data, returning how many moved"""
+
+    @abstractmethod
+    def archive_cargo(self, before: datetime, batch_size: int = 1000) -> int:
+        """Move cargo requests due before `before` out of the live data, returning how many moved"""
+
+    def get_all_flights(self) -> List[Flight]:
+        """Retrieve all flights from the database"""
+        return list(self.iter_flights())
+
+    def get_all_cargo(self) -> List[Cargo]:
+        """Retrieve all cargo requests from the database"""
+        return list(self.iter_cargo())
+
+    @abstractmethod
+    def page_flights(self, filters: Optional[Dict] = None, sort_by: str = "flight_number",
+                     descending: bool = False, skip: int = 0, limit: int = 100,
+                     after: Optional[Tuple] = None) -> List[Flight]:
+        """One page of flights; with after, a (sort_by value, flight number) anchor, skip counts
+        from the row following it instead of from the first row"""
+
+    @abstractmethod
+    def page_cargo(self, filters: Optional[Dict] = None, sort_by: str = "cargo_id",
+                   descending: bool = False, skip: int = 0, limit: int = 100,
+                   after: Optional[Tuple] = None) -> List[Cargo]:
+        """One page of cargo requests; with after, a (sort_by value, cargo ID) anchor, skip
+        counts from the row following it instead of from the first row"""
+
+    @abstractmethod
+    def count_flights(self, filters: Optional[Dict] = None) -> int:
+        ...
+
+    @abstractmethod
+    def count_cargo(self, filters: Optional[Dict] = None) -> int:
+        ...
+
+    @abstractmethod
+    def delete_flight(self, flight_number: str) -> bool:
+        ...
+
+    @abstractmethod
+    def delete_cargo(self, cargo_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def save_allocation_plan(self, allocation: Dict[str, List], mode: str, objective: Optional[float] = None,
+                             timings: Optional[Dict[str, float]] = None, label: Optional[str] = None) -> int:
+        ...
+
+    @abstractmethod
+    def list_allocation_plans(self, limit: int = 20) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    def get_allocation_plan(self, version: int) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def iter_plan_assignments(self, version: int) -> Iterator[Tuple[str, List[str]]]:
+        ...
+
+    @abstractmethod
+    def delete_allocation_plan(self, version: int) -> bool:
+        ...
+
+    @staticmethod
+    def _plan_metadata(version: int, allocation: Dict[str, List], loaded: List[Tuple[str, List[str]]],
+                       mode: str, objective: Optional[float], timings: Optional[Dict[str, float]],
+                       label: Optional[str]) -> Dict:
+        return {
+            "version": version,
+            "complete": True,
+            "created_at": datetime.now(),
+            "mode": mode,
+            "label": label,
+            "objective": objective,
+            "timings": timings or {},
+            "flights": len(allocation),
+            "loaded_flights": len(loaded),
+            "allocated_cargo": sum(len(cargo_ids) for _, cargo_ids in loaded)
+        }
+
+    def load_allocation_plan(self, version: int) -> Dict[str, List[str]]:
+        """flight_number -> cargo IDs for the loaded flights of a plan"""
+        return dict(self.iter_plan_assignments(version))
+
+    def diff_allocation_plans(self, old_version: int, new_version: int) -> PlanDiff:
+        """What changed from one plan to another, compared by cargo ID only"""
+        old_flights = {cargo_id: number for number, cargo_ids in self.iter_plan_assignments(old_version)
+                       for cargo_id in cargo_ids}
+        added, moved = {}, {}
+        unchanged = 0
+        for number, cargo_ids in self.iter_plan_assignments(new_version):
+            for cargo_id in cargo_ids:
+                old_number = old_flights.pop(cargo_id, None)
+                if old_number is None:
+                    added[cargo_id] = number
+                elif old_number != number:
+                    moved[cargo_id] = (old_number, number)
+                else:
+                    unchanged += 1
+        return PlanDiff(added=added, removed=old_flights, moved=moved, unchanged=unchanged)
+
+    def close(self):
+        """Release the connection or files behind the storage"""
+        self.stop_watching()
+
+class DatabaseHandler(StorageBackend):
+    """Storage in MongoDB"""
+
+    def __init__(self, connection_string="mongodb://localhost:27017/", reference_ttl: float = 60.0,
+                 database_name: str = "airline_scheduling", client=None):
+        super().__init__(reference_ttl)
+        # connect=False defers connecting until the first operation, so
+        # constructing a handler never blocks
+        self.client = client if client is not None else MongoClient(connection_string, connect=False)
+        self.db = self.client[database_name]
         self.flights_collection = self.db['flights']
         self.cargo_collection = self.db['cargo']
         self.fleet_collection = self.db['fleet']
         self.airports_collection = self.db['airports']
+        self.plans_collection = self.db['allocation_plans']
+        self.plan_chunks_collection = self.db['allocation_plan_chunks']
+        # Expired records moved out of the live collections (see archive_flights)
+        self.flights_archive_collection = self.db['flights_archive']
+        self.cargo_archive_collection = self.db['cargo_archive']
+        self._watcher = None
+        self._stop_watching = threading.Event()
 
-    def initialize_database(self):
-        """Initialize the database with default fleet and airport data"""
-        # Initialize fleet data
-        fleet_data = {
-            "Boeing 737": 5,
-            "Airbus A320": 3,
-            "Boeing 777": 2
-        }
-        self.fleet_collection.delete_many({})
-        self.fleet_collection.insert_one({"aircraft": fleet_data})
-
-        # Initialize airport data with Indian cities
-        airport_data = {
-            "Mumbai": 50,
-            "Delhi": 45,
-            "Pune": 30,
-            "Chennai": 40
-        }
-        self.airports_collection.delete_many({})
-        self.airports_collection.insert_one({"airports": airport_data})
+    def initialize_database(self, overwrite: bool = False):
+        """Initialize the database with default fleet and airport data
 
-    def get_fleet_data(self) -> Dict[str, int]:
-        """Retrieve fleet data from database"""
-        fleet_doc = self.fleet_collection.find_one({})
+        Existing fleet and airport data are kept unless overwrite is set, so
+        this is safe to call on every start.
+        """
+        self.ensure_indexes()
+        if overwrite:
+            self.update_fleet(DEFAULT_FLEET)
+            self.update_airports(DEFAULT_AIRPORTS)
+        else:
+            self._seed(self.fleet_collection, FLEET_DOCUMENT_ID, {"aircraft": DEFAULT_FLEET})
+            self._seed(self.airports_collection, AIRPORTS_DOCUMENT_ID, {"airports": DEFAULT_AIRPORTS})
+            # A read that raced the seed may have cached empty data
+            self.reference_cache.invalidate("fleet")
+            self.reference_cache.invalidate("airports")
+
+    def _seed(self, collection, document_id: str, document: Dict):
+        """Insert document only if the collection holds no data yet"""
+        # Documents from before the fixed _id count as existing data
+        if collection.find_one({"_id": {"$ne": document_id}}, {"_id": 1}) is not None:
+            return
+        collection.update_one({"_id": document_id}, {"$setOnInsert": document}, upsert=True)
+
+    def ensure_indexes(self):
+        """Create the indexes lookups, deletes and windowed loads rely on (idempotent)"""
+        indexes = [
+            (self.flights_collection, [("flight_number", ASCENDING)], True),
+            (self.cargo_collection, [("cargo_id", ASCENDING)], True),
+            (self.flights_collection, [("departure_airport", ASCENDING), ("arrival_airport", ASCENDING),
+                                       ("departure_time", ASCENDING)], False),
+            (self.cargo_collection, [("departure_airport", ASCENDING), ("arrival_airport", ASCENDING),
+                                     ("deadline", ASCENDING), ("priority", ASCENDING)], False),
+            # Time-window loads without an airport filter
+            (self.flights_collection, [("departure_time", ASCENDING)], False),
+            (self.cargo_collection, [("deadline", ASCENDING)], False),
+            (self.flights_archive_collection, [("departure_time", ASCENDING)], False),
+            (self.cargo_archive_collection, [("deadline", ASCENDING)], False),
+            (self.plans_collection, [("version", ASCENDING)], True),
+            (self.plan_chunks_collection, [("version", ASCENDING), ("chunk", ASCENDING)], True)
+        ]
+        for collection, keys, unique in indexes:
+            try:
+                collection.create_index(keys, unique=unique)
+            except PyMongoError as e:
+                # Typically existing duplicates blocking a unique index
+                print(f"Error creating index {keys} on {collection.name}: {e}")
+
+    def _load_fleet_data(self) -> Dict[str, int]:
+        fleet_doc = (self.fleet_collection.find_one({"_id": FLEET_DOCUMENT_ID}) or
+                     self.fleet_collection.find_one({}))
         return fleet_doc["aircraft"] if fleet_doc else {}
 
-    def get_airport_data(self) -> Dict[str, int]:
-        """Retrieve airport data from database"""
-        airport_doc = self.airports_collection.find_one({})
+    def _load_airport_data(self) -> Dict[str, int]:
+        airport_doc = (self.airports_collection.find_one({"_id": AIRPORTS_DOCUMENT_ID}) or
+                       self.airports_collection.find_one({}))
         return airport_doc["airports"] if airport_doc else {}
 
-    def add_flight(self, flight: Flight) -> bool:
-        """Add a flight to the database"""
-        flight_data = {
+    def watch_reference_data(self, poll_interval: float = 30.0):
+        """Keep fleet and airport data fresh from a background thread
+
+        Uses a MongoDB change stream when the server supports one (replica
+        sets), invalidating the cache on every change. Standalone servers
+        fall back to reloading both documents every poll_interval seconds.
+        """
+        if self._watcher is not None:
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(poll_interval,), daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        """Stop the background reference-data watcher"""
+        self._stop_watching.set()
+        self._watcher = None
+
+    def _watch(self, poll_interval: float):
+        # Cache entries are named after the collections they come from
+        collections = ["fleet", "airports"]
+        try:
+            with self.db.watch([{"$match": {"ns.coll": {"$in": collections}}}],
+                               max_await_time_ms=int(poll_interval * 1000)) as stream:
+                while not self._stop_watching.is_set():
+                    change = stream.try_next()
+                    if change is not None:
+                        self.reference_cache.invalidate(change.get("ns", {}).get("coll"))
+            return
+        except PyMongoError as e:
+            print(f"Change streams unavailable, polling reference data instead: {e}")
+        while not self._stop_watching.wait(poll_interval):
+            try:
+                self.reference_cache.refresh("fleet", self._load_fleet_data)
+                self.reference_cache.refresh("airports", self._load_airport_data)
+            except PyMongoError as e:
+                print(f"Error refreshing reference data: {e}")
+
+    @staticmethod
+    def flight_to_document(flight: Flight) -> Dict:
+        """Convert a flight to its MongoDB document"""
+        return {
             "flight_number": flight.flight_number,
             "departure_airport": flight.departure_airport,
             "arrival_airport": flight.arrival_airport,
@@ -75,6 +543,53 @@ class DatabaseHandler:
             "capacity": flight.capacity,
             "cargo_capacity": flight.cargo_capacity
         }
+
+    @staticmethod
+    def cargo_to_document(cargo: Cargo) -> Dict:
+        """Convert a cargo request to its MongoDB document"""
+        return {
+            "cargo_id": cargo.cargo_id,
+            "weight": cargo.weight,
+            "departure_airport": cargo.departure_airport,
+            "arrival_airport": cargo.arrival_airport,
+            "priority": cargo.priority,
+            "deadline": cargo.deadline
+        }
+
+    @staticmethod
+    def flight_from_document(flight_doc: Dict) -> Flight:
+        """Convert a MongoDB document to a flight"""
+        return Flight(
+            flight_number=flight_doc["flight_number"],
+            departure_airport=flight_doc["departure_airport"],
+            arrival_airport=flight_doc["arrival_airport"],
+            departure_time=flight_doc["departure_time"],
+            arrival_time=flight_doc["arrival_time"],
+            aircraft_type=flight_doc["aircraft_type"],
+            capacity=flight_doc["capacity"],
+            cargo_capacity=flight_doc["cargo_capacity"]
+        )
+
+    @staticmethod
+    def cargo_from_document(cargo_doc: Dict) -> Cargo:
+        """Convert a MongoDB document to a cargo request"""
+        return Cargo(
+            cargo_id=cargo_doc["cargo_id"],
+            weight=cargo_doc["weight"],
+            departure_airport=cargo_doc["departure_airport"],
+            arrival_airport=cargo_doc["arrival_airport"],
+            priority=cargo_doc["priority"],
+            deadline=cargo_doc["deadline"]
+        )
+
+    @profiling.timed("db.add_flight", counter="db.round_trips")
+    def add_flight(self, flight: Flight) -> bool:
+        """Add a flight to the database"""
+        error = validate_flight(flight)
+        if error:
+            print(f"Error adding flight: {error}")
+            return False
+        flight_data = self.flight_to_document(flight)
         try:
             self.flights_collection.insert_one(flight_data)
             return True
@@ -82,16 +597,14 @@ class DatabaseHandler:
             print(f"Error adding flight: {e}")
             return False
 
+    @profiling.timed("db.add_cargo", counter="db.round_trips")
     def add_cargo(self, cargo: Cargo) -> bool:
         """Add a cargo request to the database"""
-        cargo_data = {
-            "cargo_id": cargo.cargo_id,
-            "weight": cargo.weight,
-            "departure_airport": cargo.departure_airport,
-            "arrival_airport": cargo.arrival_airport,
-            "priority": cargo.priority,
-            "deadline": cargo.deadline
-        }
+        error = validate_cargo(cargo)
+        if error:
+            print(f"Error adding cargo: {error}")
+            return False
+        cargo_data = self.cargo_to_document(cargo)
         try:
             self.cargo_collection.insert_one(cargo_data)
             return True
@@ -99,48 +612,210 @@ class DatabaseHandler:
             print(f"Error adding cargo: {e}")
             return False
 
-    def get_all_flights(self) -> List[Flight]:
-        """Retrieve all flights from the database"""
-        flights = []
-        for flight_doc in self.flights_collection.find():
-            flight = Flight(
-                flight_number=flight_doc["flight_number"],
-                departure_airport=flight_doc["departure_airport"],
-                arrival_airport=flight_doc["arrival_airport"],
-                departure_time=flight_doc["departure_time"],
-                arrival_time=flight_doc["arrival_time"],
-                aircraft_type=flight_doc["aircraft_type"],
-                capacity=flight_doc["capacity"],
-                cargo_capacity=flight_doc["cargo_capacity"]
-            )
-            flights.append(flight)
-        return flights
+    def add_flights_bulk(self, flights: Iterable[Flight], chunk_size: int = 1000) -> List[RecordResult]:
+        """Validate and insert many flights, reporting the outcome of each"""
+        return self._insert_bulk(self.flights_collection, flights, validate_flight,
+                                 self.flight_to_document, lambda f: f.flight_number, chunk_size)
 
-    def get_all_cargo(self) -> List[Cargo]:
-        """Retrieve all cargo requests from the database"""
-        cargo_list = []
-        for cargo_doc in self.cargo_collection.find():
-            cargo = Cargo(
-                cargo_id=cargo_doc["cargo_id"],
-                weight=cargo_doc["weight"],
-                departure_airport=cargo_doc["departure_airport"],
-                arrival_airport=cargo_doc["arrival_airport"],
-                priority=cargo_doc["priority"],
-                deadline=cargo_doc["deadline"]
-            )
-            cargo_list.append(cargo)
-        return cargo_list
+    def add_cargo_bulk(self, cargo_list: Iterable[Cargo], chunk_size: int = 1000) -> List[RecordResult]:
+        """Validate and insert many cargo requests, reporting the outcome of each"""
+        return self._insert_bulk(self.cargo_collection, cargo_list, validate_cargo,
+                                 self.cargo_to_document, lambda c: c.cargo_id, chunk_size)
+
+    def _insert_bulk(self, collection, records, validate, to_document, key, chunk_size) -> List[RecordResult]:
+        results = []
+        # Positions in results of the documents waiting in the current chunk
+        pending, documents = [], []
+
+        def flush():
+            try:
+                with profiling.timer("db.insert_many"):
+                    collection.insert_many(documents, ordered=False)
+                profiling.count("db.round_trips")
+                profiling.count("db.records_written", len(documents))
+            except BulkWriteError as e:
+                for error in e.details.get("writeErrors", []):
+                    result = results[pending[error["index"]]]
+                    result.success = False
+                    result.error = error.get("errmsg", "write failed")
+            except Exception as e:
+                print(f"Error in bulk insert: {e}")
+                for position in pending:
+                    results[position].success = False
+                    results[position].error = str(e)
+            pending.clear()
+            documents.clear()
+
+        for record in records:
+            error = validate(record)
+            if error:
+                results.append(RecordResult(str(key(record)), False, error))
+                continue
+            pending.append(len(results))
+            documents.append(to_document(record))
+            results.append(RecordResult(key(record), True))
+            if len(documents) >= chunk_size:
+                flush()
+        if documents:
+            flush()
+        return results
+
+    @staticmethod
+    def _airport_filter(query: Dict, airports: Optional[Iterable[str]]):
+        if airports is not None:
+            airports = list(airports)
+            query["$or"] = [
+                {"departure_airport": {"$in": airports}},
+                {"arrival_airport": {"$in": airports}}
+            ]
 
+    @staticmethod
+    def _range_filter(query: Dict, field: str, start: Optional[datetime], end: Optional[datetime]):
+        bounds = {}
+        if start is not None:
+            bounds["$gte"] = start
+        if end is not None:
+            bounds["$lt"] = end
+        if bounds:
+            query[field] = bounds
+
+    def iter_flights(self, departure_from: Optional[datetime] = None,
+                     departure_until: Optional[datetime] = None,
+                     airports: Optional[Iterable[str]] = None,
+                     batch_size: int = 1000) -> Iterator[Flight]:
+        """Stream flights, optionally only those departing in [departure_from, departure_until)
+        or touching one of airports"""
+        query = {}
+        self._range_filter(query, "departure_time", departure_from, departure_until)
+        self._airport_filter(query, airports)
+        cursor = self.flights_collection.find(query, FLIGHT_PROJECTION).batch_size(batch_size)
+        return profiling.stream("db.iter_flights", cursor, self.flight_from_document, batch_size)
+
+    def iter_cargo(self, deadline_from: Optional[datetime] = None,
+                   deadline_until: Optional[datetime] = None,
+                   airports: Optional[Iterable[str]] = None,
+                   batch_size: int = 1000) -> Iterator[Cargo]:
+        """Stream cargo requests, optionally only those due in [deadline_from, deadline_until)
+        or touching one of airports"""
+        query = {}
+        self._range_filter(query, "deadline", deadline_from, deadline_until)
+        self._airport_filter(query, airports)
+        cursor = self.cargo_collection.find(query, CARGO_PROJECTION).batch_size(batch_size)
+        return profiling.stream("db.iter_cargo", cursor, self.cargo_from_document, batch_size)
+
+    @staticmethod
+    def _match_filter(filters: Optional[Dict]) -> Dict:
+        """Query for list filters: strings match as prefixes (which can use an index), anything else exactly"""
+        query = {}
+        for field, value in (filters or {}).items():
+            if isinstance(value, str):
+                if value:
+                    query[field] = {"$regex": "^" + re.escape(value)}
+            else:
+                query[field] = value
+        return query
+
+    @staticmethod
+    def _page(collection, projection: Dict, key: str, filters: Optional[Dict], sort_by: str,
+              descending: bool, skip: int, limit: int, after: Optional[Tuple]) -> List[Dict]:
+        direction = DESCENDING if descending else ASCENDING
+        # The unique key breaks ties, so pages neither overlap nor skip rows
+        order = [(sort_by, direction)] if sort_by == key else [(sort_by, direction), (key, direction)]
+        query = DatabaseHandler._match_filter(filters)
+        if after is not None:
+            # Seek past the anchor through the sort index rather than skipping every row before it
+            value, last_key = after
+            later = "$lt" if descending else "$gt"
+            if sort_by == key:
+                anchor = {key: {later: last_key}}
+            else:
+                anchor = {"$or": [{sort_by: {later: value}}, {sort_by: value, key: {later: last_key}}]}
+            query = {"$and": [query, anchor]} if query else anchor
+        cursor = collection.find(query, projection, allow_disk_use=True)
+        return list(cursor.sort(order).skip(skip).limit(limit))
+
+    @profiling.timed("db.page_flights", counter="db.round_trips")
+    def page_flights(self, filters: Optional[Dict] = None, sort_by: str = "flight_number",
+                     descending: bool = False, skip: int = 0, limit: int = 100,
+                     after: Optional[Tuple] = None) -> List[Flight]:
+        """One page of flights, filtered and sorted by the server"""
+        documents = self._page(self.flights_collection, FLIGHT_PROJECTION, "flight_number",
+                               filters, sort_by, descending, skip, limit, after)
+        return [self.flight_from_document(flight_doc) for flight_doc in documents]
+
+    @profiling.timed("db.page_cargo", counter="db.round_trips")
+    def page_cargo(self, filters: Optional[Dict] = None, sort_by: str = "cargo_id",
+                   descending: bool = False, skip: int = 0, limit: int = 100,
+                   after: Optional[Tuple] = None) -> List[Cargo]:
+        """One page of cargo requests, filtered and sorted by the server"""
+        documents = self._page(self.cargo_collection, CARGO_PROJECTION, "cargo_id",
+                               filters, sort_by, descending, skip, limit, after)
+        return [self.cargo_from_document(cargo_doc) for cargo_doc in documents]
+
+    @profiling.timed("db.count_flights", counter="db.round_trips")
+    def count_flights(self, filters: Optional[Dict] = None) -> int:
+        """Number of flights matching filters"""
+        query = self._match_filter(filters)
+        # Unfiltered counts come from collection metadata instead of a scan
+        return self.flights_collection.count_documents(query) if query else self.flights_collection.estimated_document_count()
+
+    @profiling.timed("db.count_cargo", counter="db.round_trips")
+    def count_cargo(self, filters: Optional[Dict] = None) -> int:
+        """Number of cargo requests matching filters"""
+        query = self._match_filter(filters)
+        # Unfiltered counts come from collection metadata instead of a scan
+        return self.cargo_collection.count_documents(query) if query else self.cargo_collection.estimated_document_count()
+
+    @profiling.timed("db.update_fleet", counter="db.round_trips")
     def update_fleet(self, fleet_data: Dict[str, int]):
         """Update fleet data in the database"""
-        self.fleet_collection.delete_many({})
-        self.fleet_collection.insert_one({"aircraft": fleet_data})
+        self.fleet_collection.replace_one({"_id": FLEET_DOCUMENT_ID}, {"aircraft": fleet_data}, upsert=True)
+        # Drop documents written before the fixed _id, now that the new one is in place
+        self.fleet_collection.delete_many({"_id": {"$ne": FLEET_DOCUMENT_ID}})
+        self.reference_cache.invalidate("fleet")
 
+    @profiling.timed("db.update_airports", counter="db.round_trips")
     def update_airports(self, airport_data: Dict[str, int]):
         """Update airport data in the database"""
-        self.airports_collection.delete_many({})
-        self.airports_collection.insert_one({"airports": airport_data})
+        self.airports_collection.replace_one({"_id": AIRPORTS_DOCUMENT_ID}, {"airports": airport_data},
+                                             upsert=True)
+        # Drop documents written before the fixed _id, now that the new one is in place
+        self.airports_collection.delete_many({"_id": {"$ne": AIRPORTS_DOCUMENT_ID}})
+        self.reference_cache.invalidate("airports")
+
+    @profiling.timed("db.archive")
+    def archive_flights(self, before: datetime, batch_size: int = 1000) -> int:
+        """Move flights departing before `before` to the flights_archive collection"""
+        return self._archive(self.flights_collection, self.flights_archive_collection, "departure_time",
+                             before, batch_size)
 
+    @profiling.timed("db.archive")
+    def archive_cargo(self, before: datetime, batch_size: int = 1000) -> int:
+        """Move cargo requests due before `before` to the cargo_archive collection"""
+        return self._archive(self.cargo_collection, self.cargo_archive_collection, "deadline",
+                             before, batch_size)
+
+    @staticmethod
+    def _archive(collection, archive, field: str, before: datetime, batch_size: int) -> int:
+        # A batch is copied before it is deleted, so an interrupted run loses
+        # nothing; documents it already copied keep their _id and are skipped.
+        # Any other failure propagates, leaving the rest for the next run.
+        moved = 0
+        while True:
+            documents = list(collection.find({field: {"$lt": before}}).limit(batch_size))
+            if not documents:
+                break
+            try:
+                archive.insert_many(documents, ordered=False)
+            except BulkWriteError as e:
+                if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                    raise
+            collection.delete_many({"_id": {"$in": [document["_id"] for document in documents]}})
+            profiling.count("db.round_trips", 3)
+            moved += len(documents)
+        return moved
+
+    @profiling.timed("db.delete_flight", counter="db.round_trips")
     def delete_flight(self, flight_number: str) -> bool:
         """Delete a flight from the database"""
         try:
@@ -150,6 +825,7 @@ class DatabaseHandler:
             print(f"Error deleting flight: {e}")
             return False
 
+    @profiling.timed("db.delete_cargo", counter="db.round_trips")
     def delete_cargo(self, cargo_id: str) -> bool:
         """Delete a cargo request from the database"""
         try:
@@ -159,6 +835,61 @@ class DatabaseHandler:
             print(f"Error deleting cargo: {e}")
             return False
 
+    @profiling.timed("db.save_allocation_plan", counter="db.round_trips")
+    def save_allocation_plan(self, allocation: Dict[str, List], mode: str, objective: Optional[float] = None,
+                             timings: Optional[Dict[str, float]] = None, label: Optional[str] = None) -> int:
+        """Store an allocation run and return its version number
+
+        Only cargo IDs are stored, in chunks of PLAN_CHUNK_SIZE loaded flights.
+        The chunks are written before the plan document, so a listed plan is
+        always complete.
+        """
+        loaded = [(number, [cargo.cargo_id for cargo in cargo_list])
+                  for number, cargo_list in allocation.items() if cargo_list]
+        while True:
+            latest = list(self.plans_collection.find({}, {"_id": 0, "version": 1})
+                          .sort([("version", DESCENDING)]).limit(1))
+            version = latest[0]["version"] + 1 if latest else 1
+            try:
+                # Claim the version first so concurrent writers cannot share it
+                self.plans_collection.insert_one({"version": version, "complete": False})
+                break
+            except DuplicateKeyError:
+                continue
+
+        for chunk, start in enumerate(range(0, len(loaded), PLAN_CHUNK_SIZE)):
+            part = loaded[start:start + PLAN_CHUNK_SIZE]
+            self.plan_chunks_collection.insert_one({
+                "version": version,
+                "chunk": chunk,
+                "flights": [number for number, _ in part],
+                "cargo": [cargo_ids for _, cargo_ids in part]
+            })
+        self.plans_collection.replace_one({"version": version}, self._plan_metadata(
+            version, allocation, loaded, mode, objective, timings, label))
+        return version
+
+    def list_allocation_plans(self, limit: int = 20) -> List[Dict]:
+        """Metadata of the newest complete plans, newest first"""
+        cursor = self.plans_collection.find({"complete": True}, {"_id": 0})
+        return list(cursor.sort([("version", DESCENDING)]).limit(limit))
+
+    def get_allocation_plan(self, version: int) -> Optional[Dict]:
+        """Metadata of one plan, or None"""
+        return self.plans_collection.find_one({"version": version, "complete": True}, {"_id": 0})
+
+    def iter_plan_assignments(self, version: int) -> Iterator[Tuple[str, List[str]]]:
+        """(flight_number, cargo IDs) of each loaded flight in a plan, read one chunk at a time"""
+        cursor = self.plan_chunks_collection.find({"version": version}, {"_id": 0, "flights": 1, "cargo": 1})
+        for chunk in cursor.sort([("chunk", ASCENDING)]):
+            yield from zip(chunk["flights"], chunk["cargo"])
+
+    def delete_allocation_plan(self, version: int) -> bool:
+        """Delete a plan and its chunks"""
+        self.plan_chunks_collection.delete_many({"version": version})
+        return self.plans_collection.delete_one({"version": version}).deleted_count > 0
+
     def close(self):
         """Close the database connection"""
-        self.client.close() 
\ No newline at end of file
+        self.stop_watching()
+        self.client.close()
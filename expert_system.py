@@ -1,19 +1,241 @@
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
-from database import Flight, Cargo, DatabaseHandler
+from itertools import compress
+from operator import attrgetter
+from typing import List, Dict, Optional, Iterable, Tuple
+
+import profiling
+from database import Flight, Cargo, PlanDiff, RecordResult, validate_flight
+from storage import open_storage
+from allocation import allocate_parallel
+from incremental import IncrementalAllocation
+from optimizer import SolveResult, allocation_objective, solve_allocation
+from routing import CargoRouter
+from rotations import TailAssignment, assign_tails, fleet_suggestions
+from slots import SlotIndex, slot_congestion_report
+from flight_index import AircraftIntervalIndex
+from columnar import CodeTable, FlightColumns, CargoColumns
+from whatif import ScheduleSnapshot
+
+# Default length of the rolling horizon (see load_horizon)
+DEFAULT_HORIZON = timedelta(days=7)
+
+
+def departure_order(flight) -> Tuple[datetime, str]:
+    return flight.departure_time, flight.flight_number
+
+
+def _expire(records: List, field: str, before: datetime) -> Tuple[List, List]:
+    """(records timed at or after before, records timed before it), each in their original order"""
+    time_of = attrgetter(field)
+    keep = [time_of(record) >= before for record in records]
+    return list(compress(records, keep)), [record for record, kept in zip(records, keep) if not kept]
 
 class AirlineSchedulingExpertSystem:
-    def __init__(self):
-        self.db = DatabaseHandler()
+    def __init__(self, columnar: bool = False, fast_start: bool = False,
+                 connection_string: Optional[str] = None,
+                 database_name: str = "airline_scheduling", load: bool = True, client=None):
+        # Seconds spent in each startup stage; the GUI adds "import" and "first_paint"
+        self.startup_timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        # A storage URL (see storage.open_storage): MongoDB unless configured otherwise
+        self.db = open_storage(connection_string, database_name=database_name, client=client)
+        # With columnar set, flights and cargo live in typed arrays instead of
+        # lists of records, which uses far less memory on large schedules. The
+        # flight indexes and the incremental allocation still hold records.
+        self.columnar = columnar
+        self.codes = CodeTable()
+        self.startup_timings["connect"] = time.perf_counter() - started
+        self.flights = FlightColumns(codes=self.codes) if columnar else []
+        self.cargo_requests = CargoColumns(codes=self.codes) if columnar else []
+        self.flight_index = AircraftIntervalIndex()
+        self.slot_index = SlotIndex()
+        # Bumped on every change to flights or cargo; the cached allocation is
+        # only valid for the version it was computed at
+        self.data_version = 0
+        self._allocations = {}
+        self._allocation_version = -1
+        self.last_solve = None
+        # Greedy allocation kept up to date route by route as flights and
+        # cargo change; built on first use after each load
+        self.allocation_state: Optional[IncrementalAllocation] = None
+        self.allocation_cache_hits = 0
+        self.allocation_cache_misses = 0
+        # Aircraft rotations, valid for the data_version they were built at
+        self._tail_assignment: Optional[TailAssignment] = None
+        self._tail_assignment_version = -1
+        # With a rolling horizon, the [start, end) of departures held in
+        # memory and the airports they are limited to; None otherwise
+        self.horizon: Optional[Tuple[datetime, datetime]] = None
+        self.horizon_airports: Optional[List[str]] = None
+        # Set once the database is initialized and flights and cargo are in
+        # memory. With fast_start both happen on a background thread and every
+        # operation on them waits for this. Without load nothing is read until
+        # the caller calls load_data, e.g. with a schedule window.
+        self.ready = threading.Event()
+        self.load_error = None
+        if not load:
+            self._initialize_database()
+            self.ready.set()
+        elif fast_start:
+            threading.Thread(target=self._initial_load, daemon=True).start()
+        else:
+            self._initial_load()
+
+    def _initialize_database(self):
+        started = time.perf_counter()
         self.db.initialize_database()
-        self.flights = []
-        self.cargo_requests = []
-        self.load_data()
+        self.startup_timings["initialize"] = time.perf_counter() - started
+
+    def _initial_load(self):
+        started = None
+        try:
+            self._initialize_database()
+            started = time.perf_counter()
+            self.load_data()
+        except Exception as e:
+            print(f"Error loading data: {e}")
+            self.load_error = e
+        finally:
+            if started is not None:
+                self.startup_timings["load"] = time.perf_counter() - started
+            self.ready.set()
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the initial load of flights and cargo to finish"""
+        return self.ready.wait(timeout)
+
+    def record_startup(self, stage: str, seconds: float):
+        """Record how long a startup stage took"""
+        self.startup_timings[stage] = seconds
+
+    def startup_report(self) -> Dict[str, float]:
+        """Seconds spent in each startup stage so far (import, connect, initialize, load, first_paint)"""
+        return dict(self.startup_timings)
+
+    def load_data(self, departure_from: Optional[datetime] = None,
+                  departure_until: Optional[datetime] = None,
+                  airports: Optional[List[str]] = None, batch_size: int = 1000):
+        """Load data from the database
+
+        Without arguments everything is loaded. Otherwise only flights departing
+        in [departure_from, departure_until) and touching airports are kept,
+        along with cargo that is still deliverable after departure_from.
+        """
+        self.horizon = None
+        self._load(self.db.iter_flights(departure_from, departure_until, airports, batch_size),
+                   self.db.iter_cargo(departure_from, None, airports, batch_size))
+
+    def _load(self, flights: Iterable[Flight], cargo_list: Iterable[Cargo]):
+        with profiling.timer("load_data.flights"):
+            self.flights = FlightColumns(flights, self.codes) if self.columnar else list(flights)
+        with profiling.timer("load_data.cargo"):
+            self.cargo_requests = CargoColumns(cargo_list, self.codes) if self.columnar else list(cargo_list)
+        with profiling.timer("load_data.indexes"):
+            self.flight_index = AircraftIntervalIndex(self.flights)
+            self.slot_index = SlotIndex(self.flights)
+        self.allocation_state = None
+        self._data_changed()
+
+    def load_upcoming(self, hours: int = 72, airports: Optional[List[str]] = None):
+        """Load only the flights departing in the next few hours"""
+        now = datetime.now()
+        self.load_data(now, now + timedelta(hours=hours), airports)
+
+    def load_horizon(self, start: Optional[datetime] = None, length: timedelta = DEFAULT_HORIZON,
+                     airports: Optional[List[str]] = None, batch_size: int = 1000):
+        """Load a rolling horizon: the flights departing in [start, start + length), by default from now
+
+        Flights are held in departure order, with the cargo still
+        deliverable after start, and advance_horizon slides the window
+        forward without a reload. Memory and the cost of each slide then
+        depend on the horizon, not on how much history the database holds.
+        """
+        start = start or datetime.now()
+        end = start + length
+        flights = sorted(self.db.iter_flights(start, end, airports, batch_size), key=departure_order)
+        self._load(flights, self.db.iter_cargo(start, None, airports, batch_size))
+        self.horizon = (start, end)
+        self.horizon_airports = list(airports) if airports is not None else None
 
-    def load_data(self):
-        """Load data from the database"""
-        self.flights = self.db.get_all_flights()
-        self.cargo_requests = self.db.get_all_cargo()
+    @profiling.timed("horizon.advance")
+    def advance_horizon(self, start: Optional[datetime] = None, archive: bool = False,
+                        batch_size: int = 1000) -> Dict[str, int]:
+        """Slide the rolling horizon forward to start (by default now), keeping its length
+
+        Flights departing and cargo due before the new start leave memory
+        and every index; flights coming into the window are fetched and
+        appended in departure order, and the incremental allocation only
+        reallocates the routes either touched. The result holds the same
+        flights and cargo, in the same order, as load_horizon(start) unless
+        flights were added out of departure order in between. With archive,
+        expired records are also moved to the database's archive.
+        Returns how many flights and cargo requests expired and arrived.
+        """
+        self.ready.wait()
+        if self.horizon is None:
+            raise ValueError("No rolling horizon loaded; call load_horizon first")
+        old_start, old_end = self.horizon
+        start = start or datetime.now()
+        stats = {"expired_flights": 0, "expired_cargo": 0, "new_flights": 0,
+                 "archived_flights": 0, "archived_cargo": 0}
+        if start <= old_start:
+            return stats
+        end = start + (old_end - old_start)
+
+        if self.columnar:
+            expired_flights = self.flights.expire(start)
+            expired_cargo = self.cargo_requests.expire(start)
+        else:
+            self.flights, expired_flights = _expire(self.flights, "departure_time", start)
+            self.cargo_requests, expired_cargo = _expire(self.cargo_requests, "deadline", start)
+        for flight in expired_flights:
+            self.flight_index.remove(flight)
+            self.slot_index.remove(flight)
+        if self.allocation_state is not None:
+            self.allocation_state.remove_many(expired_flights, expired_cargo)
+
+        new_flights = sorted(self.db.iter_flights(max(start, old_end), end, self.horizon_airports, batch_size),
+                             key=departure_order)
+        for flight in new_flights:
+            self.flight_index.add(flight)
+            self.slot_index.add(flight)
+            if self.allocation_state is not None:
+                self.allocation_state.add_flight(flight)
+        self.flights.extend(new_flights)
+        self.horizon = (start, end)
+
+        if archive:
+            stats["archived_flights"] = self.db.archive_flights(start, batch_size)
+            stats["archived_cargo"] = self.db.archive_cargo(start, batch_size)
+        stats.update(expired_flights=len(expired_flights), expired_cargo=len(expired_cargo),
+                     new_flights=len(new_flights))
+        self._data_changed()
+        return stats
+
+    def _in_horizon(self, record, time: datetime, until_end: bool) -> bool:
+        """Whether a new record belongs in memory: always, unless the rolling horizon excludes it"""
+        if self.horizon is None:
+            return True
+        start, end = self.horizon
+        if time < start or (until_end and time >= end):
+            return False
+        airports = self.horizon_airports
+        return airports is None or record.departure_airport in airports or record.arrival_airport in airports
+
+    def _data_changed(self):
+        """Invalidate anything derived from the current flights and cargo"""
+        self.data_version += 1
+
+    def allocation_cache_stats(self) -> Dict[str, int]:
+        """Hit/miss counters for the cached cargo allocation"""
+        return {
+            "hits": self.allocation_cache_hits,
+            "misses": self.allocation_cache_misses,
+            "routes_reallocated": self.allocation_state.routes_reallocated if self.allocation_state else 0,
+            "version": self.data_version
+        }
 
     def get_airport_data(self) -> Dict[str, int]:
         """Get airport capacity data"""
@@ -25,102 +247,360 @@ class AirlineSchedulingExpertSystem:
 
     def add_flight(self, flight: Flight) -> bool:
         """Add a new flight to the system"""
+        self.ready.wait()
+        # Checked before the write so a stored flight can always be held in memory
+        error = FlightColumns.column_error(flight) if self.columnar else None
+        if error:
+            print(f"Error adding flight: {error}")
+            return False
         if self.db.add_flight(flight):
-            self.flights.append(flight)
+            # Outside the rolling horizon it is only stored, and loaded once the window reaches it
+            if self._in_horizon(flight, flight.departure_time, True):
+                self.flights.append(flight)
+                self.flight_index.add(flight)
+                self.slot_index.add(flight)
+                if self.allocation_state is not None:
+                    self.allocation_state.add_flight(flight)
+            self._data_changed()
             return True
         return False
 
     def add_cargo(self, cargo: Cargo) -> bool:
         """Add a new cargo request to the system"""
+        self.ready.wait()
+        error = CargoColumns.column_error(cargo) if self.columnar else None
+        if error:
+            print(f"Error adding cargo: {error}")
+            return False
         if self.db.add_cargo(cargo):
-            self.cargo_requests.append(cargo)
+            if self._in_horizon(cargo, cargo.deadline, False):
+                self.cargo_requests.append(cargo)
+                if self.allocation_state is not None:
+                    self.allocation_state.add_cargo(cargo)
+            self._data_changed()
             return True
         return False
 
+    @profiling.timed("feasibility.check_flight")
     def check_flight_feasibility(self, flight: Flight) -> bool:
         """Check if a flight is feasible based on various constraints"""
+        self.ready.wait()
+        return self._check_feasibility(flight, self.db.get_fleet_data(), self.db.get_airport_data())
+
+    def check_flights_feasibility(self, flights: List[Flight]) -> List[bool]:
+        """Check a batch of proposed flights, each against the current schedule"""
+        self.ready.wait()
+        fleet_data = self.db.get_fleet_data()
+        airport_data = self.db.get_airport_data()
+        return [self._check_feasibility(flight, fleet_data, airport_data) for flight in flights]
+
+    @profiling.timed("feasibility.check_flights")
+    def flights_feasibility_errors(self, flights: Iterable[Flight]) -> List[Optional[str]]:
+        """Why each proposed flight cannot be scheduled, or None where it can"""
+        self.ready.wait()
+        fleet_data = self.db.get_fleet_data()
+        airport_data = self.db.get_airport_data()
+        return [self._feasibility_error(flight, fleet_data, airport_data) for flight in flights]
+
+    def _check_feasibility(self, flight: Flight, fleet_data: Dict[str, int],
+                           airport_data: Dict[str, int]) -> bool:
+        return self._feasibility_error(flight, fleet_data, airport_data) is None
+
+    def _feasibility_error(self, flight: Flight, fleet_data: Dict[str, int],
+                           airport_data: Dict[str, int]) -> Optional[str]:
+        """Return why a flight is infeasible, or None if it can be scheduled"""
         # Check if departure time is before arrival time
         if flight.departure_time >= flight.arrival_time:
-            return False
+            return "departure must be before arrival"
 
         # Check if the aircraft type exists in the fleet
-        fleet_data = self.db.get_fleet_data()
         if flight.aircraft_type not in fleet_data:
-            return False
+            return f"unknown aircraft type {flight.aircraft_type}"
 
         # Check if airports exist
-        airport_data = self.db.get_airport_data()
         if flight.departure_airport not in airport_data or flight.arrival_airport not in airport_data:
-            return False
+            return "unknown airport"
+
+        # Check hourly slot capacity at both airports
+        full = self.slot_index.full_slot(flight, airport_data)
+        if full:
+            return f"no slot at {full[0]} for {full[1]:%Y-%m-%d %H:00}"
+
+        # Check for scheduling conflicts: the flight number must be new, and
+        # no more flights of a type may be airborne at once than we own aircraft
+        if flight.flight_number in self.flight_index.flight_numbers:
+            return f"duplicate flight number {flight.flight_number}"
+        if not self.flight_index.has_capacity(flight.aircraft_type, flight.departure_time,
+                                              flight.arrival_time, fleet_data[flight.aircraft_type]):
+            return f"no {flight.aircraft_type} available for the whole flight"
+
+        return None
 
-        # Check for scheduling conflicts
-        for existing_flight in self.flights:
-            if existing_flight.flight_number == flight.flight_number:
-                return False
-            if existing_flight.aircraft_type == flight.aircraft_type:
-                if (flight.departure_time <= existing_flight.arrival_time and 
-                    flight.arrival_time >= existing_flight.departure_time):
-                    return False
-
-        return True
-
-    def optimize_cargo_allocation(self) -> Dict[str, List[Cargo]]:
-        """Optimize cargo allocation across available flights"""
-        allocation = {}
-        unallocated_cargo = self.cargo_requests.copy()
-        
-        # Sort cargo by priority (1 is highest)
-        unallocated_cargo.sort(key=lambda x: x.priority)
-        
-        for flight in self.flights:
-            available_capacity = flight.cargo_capacity
-            allocation[flight.flight_number] = []
-            
-            for cargo in unallocated_cargo[:]:
-                if (cargo.departure_airport == flight.departure_airport and
-                    cargo.arrival_airport == flight.arrival_airport and
-                    cargo.weight <= available_capacity and
-                    cargo.deadline >= flight.arrival_time):
-                    allocation[flight.flight_number].append(cargo)
-                    available_capacity -= cargo.weight
-                    unallocated_cargo.remove(cargo)
-        
+    def add_flights_bulk(self, flights: Iterable[Flight], check_feasibility: bool = True,
+                         chunk_size: int = 1000) -> List[RecordResult]:
+        """Add many flights at once, reporting the outcome of each
+
+        With check_feasibility every flight is checked against the schedule,
+        including the flights accepted earlier in the same batch.
+        """
+        self.ready.wait()
+        results = []
+        accepted = []
+        if check_feasibility:
+            fleet_data = self.db.get_fleet_data()
+            airport_data = self.db.get_airport_data()
+        for flight in flights:
+            error = validate_flight(flight)
+            if error is None and self.columnar:
+                error = FlightColumns.column_error(flight)
+            if error is None and check_feasibility:
+                error = self._feasibility_error(flight, fleet_data, airport_data)
+            elif error is None and flight.flight_number in self.flight_index.flight_numbers:
+                # Indexing a second copy would let its failed insert unindex the first
+                error = f"duplicate flight number {flight.flight_number}"
+            if error:
+                results.append(RecordResult(str(flight.flight_number), False, error))
+                continue
+            # Indexed straight away so later flights in the batch see it
+            self.flight_index.add(flight)
+            self.slot_index.add(flight)
+            accepted.append((len(results), flight))
+            results.append(None)
+
+        written = self.db.add_flights_bulk([flight for _, flight in accepted], chunk_size)
+        for (position, flight), result in zip(accepted, written):
+            results[position] = result
+            if result.success and self._in_horizon(flight, flight.departure_time, True):
+                self.flights.append(flight)
+                if self.allocation_state is not None:
+                    self.allocation_state.add_flight(flight)
+            else:
+                self.flight_index.remove(flight)
+                self.slot_index.remove(flight)
+        if accepted:
+            self._data_changed()
+        return results
+
+    def add_cargo_bulk(self, cargo_list: Iterable[Cargo], chunk_size: int = 1000) -> List[RecordResult]:
+        """Add many cargo requests at once, reporting the outcome of each"""
+        self.ready.wait()
+        results = []
+        accepted = []
+        for cargo in cargo_list:
+            error = CargoColumns.column_error(cargo) if self.columnar else None
+            if error:
+                results.append(RecordResult(str(cargo.cargo_id), False, error))
+                continue
+            accepted.append((len(results), cargo))
+            results.append(None)
+
+        written = self.db.add_cargo_bulk([cargo for _, cargo in accepted], chunk_size)
+        for (position, cargo), result in zip(accepted, written):
+            results[position] = result
+            if result.success and self._in_horizon(cargo, cargo.deadline, False):
+                self.cargo_requests.append(cargo)
+                if self.allocation_state is not None:
+                    self.allocation_state.add_cargo(cargo)
+        if accepted:
+            self._data_changed()
+        return results
+
+    def optimize_cargo_allocation(self, mode: str = "greedy", time_budget: float = 5.0,
+                                  workers: Optional[int] = None,
+                                  cancelled: Optional[threading.Event] = None) -> Optional[Dict[str, List[Cargo]]]:
+        """Optimize cargo allocation across available flights
+
+        mode "greedy" loads flights in order with the highest priority cargo
+        that fits; "parallel" gives the same result with routes spread over
+        workers processes (default: one per CPU); "optimal" runs the solver for
+        up to time_budget seconds to maximise priority-weighted tonnage. Results
+        are cached per mode until flights or cargo change, so callers must treat
+        them as read-only. The greedy result is kept up to date incrementally:
+        after a change only the affected route is reallocated, and the same
+        dict is updated in place. The greedy and optimal modes check cancelled
+        between routes and return None once it is set (e.g. when the GUI
+        supersedes the request); nothing partial is cached.
+        """
+        self.ready.wait()
+        if mode == "greedy":
+            return self._greedy_allocation(cancelled)
+        if self._allocation_version != self.data_version:
+            self._allocations = {}
+            self._allocation_version = self.data_version
+        if mode in self._allocations:
+            self.allocation_cache_hits += 1
+            return self._allocations[mode]
+
+        self.allocation_cache_misses += 1
+        if mode == "optimal":
+            result = self.solve_cargo_allocation(time_budget, cancelled)
+            if result is None:
+                return None
+            allocation = result.allocation
+        elif mode == "parallel":
+            with profiling.timer("optimize.parallel"):
+                allocation = allocate_parallel(self.flights, self.cargo_requests, workers)
+        else:
+            raise ValueError(f"Unknown allocation mode: {mode}")
+        self._allocations[mode] = allocation
         return allocation
 
+    def _greedy_allocation(self, cancelled: Optional[threading.Event] = None) -> Optional[Dict[str, List[Cargo]]]:
+        if self.allocation_state is None:
+            self.allocation_state = IncrementalAllocation(self.flights, self.cargo_requests)
+        if self.allocation_state.is_current():
+            self.allocation_cache_hits += 1
+            profiling.count("optimize.cache_hits")
+            return self.allocation_state.allocation()
+        self.allocation_cache_misses += 1
+        with profiling.timer("optimize.greedy"):
+            return self.allocation_state.allocation(cancelled)
+
+    def save_allocation_plan(self, mode: str = "greedy", time_budget: float = 5.0,
+                             label: Optional[str] = None) -> int:
+        """Allocate cargo and store the plan with its objective and timing, returning its version"""
+        started = time.perf_counter()
+        allocation = self.optimize_cargo_allocation(mode, time_budget)
+        elapsed = time.perf_counter() - started
+        return self.db.save_allocation_plan(allocation, mode, allocation_objective(allocation),
+                                            {"optimize": elapsed}, label)
+
+    def diff_allocation_plans(self, old_version: int, new_version: int) -> PlanDiff:
+        """Cargo added, removed or moved between two stored plans"""
+        return self.db.diff_allocation_plans(old_version, new_version)
+
+    def verify_allocation_state(self) -> List[str]:
+        """Flight numbers where the incremental greedy allocation differs from a full recompute"""
+        self.ready.wait()
+        if self.allocation_state is None:
+            return []
+        return self.allocation_state.verify(self.flights, self.cargo_requests)
+
+    @profiling.timed("optimize.optimal")
+    def solve_cargo_allocation(self, time_budget: float = 5.0,
+                               cancelled: Optional[threading.Event] = None) -> Optional[SolveResult]:
+        """Run the allocation solver, reporting its objective value and solve time (None if cancelled)"""
+        self.ready.wait()
+        result = solve_allocation(self.flights, self.cargo_requests, time_budget, cancelled)
+        if result is not None:
+            self.last_solve = result
+        return result
+
+    def slot_congestion_report(self) -> List[Dict]:
+        """Airport-hours where scheduled movements exceed the airport's capacity"""
+        self.ready.wait()
+        return slot_congestion_report(self.flights, self.db.get_airport_data())
+
+    @profiling.timed("route_cargo")
+    def route_cargo(self, max_legs: int = 2, min_connection_times: Optional[Dict[str, timedelta]] = None,
+                    ready_after: Optional[datetime] = None) -> Dict[str, List[Flight]]:
+        """Route cargo over connecting flights where no direct flight has room
+
+        Cargo placed by optimize_cargo_allocation keeps its direct flight; the
+        rest is routed through up to max_legs flights that share the leftover
+        capacity. Returns cargo_id -> flights in travel order.
+        """
+        self.ready.wait()
+        router = CargoRouter(self.flights, min_connection_times, max_legs=max_legs)
+        itineraries = {}
+        flights_by_number = {flight.flight_number: flight for flight in self.flights}
+        for flight_number, cargo_list in self.optimize_cargo_allocation().items():
+            for cargo in cargo_list:
+                router.reserve(flight_number, cargo.weight)
+                itineraries[cargo.cargo_id] = [flights_by_number[flight_number]]
+        waiting = [cargo for cargo in self.cargo_requests if cargo.cargo_id not in itineraries]
+        itineraries.update(router.route_all(waiting, ready_after))
+        return itineraries
+
+    @profiling.timed("rotations.assign_tails")
+    def tail_assignment(self) -> TailAssignment:
+        """The loaded flights chained into aircraft rotations (see rotations.assign_tails)"""
+        self.ready.wait()
+        if self._tail_assignment_version != self.data_version:
+            self._tail_assignment = assign_tails(self.flights)
+            self._tail_assignment_version = self.data_version
+        return self._tail_assignment
+
+    def fleet_requirements(self) -> Dict[str, Dict[str, int]]:
+        """Aircraft the rotations need per type, against the fleet counts"""
+        return self.tail_assignment().fleet_report(self.db.get_fleet_data())
+
     def suggest_improvements(self) -> List[str]:
         """Suggest improvements for the current schedule"""
-        suggestions = []
-        
-        # Check fleet utilization
-        fleet_data = self.db.get_fleet_data()
-        for aircraft_type, count in fleet_data.items():
-            aircraft_flights = [f for f in self.flights if f.aircraft_type == aircraft_type]
-            if len(aircraft_flights) < count * 0.7:  # Less than 70% utilization
-                suggestions.append(f"Consider increasing flights for {aircraft_type} to improve fleet utilization")
-        
+        self.ready.wait()
+        fleet_report = self.fleet_requirements()
+        if self.columnar:
+            # Same rules, evaluated with NumPy over the flight columns
+            import analytics
+            return analytics.suggest_improvements(self.flights, fleet_report, self.optimize_cargo_allocation())
+
+        # Check fleet utilization: aircraft the rotations need against the fleet
+        suggestions = fleet_suggestions(fleet_report)
+
         # Check cargo capacity utilization
-        for flight in self.flights:
-            allocation = self.optimize_cargo_allocation()
-            if flight.flight_number in allocation:
-                total_cargo = sum(cargo.weight for cargo in allocation[flight.flight_number])
-                if total_cargo < flight.cargo_capacity * 0.5:  # Less than 50% cargo capacity used
-                    suggestions.append(f"Flight {flight.flight_number} has low cargo capacity utilization")
-        
+        allocation = self.optimize_cargo_allocation()
+        with profiling.timer("suggest.cargo_utilization"):
+            for flight in self.flights:
+                if flight.flight_number in allocation:
+                    total_cargo = sum(cargo.weight for cargo in allocation[flight.flight_number])
+                    if total_cargo < flight.cargo_capacity * 0.5:  # Less than 50% cargo capacity used
+                        suggestions.append(f"Flight {flight.flight_number} has low cargo capacity utilization")
+
         return suggestions
 
+    def snapshot(self, frozen: bool = False) -> ScheduleSnapshot:
+        """The schedule as it is now, for what-if scenarios to fork from (see whatif.py)
+
+        Copies references to the flights, cargo and greedy allocation, not
+        the records, so later changes to the live schedule leave it as taken.
+        With frozen the snapshot holds read-only copies of the records.
+        """
+        self.ready.wait()
+        allocation = dict(self.optimize_cargo_allocation())
+        if self.columnar:
+            flights, cargo_list = self.flights.copy(), self.cargo_requests.copy()
+        else:
+            flights, cargo_list = list(self.flights), list(self.cargo_requests)
+        return ScheduleSnapshot(flights, cargo_list, self.db.get_fleet_data(), self.db.get_airport_data(),
+                                allocation, frozen)
+
+    def _position(self, records, field: str, key: str) -> int:
+        """Index of the first in-memory record whose field equals key, or -1
+
+        Columnar stores search their key column directly, so only the record
+        found is materialized.
+        """
+        if self.columnar:
+            return records.position(key)
+        return next((i for i, record in enumerate(records) if getattr(record, field) == key), -1)
+
     def delete_flight(self, flight_number: str) -> bool:
         """Delete a flight from the system"""
+        self.ready.wait()
         if self.db.delete_flight(flight_number):
-            # Reload data from the database
-            self.load_data()
+            position = self._position(self.flights, "flight_number", flight_number)
+            if position != -1:
+                flight = self.flights[position]
+                del self.flights[position]
+                self.flight_index.remove(flight)
+                self.slot_index.remove(flight)
+                if self.allocation_state is not None:
+                    self.allocation_state.remove_flight(flight)
+            self._data_changed()
             return True
         return False
 
     def delete_cargo(self, cargo_id: str) -> bool:
         """Delete a cargo request from the system"""
+        self.ready.wait()
         if self.db.delete_cargo(cargo_id):
-            # Reload data from the database
-            self.load_data()
+            position = self._position(self.cargo_requests, "cargo_id", cargo_id)
+            if position != -1:
+                cargo = self.cargo_requests[position]
+                del self.cargo_requests[position]
+                if self.allocation_state is not None:
+                    self.allocation_state.remove_cargo(cargo)
+            self._data_changed()
             return True
         return False
 
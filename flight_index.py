@@ -0,0 +1,75 @@
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+from typing import List, Dict, Iterable, Tuple
+
+
+class AircraftIntervalIndex:
+    """Flight time windows per aircraft type, kept sorted by departure time
+
+    Alongside the sorted departures each type remembers its longest flight, so
+    every window overlapping [start, end] departs within
+    [start - longest, end] and can be found with two bisects.
+    """
+
+    def __init__(self, flights: Iterable = ()):
+        self.departures: Dict[str, List] = {}
+        self.windows: Dict[str, List[Tuple]] = {}
+        self.longest: Dict[str, timedelta] = {}
+        self.flight_numbers = set()
+        for flight in flights:
+            self.add(flight)
+
+    def add(self, flight):
+        """Index a scheduled flight"""
+        key = (flight.departure_time, flight.arrival_time, flight.flight_number)
+        departures = self.departures.setdefault(flight.aircraft_type, [])
+        windows = self.windows.setdefault(flight.aircraft_type, [])
+        position = bisect_right(windows, key)
+        windows.insert(position, key)
+        departures.insert(position, flight.departure_time)
+        duration = flight.arrival_time - flight.departure_time
+        if duration > self.longest.get(flight.aircraft_type, timedelta(0)):
+            self.longest[flight.aircraft_type] = duration
+        self.flight_numbers.add(flight.flight_number)
+
+    def remove(self, flight):
+        """Drop a flight from the index"""
+        windows = self.windows.get(flight.aircraft_type, [])
+        key = (flight.departure_time, flight.arrival_time, flight.flight_number)
+        position = bisect_left(windows, key)
+        if position < len(windows) and windows[position] == key:
+            del windows[position]
+            del self.departures[flight.aircraft_type][position]
+        self.flight_numbers.discard(flight.flight_number)
+
+    def overlapping(self, aircraft_type: str, start, end) -> List[Tuple]:
+        """(departure, arrival, flight_number) of every flight of this type overlapping [start, end]"""
+        departures = self.departures.get(aircraft_type)
+        if not departures:
+            return []
+        windows = self.windows[aircraft_type]
+        low = bisect_left(departures, start - self.longest[aircraft_type])
+        high = bisect_right(departures, end)
+        return [window for window in windows[low:high] if window[1] >= start]
+
+    def max_concurrent(self, aircraft_type: str, start, end) -> int:
+        """Most flights of this type airborne at the same moment within [start, end]"""
+        events = []
+        for departure, arrival, _ in self.overlapping(aircraft_type, start, end):
+            # Windows are closed, so a start sorts before an end at the same instant
+            events.append((max(departure, start), 0))
+            events.append((min(arrival, end), 1))
+        events.sort()
+        active = peak = 0
+        for _, is_end in events:
+            if is_end:
+                active -= 1
+            else:
+                active += 1
+                if active > peak:
+                    peak = active
+        return peak
+
+    def has_capacity(self, aircraft_type: str, start, end, fleet_count: int) -> bool:
+        """Whether one more flight of this type fits in [start, end] with fleet_count aircraft"""
+        return self.max_concurrent(aircraft_type, start, end) < fleet_count
@@ -1,16 +1,34 @@
+import time
+START_TIME = time.perf_counter()
+
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 from expert_system import AirlineSchedulingExpertSystem, Flight, Cargo
+import profiling
+from worker import BackgroundWorker
+from listview import VirtualListModel, VirtualTreeview
 import datetime
 
+IMPORT_TIME = time.perf_counter() - START_TIME
+
 class AirlineSchedulingGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("Airline Scheduling Expert System")
         self.root.geometry("1200x800")
+        profiling.enable_from_environment()
+        self.profiler = None
+        self.captured_profile = None
+        
+        # Initialize the expert system; flights and cargo load in the background
+        self.expert_system = AirlineSchedulingExpertSystem(fast_start=True)
+        self.expert_system.record_startup("import", IMPORT_TIME)
         
-        # Initialize the expert system
-        self.expert_system = AirlineSchedulingExpertSystem()
+        # Database calls and optimization run on a background worker so the window stays responsive;
+        # the lists page through MongoDB on their own worker so scrolling never queues behind a long job
+        self.worker = BackgroundWorker(root.after, on_progress=self.set_status, on_busy=self.set_busy)
+        self.list_worker = BackgroundWorker(root.after)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         # Create the main notebook (tabbed interface)
         self.notebook = ttk.Notebook(root)
@@ -32,10 +50,54 @@ class AirlineSchedulingGUI:
         self.setup_cargo_tab()
         self.setup_schedule_tab()
         self.setup_settings_tab()
+        self.setup_status_bar()
         
-        # Load initial data
+        # Draw the window now and fill the lists once the data has loaded
+        self.root.after_idle(self.on_first_paint)
+        self.root.after(50, self.wait_for_data)
+
+    def on_first_paint(self):
+        self.expert_system.record_startup("first_paint", time.perf_counter() - START_TIME)
+
+    def on_close(self):
+        self.worker.shutdown()
+        self.list_worker.shutdown()
+        self.root.destroy()
+
+    def set_status(self, message):
+        self.status.set(message)
+
+    def set_busy(self, busy):
+        if busy:
+            self.progress.start(10)
+        else:
+            self.progress.stop()
+            self.status.set("Ready")
+
+    def show_error(self, error):
+        messagebox.showerror("Error", f"An error occurred: {str(error)}")
+
+    def wait_for_data(self):
+        if not self.expert_system.ready.is_set():
+            self.root.after(50, self.wait_for_data)
+            return
+        if self.expert_system.load_error:
+            messagebox.showerror("Error", f"Could not load data: {self.expert_system.load_error}")
+        # The reference data is seeded on the load thread, so it is only read once that is done
+        self.load_reference_data()
         self.refresh_flight_list()
         self.refresh_cargo_list()
+        self.status.set("Ready")
+        report = self.expert_system.startup_report()
+        print("Startup: " + ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in report.items()))
+
+    def setup_status_bar(self):
+        status_frame = ttk.Frame(self.root)
+        status_frame.pack(fill='x', side=tk.BOTTOM, padx=10, pady=(0, 5))
+        self.status = tk.StringVar(value="Loading data...")
+        ttk.Label(status_frame, textvariable=self.status).pack(side=tk.LEFT)
+        self.progress = ttk.Progressbar(status_frame, mode='indeterminate', length=150)
+        self.progress.pack(side=tk.RIGHT)
 
     def setup_flights_tab(self):
         # Flight Entry Form
@@ -49,17 +111,17 @@ class AirlineSchedulingGUI:
 
         # Departure Airport
         ttk.Label(entry_frame, text="Departure Airport:").grid(row=1, column=0, padx=5, pady=5)
-        self.departure_airport = ttk.Combobox(entry_frame, values=list(self.expert_system.get_airport_data().keys()))
+        self.departure_airport = ttk.Combobox(entry_frame)
         self.departure_airport.grid(row=1, column=1, padx=5, pady=5)
 
         # Arrival Airport
         ttk.Label(entry_frame, text="Arrival Airport:").grid(row=2, column=0, padx=5, pady=5)
-        self.arrival_airport = ttk.Combobox(entry_frame, values=list(self.expert_system.get_airport_data().keys()))
+        self.arrival_airport = ttk.Combobox(entry_frame)
         self.arrival_airport.grid(row=2, column=1, padx=5, pady=5)
 
         # Aircraft Type
         ttk.Label(entry_frame, text="Aircraft Type:").grid(row=3, column=0, padx=5, pady=5)
-        self.aircraft_type = ttk.Combobox(entry_frame, values=list(self.expert_system.get_fleet_data().keys()))
+        self.aircraft_type = ttk.Combobox(entry_frame)
         self.aircraft_type.grid(row=3, column=1, padx=5, pady=5)
 
         # Capacity
@@ -79,21 +141,24 @@ class AirlineSchedulingGUI:
         list_frame = ttk.LabelFrame(self.flights_frame, text="Current Flights", padding=10)
         list_frame.pack(fill='both', expand=True, padx=5, pady=5)
 
-        # Create Treeview
-        columns = ('Flight Number', 'Departure', 'Arrival', 'Aircraft', 'Capacity', 'Cargo Capacity')
-        self.flight_tree = ttk.Treeview(list_frame, columns=columns, show='headings')
-        
-        # Set column headings
-        for col in columns:
-            self.flight_tree.heading(col, text=col)
-            self.flight_tree.column(col, width=100)
-
-        # Add scrollbar
-        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.flight_tree.yview)
-        self.flight_tree.configure(yscrollcommand=scrollbar.set)
-        
-        self.flight_tree.pack(side=tk.LEFT, fill='both', expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # Create a virtual Treeview that pages, sorts and filters in the database
+        columns = (('Flight Number', 'flight_number'), ('Departure', 'departure_airport'),
+                   ('Arrival', 'arrival_airport'), ('Departure Time', 'departure_time'),
+                   ('Aircraft', 'aircraft_type'), ('Capacity', 'capacity'),
+                   ('Cargo Capacity', 'cargo_capacity'))
+        model = VirtualListModel(self.expert_system.db.count_flights, self.expert_system.db.page_flights,
+                                 lambda flight: (flight.flight_number, (
+                                     flight.flight_number,
+                                     flight.departure_airport,
+                                     flight.arrival_airport,
+                                     flight.departure_time.strftime("%Y-%m-%d %H:%M"),
+                                     flight.aircraft_type,
+                                     flight.capacity,
+                                     flight.cargo_capacity
+                                 )))
+        self.flight_list = VirtualTreeview(list_frame, self.list_worker, model, columns, name="flights",
+                                           filter_fields=('flight_number', 'departure_airport',
+                                                          'arrival_airport', 'aircraft_type'))
 
         # Add delete button
         ttk.Button(list_frame, text="Delete Selected", command=self.delete_selected_flight).pack(pady=5)
@@ -115,12 +180,12 @@ class AirlineSchedulingGUI:
 
         # Departure Airport
         ttk.Label(entry_frame, text="Departure Airport:").grid(row=2, column=0, padx=5, pady=5)
-        self.cargo_departure = ttk.Combobox(entry_frame, values=list(self.expert_system.get_airport_data().keys()))
+        self.cargo_departure = ttk.Combobox(entry_frame)
         self.cargo_departure.grid(row=2, column=1, padx=5, pady=5)
 
         # Arrival Airport
         ttk.Label(entry_frame, text="Arrival Airport:").grid(row=3, column=0, padx=5, pady=5)
-        self.cargo_arrival = ttk.Combobox(entry_frame, values=list(self.expert_system.get_airport_data().keys()))
+        self.cargo_arrival = ttk.Combobox(entry_frame)
         self.cargo_arrival.grid(row=3, column=1, padx=5, pady=5)
 
         # Priority
@@ -135,21 +200,20 @@ class AirlineSchedulingGUI:
         list_frame = ttk.LabelFrame(self.cargo_frame, text="Current Cargo Requests", padding=10)
         list_frame.pack(fill='both', expand=True, padx=5, pady=5)
 
-        # Create Treeview
-        columns = ('Cargo ID', 'Weight', 'Departure', 'Arrival', 'Priority', 'Deadline')
-        self.cargo_tree = ttk.Treeview(list_frame, columns=columns, show='headings')
-        
-        # Set column headings
-        for col in columns:
-            self.cargo_tree.heading(col, text=col)
-            self.cargo_tree.column(col, width=100)
-
-        # Add scrollbar
-        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.cargo_tree.yview)
-        self.cargo_tree.configure(yscrollcommand=scrollbar.set)
-        
-        self.cargo_tree.pack(side=tk.LEFT, fill='both', expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # Create a virtual Treeview that pages, sorts and filters in the database
+        columns = (('Cargo ID', 'cargo_id'), ('Weight', 'weight'), ('Departure', 'departure_airport'),
+                   ('Arrival', 'arrival_airport'), ('Priority', 'priority'), ('Deadline', 'deadline'))
+        model = VirtualListModel(self.expert_system.db.count_cargo, self.expert_system.db.page_cargo,
+                                 lambda cargo: (cargo.cargo_id, (
+                                     cargo.cargo_id,
+                                     cargo.weight,
+                                     cargo.departure_airport,
+                                     cargo.arrival_airport,
+                                     cargo.priority,
+                                     cargo.deadline.strftime("%Y-%m-%d %H:%M")
+                                 )))
+        self.cargo_list = VirtualTreeview(list_frame, self.list_worker, model, columns, name="cargo",
+                                          filter_fields=('cargo_id', 'departure_airport', 'arrival_airport'))
 
         # Add delete button
         ttk.Button(list_frame, text="Delete Selected", command=self.delete_selected_cargo).pack(pady=5)
@@ -164,6 +228,14 @@ class AirlineSchedulingGUI:
         ttk.Button(analysis_frame, text="Optimize Cargo", command=self.show_cargo_optimization).pack(fill='x', pady=5)
         ttk.Button(analysis_frame, text="Get Suggestions", command=self.show_suggestions).pack(fill='x', pady=5)
 
+        # Diagnostics: where the time of the actions above goes
+        diagnostics_frame = ttk.LabelFrame(self.schedule_frame, text="Diagnostics", padding=10)
+        diagnostics_frame.pack(fill='x', padx=5, pady=5)
+        self.profile_button = ttk.Button(diagnostics_frame, text="Start Profiling", command=self.toggle_profiling)
+        self.profile_button.pack(side=tk.LEFT, padx=5)
+        ttk.Button(diagnostics_frame, text="Show Metrics", command=self.show_metrics).pack(side=tk.LEFT, padx=5)
+        ttk.Button(diagnostics_frame, text="Export Metrics...", command=self.export_metrics).pack(side=tk.LEFT, padx=5)
+
         # Results Frame
         results_frame = ttk.LabelFrame(self.schedule_frame, text="Analysis Results", padding=10)
         results_frame.pack(fill='both', expand=True, padx=5, pady=5)
@@ -173,70 +245,58 @@ class AirlineSchedulingGUI:
         self.results_text.pack(fill='both', expand=True)
 
     def setup_settings_tab(self):
-        # Fleet Settings
-        fleet_frame = ttk.LabelFrame(self.settings_frame, text="Fleet Management", padding=10)
-        fleet_frame.pack(fill='x', padx=5, pady=5)
+        # Fleet Settings; the entries are added by show_reference_data once the data has loaded
+        self.fleet_frame = ttk.LabelFrame(self.settings_frame, text="Fleet Management", padding=10)
+        self.fleet_frame.pack(fill='x', padx=5, pady=5)
+        self.fleet_entries = {}
+
+        # Airport Settings
+        self.airport_frame = ttk.LabelFrame(self.settings_frame, text="Airport Management", padding=10)
+        self.airport_frame.pack(fill='x', padx=5, pady=5)
+        self.airport_entries = {}
+
+        # Save Settings Button
+        ttk.Button(self.settings_frame, text="Save Settings", command=self.save_settings).pack(pady=10)
+
+    def load_reference_data(self):
+        """Fetch fleet and airport data on the worker, then fill the pickers and Settings grids"""
+        def load():
+            return self.expert_system.get_fleet_data(), self.expert_system.get_airport_data()
+
+        self.worker.submit(load, on_done=self.show_reference_data, on_error=self.show_error)
+
+    def show_reference_data(self, result):
+        fleet_data, airport_data = result
+        airports = list(airport_data.keys())
+        for combobox in (self.departure_airport, self.arrival_airport, self.cargo_departure, self.cargo_arrival):
+            combobox['values'] = airports
+        self.aircraft_type['values'] = list(fleet_data.keys())
 
         # Create entries for each aircraft type
         self.fleet_entries = {}
-        row = 0
-        for aircraft, count in self.expert_system.get_fleet_data().items():
-            ttk.Label(fleet_frame, text=f"{aircraft}:").grid(row=row, column=0, padx=5, pady=5)
-            entry = ttk.Entry(fleet_frame)
+        for row, (aircraft, count) in enumerate(fleet_data.items()):
+            ttk.Label(self.fleet_frame, text=f"{aircraft}:").grid(row=row, column=0, padx=5, pady=5)
+            entry = ttk.Entry(self.fleet_frame)
             entry.insert(0, str(count))
             entry.grid(row=row, column=1, padx=5, pady=5)
             self.fleet_entries[aircraft] = entry
-            row += 1
-
-        # Airport Settings
-        airport_frame = ttk.LabelFrame(self.settings_frame, text="Airport Management", padding=10)
-        airport_frame.pack(fill='x', padx=5, pady=5)
 
         # Create entries for each airport
         self.airport_entries = {}
-        row = 0
-        for airport, capacity in self.expert_system.get_airport_data().items():
-            ttk.Label(airport_frame, text=f"{airport} Capacity:").grid(row=row, column=0, padx=5, pady=5)
-            entry = ttk.Entry(airport_frame)
+        for row, (airport, capacity) in enumerate(airport_data.items()):
+            ttk.Label(self.airport_frame, text=f"{airport} Capacity:").grid(row=row, column=0, padx=5, pady=5)
+            entry = ttk.Entry(self.airport_frame)
             entry.insert(0, str(capacity))
             entry.grid(row=row, column=1, padx=5, pady=5)
             self.airport_entries[airport] = entry
-            row += 1
-
-        # Save Settings Button
-        ttk.Button(self.settings_frame, text="Save Settings", command=self.save_settings).pack(pady=10)
 
     def refresh_flight_list(self):
-        # Clear existing items
-        for item in self.flight_tree.get_children():
-            self.flight_tree.delete(item)
-        
-        # Add all flights from the expert system
-        for flight in self.expert_system.flights:
-            self.flight_tree.insert('', 'end', values=(
-                flight.flight_number,
-                flight.departure_airport,
-                flight.arrival_airport,
-                flight.aircraft_type,
-                flight.capacity,
-                flight.cargo_capacity
-            ))
+        # Only the rows on screen are fetched again and patched in place
+        self.flight_list.refresh()
 
     def refresh_cargo_list(self):
-        # Clear existing items
-        for item in self.cargo_tree.get_children():
-            self.cargo_tree.delete(item)
-        
-        # Add all cargo from the expert system
-        for cargo in self.expert_system.cargo_requests:
-            self.cargo_tree.insert('', 'end', values=(
-                cargo.cargo_id,
-                cargo.weight,
-                cargo.departure_airport,
-                cargo.arrival_airport,
-                cargo.priority,
-                cargo.deadline
-            ))
+        # Only the rows on screen are fetched again and patched in place
+        self.cargo_list.refresh()
 
     def add_flight(self):
         try:
@@ -251,13 +311,19 @@ class AirlineSchedulingGUI:
                 cargo_capacity=float(self.cargo_capacity.get())
             )
 
-            if self.expert_system.add_flight(flight):
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid input: {str(e)}")
+            return
+
+        def done(added):
+            if added:
                 self.refresh_flight_list()
                 messagebox.showinfo("Success", "Flight added successfully!")
             else:
                 messagebox.showerror("Error", "Flight could not be added. Check for conflicts.")
-        except ValueError as e:
-            messagebox.showerror("Error", f"Invalid input: {str(e)}")
+
+        self.worker.submit(self.expert_system.add_flight, flight, on_done=done, on_error=self.show_error,
+                           message=f"Adding flight {flight.flight_number}...")
 
     def add_cargo(self):
         try:
@@ -269,7 +335,12 @@ class AirlineSchedulingGUI:
                 priority=int(self.priority.get()),
                 deadline=datetime.datetime.now() + datetime.timedelta(days=1)
             )
-            if self.expert_system.add_cargo(cargo):
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid input: {str(e)}")
+            return
+
+        def done(added):
+            if added:
                 messagebox.showinfo("Success", "Cargo request added successfully!")
                 self.refresh_cargo_list()
                 # Clear the form
@@ -280,76 +351,152 @@ class AirlineSchedulingGUI:
                 self.priority.set(1)
             else:
                 messagebox.showerror("Error", "Failed to add cargo request")
-        except ValueError as e:
-            messagebox.showerror("Error", f"Invalid input: {str(e)}")
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+
+        self.worker.submit(self.expert_system.add_cargo, cargo, on_done=done, on_error=self.show_error,
+                           message=f"Adding cargo {cargo.cargo_id}...")
 
     def delete_selected_flight(self):
-        selected_item = self.flight_tree.selection()
-        if not selected_item:
+        flight_number = self.flight_list.selected_key()
+        if flight_number is None:
             messagebox.showwarning("Warning", "Please select a flight to delete")
             return
-        
-        flight_number = self.flight_tree.item(selected_item[0])['values'][0]
-        if self.expert_system.delete_flight(flight_number):
-            self.refresh_flight_list()
-            messagebox.showinfo("Success", "Flight deleted successfully!")
-        else:
-            messagebox.showerror("Error", "Failed to delete flight")
+
+        def done(deleted):
+            if deleted:
+                self.refresh_flight_list()
+                messagebox.showinfo("Success", "Flight deleted successfully!")
+            else:
+                messagebox.showerror("Error", "Failed to delete flight")
+
+        self.worker.submit(self.expert_system.delete_flight, flight_number, on_done=done,
+                           on_error=self.show_error, message=f"Deleting flight {flight_number}...")
 
     def delete_selected_cargo(self):
-        selected_item = self.cargo_tree.selection()
-        if not selected_item:
+        cargo_id = self.cargo_list.selected_key()
+        if cargo_id is None:
             messagebox.showwarning("Warning", "Please select a cargo request to delete")
             return
-        
-        cargo_id = self.cargo_tree.item(selected_item[0])['values'][0]
-        if self.expert_system.delete_cargo(cargo_id):
-            self.refresh_cargo_list()
-            messagebox.showinfo("Success", "Cargo request deleted successfully!")
-        else:
-            messagebox.showerror("Error", "Failed to delete cargo request")
+
+        def done(deleted):
+            if deleted:
+                self.refresh_cargo_list()
+                messagebox.showinfo("Success", "Cargo request deleted successfully!")
+            else:
+                messagebox.showerror("Error", "Failed to delete cargo request")
+
+        self.worker.submit(self.expert_system.delete_cargo, cargo_id, on_done=done,
+                           on_error=self.show_error, message=f"Deleting cargo {cargo_id}...")
 
     def save_settings(self):
+        if not self.fleet_entries or not self.airport_entries:
+            # Saving before the grids are filled would store empty fleet and airport data
+            messagebox.showinfo("Loading", "Settings are still loading.")
+            return
         try:
             # Update fleet data
             new_fleet_data = {}
             for aircraft, entry in self.fleet_entries.items():
                 new_fleet_data[aircraft] = int(entry.get())
-            self.expert_system.db.update_fleet(new_fleet_data)
 
             # Update airport data
             new_airport_data = {}
             for airport, entry in self.airport_entries.items():
                 new_airport_data[airport] = int(entry.get())
-            self.expert_system.db.update_airports(new_airport_data)
-
-            messagebox.showinfo("Success", "Settings saved successfully!")
         except ValueError as e:
             messagebox.showerror("Error", f"Invalid input: {str(e)}")
+            return
+
+        def save():
+            self.expert_system.db.update_fleet(new_fleet_data)
+            self.expert_system.db.update_airports(new_airport_data)
+
+        self.worker.submit(save, on_done=lambda result: messagebox.showinfo("Success", "Settings saved successfully!"),
+                           on_error=self.show_error, message="Saving settings...")
 
     def show_conflicts(self):
         # This method is no longer needed as we check conflicts when adding flights
         self.results_text.delete(1.0, tk.END)
         self.results_text.insert(tk.END, "Flight conflicts are checked automatically when adding flights.")
 
-    def show_cargo_optimization(self):
-        allocations = self.expert_system.optimize_cargo_allocation()
+    def show_results(self, text):
         self.results_text.delete(1.0, tk.END)
-        self.results_text.insert(tk.END, "Cargo Allocations:\n\n")
-        for flight_number, cargo_list in allocations.items():
-            self.results_text.insert(tk.END, f"Flight {flight_number}:\n")
-            for cargo in cargo_list:
-                self.results_text.insert(tk.END, 
-                    f"  - Cargo {cargo.cargo_id}: {cargo.weight} tons\n")
+        self.results_text.insert(tk.END, text)
+
+    def show_cargo_optimization(self):
+        def optimize(job):
+            # Checked between routes, so a superseded run stops allocating too
+            allocations = self.expert_system.optimize_cargo_allocation(cancelled=job.cancelled)
+            if allocations is None:
+                return None
+            job.report_progress("Formatting allocations...")
+            # Build the text off the UI thread and insert it in one call
+            lines = ["Cargo Allocations:\n"]
+            for flight_number, cargo_list in allocations.items():
+                if job.cancelled.is_set():
+                    return None
+                lines.append(f"Flight {flight_number}:")
+                for cargo in cargo_list:
+                    lines.append(f"  - Cargo {cargo.cargo_id}: {cargo.weight} tons")
+            return "\n".join(lines) + "\n"
+
+        # A new analysis supersedes one still running
+        self.worker.submit(optimize, on_done=self.show_results, on_error=self.show_error,
+                           key="analysis", message="Optimizing cargo allocation...", pass_job=True)
 
     def show_suggestions(self):
-        suggestions = self.expert_system.suggest_improvements()
-        self.results_text.delete(1.0, tk.END)
-        self.results_text.insert(tk.END, "Schedule Improvement Suggestions:\n\n")
-        for suggestion in suggestions:
-            self.results_text.insert(tk.END, f"• {suggestion}\n")
+        def suggest():
+            suggestions = self.expert_system.suggest_improvements()
+            return "Schedule Improvement Suggestions:\n\n" + "".join(f"• {s}\n" for s in suggestions)
+
+        self.worker.submit(suggest, on_done=self.show_results, on_error=self.show_error,
+                           key="analysis", message="Analyzing schedule...")
+
+    def toggle_profiling(self):
+        """Start or stop metrics and a cProfile capture of the background worker"""
+        if self.profiler is None:
+            profiling.metrics.reset()
+            profiling.enable()
+            self.profiler = profiling.Profiler()
+            # cProfile only sees the thread that starts it, which must be the worker's
+            self.worker.submit(self.profiler.start)
+            self.profile_button.config(text="Stop Profiling")
+            self.set_status("Profiling: run the slow action, then stop profiling")
+            return
+
+        profiler = self.profiler
+        self.profiler = None
+        self.profile_button.config(text="Start Profiling")
+
+        def stop():
+            profiler.stop()
+            return profiler
+
+        def done(profiler):
+            profiling.enable(False)
+            self.captured_profile = profiler
+            self.show_results("Stages:\n" + profiling.metrics.report() + "\n\nProfile:\n" + profiler.summary())
+
+        self.worker.submit(stop, on_done=done, on_error=self.show_error)
+
+    def show_metrics(self):
+        if not profiling.enabled() and not profiling.metrics.histograms:
+            self.show_results("Metrics are off. Start profiling, or set AIRLINE_SCHEDULING_METRICS=1.")
+            return
+        self.show_results(profiling.metrics.report())
+
+    def export_metrics(self):
+        path = filedialog.asksaveasfilename(title="Export Metrics", defaultextension=".prom",
+                                            filetypes=[("Prometheus text", "*.prom"), ("JSON", "*.json")])
+        if not path:
+            return
+        try:
+            profiling.metrics.export(path)
+            if self.captured_profile is not None:
+                self.captured_profile.dump(path.rsplit(".", 1)[0] + ".pstats")
+        except OSError as e:
+            self.show_error(e)
+            return
+        self.set_status(f"Metrics written to {path}")
 
 if __name__ == "__main__":
     root = tk.Tk()
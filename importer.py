@@ -0,0 +1,136 @@
+import argparse
+import csv
+import json
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterator, Optional
+
+from database import Flight, Cargo
+
+# Only this many failures are kept in the summary so memory stays flat on huge files
+MAX_REPORTED_ERRORS = 100
+
+
+def iter_rows(path: str) -> Iterator[Dict]:
+    """Stream rows from a CSV file or a JSON-lines file (.jsonl/.ndjson)
+
+    A .json file holds one JSON array of rows; it is parsed whole, so use
+    JSON lines for files too large to hold in memory.
+    """
+    with open(path, newline="", encoding="utf-8") as handle:
+        if path.endswith(".json"):
+            rows = json.load(handle)
+            if not isinstance(rows, list):
+                raise ValueError(f"{path}: expected a JSON array of rows")
+            yield from rows
+        elif path.endswith((".jsonl", ".ndjson")):
+            for line in handle:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(handle)
+
+
+def _parse_time(value) -> datetime:
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+
+def parse_flight(row: Dict) -> Flight:
+    """Build a Flight from an imported row"""
+    return Flight(
+        flight_number=str(row["flight_number"]),
+        departure_airport=row["departure_airport"],
+        arrival_airport=row["arrival_airport"],
+        departure_time=_parse_time(row["departure_time"]),
+        arrival_time=_parse_time(row["arrival_time"]),
+        aircraft_type=row["aircraft_type"],
+        capacity=int(row["capacity"]),
+        cargo_capacity=float(row["cargo_capacity"])
+    )
+
+
+def parse_cargo(row: Dict) -> Cargo:
+    """Build a Cargo request from an imported row"""
+    return Cargo(
+        cargo_id=str(row["cargo_id"]),
+        weight=float(row["weight"]),
+        departure_airport=row["departure_airport"],
+        arrival_airport=row["arrival_airport"],
+        priority=int(row["priority"]),
+        deadline=_parse_time(row["deadline"])
+    )
+
+
+def import_file(expert_system, path: str, kind: str, chunk_size: int = 1000,
+                check_feasibility: bool = True) -> Dict:
+    """Import flights or cargo from a file in chunks of chunk_size rows
+
+    Only one chunk is read at a time. Cargo, and flights when
+    check_feasibility is off, go straight to the database without being
+    held by the expert system, so memory stays flat however large the file
+    is. Checked flights go through the expert system, which keeps them
+    indexed so later rows are checked against them. Returns counts plus the
+    first MAX_REPORTED_ERRORS failures.
+    """
+    parse = parse_flight if kind == "flights" else parse_cargo
+    summary = {"read": 0, "inserted": 0, "failed": 0, "errors": []}
+
+    def record_failure(key: str, error: Optional[str]):
+        summary["failed"] += 1
+        if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+            summary["errors"].append({"key": key, "error": error})
+
+    rows = iter_rows(path)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        records = []
+        for row in chunk:
+            summary["read"] += 1
+            try:
+                records.append(parse(row))
+            except (KeyError, TypeError, ValueError) as e:
+                record_failure(f"row {summary['read']}", f"unparseable row: {e}")
+        if kind == "cargo":
+            results = expert_system.db.add_cargo_bulk(records, chunk_size)
+        elif check_feasibility:
+            results = expert_system.add_flights_bulk(records, True, chunk_size)
+        else:
+            results = expert_system.db.add_flights_bulk(records, chunk_size)
+        for result in results:
+            if result.success:
+                summary["inserted"] += 1
+            else:
+                record_failure(result.key, result.error)
+    return summary
+
+
+if __name__ == "__main__":
+    from expert_system import AirlineSchedulingExpertSystem
+
+    parser = argparse.ArgumentParser(description="Import flights or cargo from CSV or JSON lines")
+    parser.add_argument("kind", choices=["flights", "cargo"])
+    parser.add_argument("path")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--skip-feasibility", action="store_true",
+                        help="insert flights without checking them against the schedule")
+    parser.add_argument("--from", dest="departure_from", type=datetime.fromisoformat,
+                        help="check flights only against the schedule departing from this time (ISO 8601)")
+    parser.add_argument("--until", dest="departure_until", type=datetime.fromisoformat,
+                        help="... and before this time")
+    args = parser.parse_args()
+
+    # Nothing is loaded up front; checked flights need the schedule they are checked against
+    expert_system = AirlineSchedulingExpertSystem(load=False)
+    try:
+        if args.kind == "flights" and not args.skip_feasibility:
+            expert_system.load_data(args.departure_from, args.departure_until)
+        summary = import_file(expert_system, args.path, args.kind, args.chunk_size,
+                              not args.skip_feasibility)
+    finally:
+        expert_system.close()
+    print(f"Read {summary['read']}, inserted {summary['inserted']}, failed {summary['failed']}")
+    for error in summary["errors"]:
+        print(f"  {error['key']}: {error['error']}")
@@ -0,0 +1,198 @@
+from collections import Counter
+import threading
+from typing import List, Dict, Tuple, Iterable, Set, Optional
+
+from allocation import allocate_greedy
+
+Route = Tuple[str, str]
+
+
+def route_of(record) -> Route:
+    """(departure_airport, arrival_airport) of a flight or cargo request"""
+    return record.departure_airport, record.arrival_airport
+
+
+class IncrementalAllocation:
+    """Greedy cargo allocation kept up to date as flights and cargo change
+
+    Greedy allocation never moves cargo between routes, so a change to one
+    flight or cargo request can only change the loads of its own route. Each
+    change marks that route dirty, and allocation() re-runs the greedy pass
+    over just the dirty routes. The result is therefore identical to a full
+    allocate_greedy run (see verify) while an update costs time proportional
+    to the route, not the schedule. Repeated flight numbers resolve as in
+    allocate_greedy: the last flight with the number in schedule order wins.
+    """
+
+    def __init__(self, flights: Iterable, cargo_requests: Iterable):
+        self.route_flights: Dict[Route, List] = {}
+        self.route_cargo: Dict[Route, List] = {}
+        # Each route's own greedy result; loads takes every flight number from
+        # the route of its last flight, as allocate_greedy does when numbers repeat
+        self.route_loads: Dict[Route, Dict[str, List]] = {}
+        # flight_number -> (sequence, route) of its flights, in schedule order
+        self.holders: Dict[str, List[Tuple[int, Route]]] = {}
+        self.loads: Dict[str, List] = {}
+        self.dirty: Set[Route] = set()
+        # Flight numbers whose holders changed since the last allocation()
+        self.stale: Set[str] = set()
+        # Set when a repeated number loses its first flight, which moves its key
+        self.reorder = False
+        self.sequence = 0
+        self.events = 0
+        self.routes_reallocated = 0
+        for flight in flights:
+            self._hold(flight)
+        for cargo in cargo_requests:
+            self.route_cargo.setdefault(route_of(cargo), []).append(cargo)
+
+    def _hold(self, flight):
+        route = route_of(flight)
+        self.route_flights.setdefault(route, []).append(flight)
+        holders = self.holders.setdefault(flight.flight_number, [])
+        if not holders:
+            # Placeholders keep the keys in flight order, as allocate_greedy returns them
+            self.loads[flight.flight_number] = []
+        holders.append((self.sequence, route))
+        self.sequence += 1
+        self.stale.add(flight.flight_number)
+        self.dirty.add(route)
+
+    def _release(self, flight_number: str, route: Route):
+        """Drop the first flight numbered flight_number on route from the holders"""
+        holders = self.holders.get(flight_number, [])
+        for i, (_, held_on) in enumerate(holders):
+            if held_on == route:
+                del holders[i]
+                if i == 0 and holders:
+                    self.reorder = True
+                break
+        if not holders:
+            self.holders.pop(flight_number, None)
+            self.loads.pop(flight_number, None)
+        self.stale.add(flight_number)
+        self.dirty.add(route)
+
+    def add_flight(self, flight):
+        """A flight was scheduled (after every flight already known)"""
+        self.events += 1
+        self._hold(flight)
+
+    def remove_flight(self, flight):
+        """A flight was cancelled; its cargo goes back to its route's queue
+
+        With repeated flight numbers the first one on the flight's route is
+        removed, as the scheduler removes the first one it holds.
+        """
+        self.events += 1
+        route = route_of(flight)
+        flights = self.route_flights.get(route, [])
+        for i, scheduled in enumerate(flights):
+            if scheduled.flight_number == flight.flight_number:
+                del flights[i]
+                break
+        self._release(flight.flight_number, route)
+
+    def add_cargo(self, cargo):
+        """A cargo request was added (after every request already known)"""
+        self.events += 1
+        route = route_of(cargo)
+        self.route_cargo.setdefault(route, []).append(cargo)
+        if route in self.route_flights:
+            self.dirty.add(route)
+
+    def remove_cargo(self, cargo):
+        """A cargo request was withdrawn; its capacity is back-filled from the route's queue"""
+        self.events += 1
+        route = route_of(cargo)
+        requests = self.route_cargo.get(route, [])
+        for i, request in enumerate(requests):
+            if request.cargo_id == cargo.cargo_id:
+                del requests[i]
+                break
+        if route in self.route_flights:
+            self.dirty.add(route)
+
+    def remove_many(self, flights: Iterable, cargo_requests: Iterable):
+        """Flights and cargo requests withdrawn together, e.g. expired from a rolling horizon
+
+        Same result as removing them one at a time, but each affected route's
+        lists are filtered once instead of searched per record.
+        """
+        gone_flights: Dict[Route, Counter] = {}
+        for flight in flights:
+            self.events += 1
+            route = route_of(flight)
+            gone_flights.setdefault(route, Counter())[flight.flight_number] += 1
+            self._release(flight.flight_number, route)
+        for route, numbers in gone_flights.items():
+            # Like remove_flight, drop the first flights with each number
+            kept = []
+            for flight in self.route_flights.get(route, []):
+                if numbers[flight.flight_number] > 0:
+                    numbers[flight.flight_number] -= 1
+                else:
+                    kept.append(flight)
+            self.route_flights[route] = kept
+        gone_cargo: Dict[Route, Set[str]] = {}
+        for cargo in cargo_requests:
+            self.events += 1
+            gone_cargo.setdefault(route_of(cargo), set()).add(cargo.cargo_id)
+        for route, cargo_ids in gone_cargo.items():
+            self.route_cargo[route] = [cargo for cargo in self.route_cargo.get(route, [])
+                                       if cargo.cargo_id not in cargo_ids]
+            if route in self.route_flights:
+                self.dirty.add(route)
+
+    def is_current(self) -> bool:
+        """Whether allocation() can answer without reallocating anything"""
+        return not self.dirty
+
+    def allocation(self, cancelled: Optional[threading.Event] = None) -> Optional[Dict[str, List]]:
+        """flight_number -> cargo, reallocating only the routes changed since the last call
+
+        The dict is updated in place by later calls; copy it to keep a snapshot.
+        cancelled is checked between routes: once it is set this returns None,
+        and the routes not reallocated yet stay dirty for the next call.
+        """
+        changed = self.stale
+        for route in list(self.dirty):
+            if cancelled is not None and cancelled.is_set():
+                break
+            flights = self.route_flights.get(route)
+            if flights:
+                self.route_loads[route] = allocate_greedy(flights, self.route_cargo.get(route, ()))
+                changed.update(self.route_loads[route])
+            else:
+                self.route_loads.pop(route, None)
+            self.dirty.discard(route)
+            self.routes_reallocated += 1
+        for number in changed:
+            holders = self.holders.get(number)
+            # Numbers held on a route still dirty are picked up when it is reallocated
+            if holders and holders[-1][1] not in self.dirty:
+                self.loads[number] = self.route_loads[holders[-1][1]][number]
+        if self.reorder:
+            ordered = sorted(self.loads, key=lambda number: self.holders[number][0][0])
+            loads = dict(self.loads)
+            self.loads.clear()
+            self.loads.update((number, loads[number]) for number in ordered)
+            self.reorder = False
+        self.stale = set()
+        if self.dirty:
+            return None
+        return self.loads
+
+    def verify(self, flights: Iterable, cargo_requests: Iterable) -> List[str]:
+        """Flight numbers whose loads differ from a full recompute; empty when in sync"""
+        expected = allocate_greedy(flights, cargo_requests)
+        actual = self.allocation()
+        if list(expected) != list(actual):
+            return sorted(set(expected).symmetric_difference(actual)) or ["<flight order>"]
+        return [number for number, cargo_list in expected.items()
+                if [c.cargo_id for c in cargo_list] != [c.cargo_id for c in actual[number]]]
+
+    def stats(self) -> Dict[str, int]:
+        """Changes seen and routes reallocated so far"""
+        return {"events": self.events, "routes_reallocated": self.routes_reallocated,
+                "dirty_routes": len(self.dirty)}
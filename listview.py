@@ -0,0 +1,239 @@
+import tkinter as tk
+from collections import OrderedDict
+from tkinter import ttk
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import profiling
+
+Row = Tuple[str, tuple]  # (key, column values)
+
+
+class VirtualListModel:
+    """Rows of a filtered, sorted server-side list, fetched in blocks and cached
+
+    count(filters) and fetch(filters, sort_by, descending, skip, limit, after)
+    do the filtering, sorting and paging on the server, and row(record) turns
+    a fetched record into (key, values). A block is fetched relative to the
+    nearest cached block, or to the end of the list, with after set to the
+    (sort value, key) of the row next to it, so the server seeks through its
+    index instead of skipping every row before the block. Only the blocks
+    around what is on screen are held, so memory does not grow with the size
+    of the list. Use it from one thread only (the GUI's background worker).
+    """
+
+    def __init__(self, count: Callable, fetch: Callable, row: Callable[[object], Row],
+                 block_size: int = 200, max_blocks: int = 20):
+        self.count = count
+        self.fetch = fetch
+        self.row = row
+        self.block_size = block_size
+        self.max_blocks = max_blocks
+        self.query = None
+        self.total = 0
+        self.blocks: "OrderedDict[int, List[Row]]" = OrderedDict()
+        # block number -> (sort value, key) anchors of its first and last rows
+        self.edges: Dict[int, Tuple[tuple, tuple]] = {}
+
+    def invalidate(self):
+        """Forget cached rows and the row count, e.g. after records were added or deleted"""
+        self.query = None
+        self.blocks.clear()
+        self.edges.clear()
+
+    def _fetch(self, number: int) -> list:
+        """The records of a block, fetched from the closest known position"""
+        filters, sort_by, descending = self.query
+        start = number * self.block_size
+        # From the top, from the bottom (reading the list backwards), or from a cached block
+        skip, after, backwards = start, None, False
+        if self.total - start - self.block_size < skip:
+            skip, backwards = max(0, self.total - start - self.block_size), True
+        for cached, (first, last) in self.edges.items():
+            if cached < number and (number - cached - 1) * self.block_size < skip:
+                skip, after, backwards = (number - cached - 1) * self.block_size, last, False
+            elif cached > number and (cached - number - 1) * self.block_size < skip:
+                skip, after, backwards = (cached - number - 1) * self.block_size, first, True
+        if not backwards:
+            return self.fetch(dict(filters), sort_by, descending, skip, self.block_size, after)
+        limit = min(self.block_size, self.total - start)
+        if limit <= 0:
+            return []
+        records = self.fetch(dict(filters), sort_by, not descending, skip, limit, after)
+        records.reverse()
+        return records
+
+    def _block(self, number: int) -> List[Row]:
+        block = self.blocks.get(number)
+        if block is None:
+            sort_by = self.query[1]
+            records = self._fetch(number)
+            block = [self.row(record) for record in records]
+            self.blocks[number] = block
+            if block:
+                self.edges[number] = ((getattr(records[0], sort_by), block[0][0]),
+                                      (getattr(records[-1], sort_by), block[-1][0]))
+            if len(self.blocks) > self.max_blocks:
+                evicted, _ = self.blocks.popitem(last=False)
+                self.edges.pop(evicted, None)
+        else:
+            self.blocks.move_to_end(number)
+        return block
+
+    def window(self, filters: Dict, sort_by: str, descending: bool, offset: int,
+               size: int) -> Tuple[int, int, List[Row]]:
+        """(total rows, clamped offset, rows) for size rows starting at offset"""
+        query = (tuple(sorted(filters.items())), sort_by, descending)
+        if query != self.query:
+            self.blocks.clear()
+            self.edges.clear()
+            self.query = query
+            self.total = self.count(dict(filters))
+        offset = max(0, min(offset, self.total - size))
+        rows = []
+        for number in range(offset // self.block_size, (offset + size - 1) // self.block_size + 1):
+            rows.extend(self._block(number))
+        start = offset - (offset // self.block_size) * self.block_size
+        return self.total, offset, rows[start:start + size]
+
+
+class VirtualTreeview:
+    """A ttk.Treeview that only holds the rows on screen
+
+    The tree is given exactly `height` rows and its own scrollbar; scrolling
+    moves a window over the model and the rows that change are patched in
+    place, keyed by record key (used as the item id). Fetches run on the
+    background worker, and a newer scroll, sort or filter supersedes an
+    older one still waiting. Clicking a heading sorts by that column;
+    filter_fields can be matched by prefix from the filter box.
+    """
+
+    def __init__(self, parent, worker, model: VirtualListModel, columns: Sequence[Tuple[str, str]],
+                 filter_fields: Sequence[str] = (), sort_by: Optional[str] = None, height: int = 20,
+                 name: str = "list"):
+        self.worker = worker
+        self.model = model
+        self.fields = dict(columns)
+        self.height = height
+        self.job_key = name
+        self.sort_by = sort_by or columns[0][1]
+        self.descending = False
+        self.filters: Dict[str, str] = {}
+        self.offset = 0
+        self.total = 0
+        self.rows: Dict[str, tuple] = {}
+        self.pending_filter = None
+
+        if filter_fields:
+            filter_frame = ttk.Frame(parent)
+            filter_frame.pack(fill='x', pady=(0, 5))
+            ttk.Label(filter_frame, text="Filter:").pack(side=tk.LEFT)
+            self.filter_field = ttk.Combobox(filter_frame, state='readonly', width=20,
+                                             values=[heading for heading, field in columns
+                                                     if field in filter_fields])
+            self.filter_field.current(0)
+            self.filter_field.pack(side=tk.LEFT, padx=5)
+            self.filter_text = ttk.Entry(filter_frame)
+            self.filter_text.pack(side=tk.LEFT, fill='x', expand=True)
+            self.filter_text.bind('<KeyRelease>', self.on_filter_typed)
+            self.filter_field.bind('<<ComboboxSelected>>', self.on_filter_typed)
+
+        tree_frame = ttk.Frame(parent)
+        tree_frame.pack(fill='both', expand=True)
+        self.tree = ttk.Treeview(tree_frame, columns=[heading for heading, field in columns],
+                                 show='headings', height=height, selectmode='browse')
+        for heading, field in columns:
+            self.tree.heading(heading, text=heading, command=lambda field=field: self.sort(field))
+            self.tree.column(heading, width=100)
+
+        self.scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.on_scroll)
+        self.tree.pack(side=tk.LEFT, fill='both', expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.tree.bind('<MouseWheel>', lambda event: self.scroll_by(-3 if event.delta > 0 else 3))
+        self.tree.bind('<Button-4>', lambda event: self.scroll_by(-3))
+        self.tree.bind('<Button-5>', lambda event: self.scroll_by(3))
+        self.tree.bind('<Prior>', lambda event: self.scroll_by(-height))
+        self.tree.bind('<Next>', lambda event: self.scroll_by(height))
+
+        self.summary = tk.StringVar()
+        ttk.Label(parent, textvariable=self.summary).pack(anchor='w')
+
+    def refresh(self, reload: bool = True):
+        """Fetch the rows on screen again; reload also drops the model's cache and row count"""
+        filters, sort_by, descending = dict(self.filters), self.sort_by, self.descending
+        offset, height = self.offset, self.height
+        model = self.model
+
+        def load():
+            if reload:
+                model.invalidate()
+            return model.window(filters, sort_by, descending, offset, height)
+
+        self.worker.submit(load, on_done=self.show, key=self.job_key)
+
+    def scroll_to(self, offset: int):
+        self.offset = max(0, min(offset, self.total - self.height))
+        self.refresh(reload=False)
+
+    def scroll_by(self, rows: int):
+        self.scroll_to(self.offset + rows)
+        return 'break'
+
+    def on_scroll(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.scroll_to(int(float(amount) * self.total))
+        elif unit == 'pages':
+            self.scroll_by(int(amount) * self.height)
+        else:
+            self.scroll_by(int(amount))
+
+    def sort(self, field: str):
+        """Sort by field, or reverse the order if already sorted by it"""
+        self.descending = not self.descending if field == self.sort_by else False
+        self.sort_by = field
+        self.offset = 0
+        self.refresh(reload=False)
+
+    def on_filter_typed(self, event=None):
+        # Wait for a pause in typing before querying
+        if self.pending_filter is not None:
+            self.tree.after_cancel(self.pending_filter)
+        self.pending_filter = self.tree.after(300, self.apply_filter)
+
+    def apply_filter(self):
+        self.pending_filter = None
+        field = self.fields[self.filter_field.get()]
+        text = self.filter_text.get().strip()
+        self.filters = {field: text} if text else {}
+        self.offset = 0
+        self.refresh(reload=False)
+
+    @profiling.timed("ui.listview.show")
+    def show(self, result: Tuple[int, int, List[Row]]):
+        """Patch the tree to show a fetched window, touching only rows that changed"""
+        self.total, self.offset, rows = result
+        wanted = {key for key, values in rows}
+        stale = [item for item in self.tree.get_children() if item not in wanted]
+        if stale:
+            self.tree.delete(*stale)
+        for index, (key, values) in enumerate(rows):
+            if key not in self.rows:
+                self.tree.insert('', index, iid=key, values=values)
+                continue
+            if self.rows[key] != values:
+                self.tree.item(key, values=values)
+            if self.tree.index(key) != index:
+                self.tree.move(key, '', index)
+        self.rows = dict(rows)
+
+        if self.total:
+            self.scrollbar.set(self.offset / self.total, (self.offset + len(rows)) / self.total)
+            self.summary.set(f"Rows {self.offset + 1}-{self.offset + len(rows)} of {self.total}")
+        else:
+            self.scrollbar.set(0, 1)
+            self.summary.set("No rows")
+
+    def selected_key(self) -> Optional[str]:
+        """Key of the selected row, or None"""
+        selection = self.tree.selection()
+        return selection[0] if selection else None
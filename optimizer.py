@@ -0,0 +1,303 @@
+import threading
+import time
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import List, Dict, Tuple, Iterable, Optional
+
+from allocation import RouteBucket, fill_flight
+
+# Value of delivering one ton at each priority (1 is highest)
+PRIORITY_WEIGHTS = {1: 5, 2: 4, 3: 3, 4: 2, 5: 1}
+INF = float("inf")
+
+
+def cargo_value(cargo) -> float:
+    """Priority-weighted tonnage of a cargo request"""
+    return cargo.weight * PRIORITY_WEIGHTS.get(cargo.priority, 1)
+
+
+def allocation_objective(allocation: Dict[str, List]) -> float:
+    """Priority-weighted tonnage carried by an allocation"""
+    return sum(cargo_value(cargo) for cargo_list in allocation.values() for cargo in cargo_list)
+
+
+@dataclass
+class SolveResult:
+    allocation: Dict[str, List]
+    objective: float
+    solve_time: float  # seconds
+    construction_objective: float
+    improving_moves: int = 0
+    timed_out: bool = False
+    stats: Dict[str, int] = field(default_factory=dict)
+
+
+class CapacityTree:
+    """Max segment tree over the remaining capacity of a list of flights"""
+
+    __slots__ = ("size", "tree")
+
+    def __init__(self, capacities: List[float]):
+        size = 1
+        while size < max(len(capacities), 1):
+            size <<= 1
+        self.size = size
+        tree = [-1.0] * (2 * size)
+        tree[size:size + len(capacities)] = capacities
+        for i in range(size - 1, 0, -1):
+            tree[i] = max(tree[2 * i], tree[2 * i + 1])
+        self.tree = tree
+
+    def update(self, position: int, remaining: float):
+        """Set the remaining capacity of one flight"""
+        i = position + self.size
+        self.tree[i] = remaining
+        i >>= 1
+        while i:
+            self.tree[i] = max(self.tree[2 * i], self.tree[2 * i + 1])
+            i >>= 1
+
+    def last_fit(self, weight: float, end: int) -> int:
+        """Last flight before end with at least weight remaining, or -1"""
+        if end <= 0 or self.tree[1] < weight:
+            return -1
+        tree, size = self.tree, self.size
+        # Depth-first descent that prefers the right child, backtracking when needed
+        stack = [(1, 0, size)]
+        while stack:
+            i, low, high = stack.pop()
+            if low >= end or tree[i] < weight:
+                continue
+            if i >= size:
+                return i - size
+            middle = (low + high) // 2
+            stack.append((2 * i, low, middle))
+            stack.append((2 * i + 1, middle, high))
+        return -1
+
+    def first_fit(self, weight: float, start: int) -> int:
+        """First flight at or after start with at least weight remaining, or -1"""
+        if start >= self.size or self.tree[1] < weight:
+            return -1
+        tree = self.tree
+        i = start + self.size
+        while tree[i] < weight:
+            # Climb while we are a right child, then step to the right sibling
+            while i & 1:
+                i >>= 1
+            if i == 0:
+                return -1
+            i += 1
+        while i < self.size:
+            i <<= 1
+            if tree[i] < weight:
+                i += 1
+        return i - self.size
+
+
+class RouteProblem:
+    """Flights and cargo of one route, with the current assignment"""
+
+    def __init__(self, flights: List, cargo: List):
+        # Flights in arrival order, so the flights meeting a deadline are a prefix
+        self.flights = sorted(flights, key=lambda f: f.arrival_time)
+        self.arrivals = [f.arrival_time for f in self.flights]
+        self.remaining = [float(f.cargo_capacity) for f in self.flights]
+        self.loads: List[List[int]] = [[] for _ in self.flights]
+        self.tree = CapacityTree(self.remaining)
+        self.cargo = cargo
+        self.values = [cargo_value(c) for c in cargo]
+        # Number of flights (in arrival order) that land before each cargo's deadline
+        self.eligible = [bisect_right(self.arrivals, c.deadline) for c in cargo]
+        self.assigned_to = [-1] * len(cargo)
+        # Lower bound on the value of anything on board, used to skip swap
+        # searches that cannot succeed
+        self.min_value = INF
+        # failed[k]: lightest item that found no move among the first k flights
+        self.failed = [INF] * (len(self.flights) + 1)
+
+    def place(self, item: int, flight: int):
+        """Load an item onto a flight"""
+        self.assigned_to[item] = flight
+        self.loads[flight].append(item)
+        self.remaining[flight] -= self.cargo[item].weight
+        self.tree.update(flight, self.remaining[flight])
+        self.min_value = min(self.min_value, self.values[item])
+
+    def unplace(self, item: int):
+        """Take an item off its flight"""
+        flight = self.assigned_to[item]
+        self.assigned_to[item] = -1
+        self.loads[flight].remove(item)
+        self.remaining[flight] += self.cargo[item].weight
+        self.tree.update(flight, self.remaining[flight])
+
+    def construct(self):
+        """First-fit decreasing: by priority, then heaviest first, each into the latest
+        flight that fits before its deadline so earlier flights stay free for tighter deadlines"""
+        order = sorted(range(len(self.cargo)),
+                       key=lambda i: (self.cargo[i].priority, -self.cargo[i].weight))
+        for item in order:
+            flight = self.tree.last_fit(self.cargo[item].weight, self.eligible[item])
+            if flight != -1:
+                self.place(item, flight)
+
+    def construct_greedy(self, flights: List):
+        """The greedy allocation (see allocation.allocate_greedy): flights in
+        schedule order, each filled with the highest priority cargo that fits"""
+        positions = {id(flight): index for index, flight in enumerate(self.flights)}
+        items = {id(cargo): index for index, cargo in enumerate(self.cargo)}
+        bucket = RouteBucket(sorted(self.cargo, key=lambda cargo: cargo.priority))
+        for flight in flights:
+            if bucket.remaining == 0:
+                break
+            for cargo in fill_flight(flight, bucket):
+                self.place(items[id(cargo)], positions[id(flight)])
+
+    def value(self) -> float:
+        """Priority-weighted tonnage currently on board"""
+        return sum(self.values[i] for i, flight in enumerate(self.assigned_to) if flight != -1)
+
+    def try_insert(self, item: int, stats: Dict[str, int]) -> bool:
+        """Try to get an unassigned item on board, possibly moving or bumping others
+
+        Callers offer items from most to least valuable. An item at least as
+        heavy as one that failed with no more eligible flights cannot succeed
+        either until something changes, which self.failed remembers.
+        """
+        weight = self.cargo[item].weight
+        eligible = self.eligible[item]
+        if weight >= self.failed[eligible]:
+            return False
+        if self._insert(item, weight, eligible, stats):
+            self.reset_failures()
+            return True
+        for count in range(eligible + 1):
+            if weight < self.failed[count]:
+                self.failed[count] = weight
+        return False
+
+    def reset_failures(self):
+        """Forget failed insertions, e.g. before offering the most valuable items again"""
+        self.failed = [INF] * len(self.failed)
+
+    def _insert(self, item: int, weight: float, eligible: int, stats: Dict[str, int]) -> bool:
+        flight = self.tree.last_fit(weight, eligible)
+        if flight != -1:
+            self.place(item, flight)
+            stats["inserts"] += 1
+            return True
+
+        # Relocate: move one item off an eligible flight to another flight to make room
+        for flight in range(eligible):
+            need = weight - self.remaining[flight]
+            candidates = [other for other in self.loads[flight] if self.cargo[other].weight >= need]
+            if not candidates:
+                continue
+            # Hide this flight while looking for somewhere else to put the candidate
+            self.tree.update(flight, -1.0)
+            for other in candidates:
+                target = self.tree.last_fit(self.cargo[other].weight, self.eligible[other])
+                if target != -1:
+                    self.tree.update(flight, self.remaining[flight])
+                    self.unplace(other)
+                    self.place(other, target)
+                    self.place(item, flight)
+                    stats["relocations"] += 1
+                    return True
+            self.tree.update(flight, self.remaining[flight])
+
+        # Swap: bump the least valuable item whose removal makes room, if it is worth less
+        best = None
+        for flight in range(eligible if self.values[item] > self.min_value else 0):
+            need = weight - self.remaining[flight]
+            for other in self.loads[flight]:
+                if self.cargo[other].weight >= need and self.values[other] < self.values[item]:
+                    if best is None or self.values[other] < self.values[best[0]]:
+                        best = (other, flight)
+        if best is not None:
+            other, flight = best
+            self.unplace(other)
+            self.place(item, flight)
+            stats["swaps"] += 1
+            return True
+        return False
+
+    def unassigned(self) -> List[int]:
+        """Unassigned cargo that has at least one flight before its deadline, most valuable first"""
+        items = [i for i, flight in enumerate(self.assigned_to) if flight == -1 and self.eligible[i]]
+        items.sort(key=lambda i: -self.values[i])
+        return items
+
+
+def solve_allocation(flights: Iterable, cargo_requests: Iterable, time_budget: float = 5.0,
+                     cancelled: Optional[threading.Event] = None) -> Optional[SolveResult]:
+    """Maximise priority-weighted tonnage delivered before deadline within time_budget seconds
+
+    Each route is solved independently: the better of a first-fit-decreasing
+    construction and the greedy allocation, then a local search that inserts,
+    relocates and swaps cargo until no move improves the objective or the
+    time budget runs out. Moves only ever raise the objective, so the result
+    is never worse than greedy. The constructions always complete, so very
+    large inputs may overrun a tiny budget. cancelled is checked between
+    routes; once it is set the solve stops and returns None.
+    """
+    start = time.perf_counter()
+    deadline = start + time_budget
+    flights = list(flights)
+
+    route_flights: Dict[Tuple[str, str], List] = {}
+    for flight in flights:
+        route_flights.setdefault((flight.departure_airport, flight.arrival_airport), []).append(flight)
+    route_cargo: Dict[Tuple[str, str], List] = {}
+    for cargo in cargo_requests:
+        key = (cargo.departure_airport, cargo.arrival_airport)
+        if key in route_flights:
+            route_cargo.setdefault(key, []).append(cargo)
+
+    problems = []
+    for key, cargo in route_cargo.items():
+        if cancelled is not None and cancelled.is_set():
+            return None
+        problem = RouteProblem(route_flights[key], cargo)
+        problem.construct()
+        greedy = RouteProblem(route_flights[key], cargo)
+        greedy.construct_greedy(route_flights[key])
+        problems.append(greedy if greedy.value() > problem.value() else problem)
+    construction_objective = sum(problem.value() for problem in problems)
+
+    stats = {"inserts": 0, "relocations": 0, "swaps": 0}
+    timed_out = False
+    improved = True
+    while improved and not timed_out:
+        improved = False
+        for position, problem in enumerate(problems):
+            if cancelled is not None and cancelled.is_set():
+                return None
+            # Share what is left of the budget between the routes still to visit this pass
+            now = time.perf_counter()
+            route_deadline = now + (deadline - now) / (len(problems) - position)
+            problem.reset_failures()
+            for item in problem.unassigned():
+                if time.perf_counter() >= route_deadline:
+                    # Unfinished route: come back to it if the budget allows
+                    improved = True
+                    break
+                if problem.assigned_to[item] == -1 and problem.try_insert(item, stats):
+                    improved = True
+        timed_out = time.perf_counter() >= deadline
+
+    allocation = {flight.flight_number: [] for flight in flights}
+    for problem in problems:
+        for index, flight in enumerate(problem.flights):
+            allocation[flight.flight_number] = [problem.cargo[i] for i in problem.loads[index]]
+
+    return SolveResult(
+        allocation=allocation,
+        objective=allocation_objective(allocation),
+        solve_time=time.perf_counter() - start,
+        construction_objective=construction_objective,
+        improving_moves=sum(stats.values()),
+        timed_out=timed_out,
+        stats=stats
+    )
@@ -0,0 +1,344 @@
+import cProfile
+import functools
+import io
+import json
+import math
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+# Upper bounds in seconds of the latency histogram buckets (Prometheus "le")
+BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+           10.0, 30.0, 60.0)
+# Set to enable metrics from the start, e.g. AIRLINE_SCHEDULING_METRICS=1 python gui.py
+ENVIRONMENT_VARIABLE = "AIRLINE_SCHEDULING_METRICS"
+PROMETHEUS_PREFIX = "airline_"
+
+
+class Histogram:
+    """Latency distribution over BUCKETS, with sum, count and maximum"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)  # the last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        index = 0
+        while index < len(BUCKETS) and seconds > BUCKETS[index]:
+            index += 1
+        self.buckets[index] += 1
+        self.sum += seconds
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: Dict):
+        for index, count in enumerate(other["buckets"]):
+            self.buckets[index] += count
+        self.sum += other["sum"]
+        self.count += other["count"]
+        self.max = max(self.max, other["max"])
+
+    def to_dict(self) -> Dict:
+        return {"buckets": list(self.buckets), "sum": self.sum, "count": self.count, "max": self.max,
+                "mean": self.sum / self.count if self.count else 0.0}
+
+
+class _NullTimer:
+    """What timer() hands out while metrics are off: entering and leaving it does nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "started")
+
+    def __init__(self, metrics: "Metrics", name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class Metrics:
+    """Named counters and latency histograms, off until enabled
+
+    While disabled, timer() returns a shared no-op context manager and
+    timed() functions make one attribute check before calling through, so
+    the hooks can stay on hot paths. Names are dotted, e.g.
+    "db.iter_flights.fetch"; the Prometheus export turns them into
+    airline_db_iter_flights_fetch_seconds.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.counters: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+
+    def enable(self, enabled: bool = True):
+        self.enabled = enabled
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def count(self, name: str, amount: float = 1):
+        """Add amount to a counter"""
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name: str, seconds: float):
+        """Record one duration"""
+        if self.enabled:
+            with self.lock:
+                histogram = self.histograms.get(name)
+                if histogram is None:
+                    histogram = self.histograms[name] = Histogram()
+                histogram.observe(seconds)
+
+    def timer(self, name: str):
+        """Context manager recording how long its block takes"""
+        return _Timer(self, name) if self.enabled else _NULL_TIMER
+
+    def timed(self, name: Optional[str] = None, counter: Optional[str] = None) -> Callable:
+        """Decorator recording how long each call takes, under name or the function's qualified name
+
+        counter, if given, is also incremented once per call (e.g. "db.round_trips").
+        """
+        def decorate(func: Callable) -> Callable:
+            metric = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(metric, time.perf_counter() - started)
+                    if counter:
+                        self.count(counter)
+            return wrapper
+        return decorate
+
+    def stream(self, name: str, items: Iterable, convert: Callable, batch_size: int = 0) -> Iterator:
+        """convert(item) for each item, timing fetching (name.fetch) and converting (name.decode)
+
+        Also counts records read and, given the cursor's batch size, round
+        trips. Only the time spent inside the stream is recorded, not the
+        consumer's.
+        """
+        if not self.enabled:
+            return map(convert, items)
+        return self._timed_stream(name, items, convert, batch_size)
+
+    def _timed_stream(self, name: str, items: Iterable, convert: Callable, batch_size: int) -> Iterator:
+        fetch = decode = 0.0
+        records = 0
+        iterator = iter(items)
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    fetch += time.perf_counter() - started
+                    break
+                fetched = time.perf_counter()
+                record = convert(item)
+                decode += time.perf_counter() - fetched
+                fetch += fetched - started
+                records += 1
+                yield record
+        finally:
+            self.observe(f"{name}.fetch", fetch)
+            self.observe(f"{name}.decode", decode)
+            self.count("db.records_read", records)
+            if batch_size:
+                self.count("db.round_trips", records // batch_size + 1)
+
+    def snapshot(self) -> Dict:
+        """Counters and histograms as plain data (JSON-serialisable, mergeable)"""
+        with self.lock:
+            return {"counters": dict(self.counters),
+                    "histograms": {name: histogram.to_dict() for name, histogram in self.histograms.items()}}
+
+    def merge(self, snapshot: Dict):
+        """Add another process's snapshot to this one"""
+        with self.lock:
+            for name, amount in snapshot.get("counters", {}).items():
+                self.counters[name] = self.counters.get(name, 0) + amount
+            for name, data in snapshot.get("histograms", {}).items():
+                self.histograms.setdefault(name, Histogram()).merge(data)
+
+    def report(self, limit: int = 20) -> str:
+        """The slowest stages by total time, and the counters, as text"""
+        snapshot = self.snapshot()
+        lines = [f"{'stage':<40} {'calls':>8} {'total s':>10} {'mean ms':>10} {'max ms':>10}"]
+        histograms = sorted(snapshot["histograms"].items(), key=lambda item: item[1]["sum"], reverse=True)
+        for name, data in histograms[:limit]:
+            lines.append(f"{name:<40} {data['count']:>8} {data['sum']:>10.3f} "
+                         f"{data['mean'] * 1000:>10.3f} {data['max'] * 1000:>10.3f}")
+        for name, amount in sorted(snapshot["counters"].items()):
+            lines.append(f"{name:<40} {amount:>8g}")
+        return "\n".join(lines)
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = []
+        for name, amount in sorted(snapshot["counters"].items()):
+            metric = _metric_name(name) + "_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {amount:g}"]
+        for name, data in sorted(snapshot["histograms"].items()):
+            metric = _metric_name(name) + "_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip(BUCKETS + (math.inf,), data["buckets"]):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else f"{bound:g}"
+                lines.append(f'{metric}_bucket{{le="{le}"}} {cumulative}')
+            lines += [f"{metric}_sum {data['sum']:.9g}", f"{metric}_count {data['count']}"]
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str):
+        """Write the metrics to path: Prometheus text for .prom / .txt, JSON otherwise"""
+        with open(path, "w", encoding="utf-8") as handle:
+            if path.endswith((".prom", ".txt")):
+                handle.write(self.to_prometheus())
+            else:
+                json.dump(self.snapshot(), handle, indent=2)
+
+
+def _metric_name(name: str) -> str:
+    return PROMETHEUS_PREFIX + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+class Profiler:
+    """cProfile capture of the thread that starts it, or sampled stacks of every thread
+
+    cProfile sees every call but only on the starting thread (in the GUI,
+    start it from a worker job), and slows that thread down. The sampler
+    records where all threads are every interval seconds from a thread of
+    its own, at a small fixed cost, as collapsed stacks for flame graphs.
+    """
+
+    def __init__(self, mode: str = "cprofile", interval: float = 0.005):
+        if mode not in ("cprofile", "sample"):
+            raise ValueError(f"Unknown profiler mode: {mode}")
+        self.mode = mode
+        self.interval = interval
+        self.profile: Optional[cProfile.Profile] = None
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def start(self):
+        if self.mode == "cprofile":
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        else:
+            self._stop.clear()
+            self._sampler = threading.Thread(target=self._sample, name="profiler-sampler", daemon=True)
+            self._sampler.start()
+
+    def stop(self):
+        if self.mode == "cprofile":
+            if self.profile is not None:
+                self.profile.disable()
+        elif self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if ident not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack.append(names.get(ident, str(ident)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def summary(self, limit: int = 25) -> str:
+        """Top functions by cumulative time, or the most sampled stacks"""
+        if self.mode == "cprofile":
+            if self.profile is None:
+                return ""
+            output = io.StringIO()
+            pstats.Stats(self.profile, stream=output).sort_stats("cumulative").print_stats(limit)
+            return output.getvalue()
+        # Samples per (thread, innermost function)
+        leaves = Counter()
+        for stack, count in self.samples.items():
+            thread, *_, leaf = stack.split(";")
+            leaves[f"{thread}: {leaf}"] += count
+        total = sum(leaves.values()) or 1
+        return "\n".join(f"{count / total:6.1%}  {leaf}" for leaf, count in leaves.most_common(limit))
+
+    def dump(self, path: str):
+        """cProfile stats (for pstats / snakeviz), or collapsed stacks (for flamegraph.pl)"""
+        if self.mode == "cprofile":
+            if self.profile is not None:
+                self.profile.dump_stats(path)
+            return
+        with open(path, "w", encoding="utf-8") as handle:
+            for stack, count in self.samples.most_common():
+                handle.write(f"{stack} {count}\n")
+
+
+# The process-wide registry the rest of the code reports to
+metrics = Metrics()
+
+count = metrics.count
+observe = metrics.observe
+timer = metrics.timer
+timed = metrics.timed
+stream = metrics.stream
+
+
+def enabled() -> bool:
+    return metrics.enabled
+
+
+def enable(on: bool = True):
+    """Turn the hooks on (or off) for this process"""
+    metrics.enable(on)
+
+
+def enable_from_environment():
+    """Enable the hooks if AIRLINE_SCHEDULING_METRICS is set to anything but 0"""
+    if os.environ.get(ENVIRONMENT_VARIABLE, "") not in ("", "0"):
+        metrics.enable()
@@ -0,0 +1,102 @@
+import heapq
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List, Dict, Iterable, Tuple
+
+# Minimum time on the ground between landing and the next departure
+MIN_TURNAROUND = {
+    "Airbus A320": timedelta(minutes=35),
+    "Boeing 737": timedelta(minutes=35),
+    "Boeing 777": timedelta(minutes=75),
+}
+DEFAULT_TURNAROUND = timedelta(minutes=45)
+# Below this share of the fleet in use, a type is reported as under-used
+FLEET_UTILIZATION_THRESHOLD = 0.7
+
+
+@dataclass
+class Rotation:
+    """The legs one aircraft flies, in order; each departs where the previous one landed"""
+    aircraft_type: str
+    flights: List[str] = field(default_factory=list)  # flight numbers
+    start_airport: str = ""
+    end_airport: str = ""
+    block_time: timedelta = timedelta(0)
+
+
+@dataclass
+class TailAssignment:
+    """Flights chained into aircraft rotations, per aircraft type"""
+    rotations: Dict[str, List[Rotation]]
+    tails: Dict[str, int]  # flight_number -> index of its rotation within its type
+
+    def required_aircraft(self) -> Dict[str, int]:
+        """Aircraft each type needs to fly its flights"""
+        return {aircraft_type: len(rotations) for aircraft_type, rotations in self.rotations.items()}
+
+    def fleet_report(self, fleet_data: Dict[str, int]) -> Dict[str, Dict[str, int]]:
+        """Aircraft required against the fleet count, for every type in either"""
+        return fleet_report(self.required_aircraft(), fleet_data)
+
+
+def fleet_report(required: Dict[str, int], fleet_data: Dict[str, int]) -> Dict[str, Dict[str, int]]:
+    """{type: {"required", "fleet"}} for every aircraft type in either"""
+    return {aircraft_type: {"required": required.get(aircraft_type, 0),
+                            "fleet": fleet_data.get(aircraft_type, 0)}
+            for aircraft_type in sorted(set(required) | set(fleet_data))}
+
+
+def assign_tails(flights: Iterable, turnaround: Dict[str, timedelta] = MIN_TURNAROUND,
+                 default_turnaround: timedelta = DEFAULT_TURNAROUND) -> TailAssignment:
+    """Chain flights into rotations with as few aircraft as possible
+
+    Flights of each type are swept in departure order. Every airport keeps a
+    heap of the aircraft on its ground, keyed by when they are ready again
+    (landing plus turnaround). A flight takes the aircraft that has been
+    ready longest at its departure airport, or a new one if none is ready;
+    it then joins the heap of its arrival airport. Without ferry flights
+    this needs the fewest aircraft per type, in O(n log n).
+    """
+    by_type: Dict[str, List] = {}
+    for flight in flights:
+        by_type.setdefault(flight.aircraft_type, []).append(flight)
+
+    rotations: Dict[str, List[Rotation]] = {}
+    tails: Dict[str, int] = {}
+    for aircraft_type, type_flights in by_type.items():
+        type_flights.sort(key=lambda flight: (flight.departure_time, flight.flight_number))
+        ground = turnaround.get(aircraft_type, default_turnaround)
+        # airport -> heap of (ready at, tail)
+        on_ground: Dict[str, List[Tuple[datetime, int]]] = {}
+        type_rotations: List[Rotation] = []
+        for flight in type_flights:
+            ready = on_ground.get(flight.departure_airport)
+            if ready and ready[0][0] <= flight.departure_time:
+                tail = heapq.heappop(ready)[1]
+                rotation = type_rotations[tail]
+            else:
+                tail = len(type_rotations)
+                rotation = Rotation(aircraft_type, start_airport=flight.departure_airport)
+                type_rotations.append(rotation)
+            rotation.flights.append(flight.flight_number)
+            rotation.end_airport = flight.arrival_airport
+            rotation.block_time += flight.arrival_time - flight.departure_time
+            tails[flight.flight_number] = tail
+            heapq.heappush(on_ground.setdefault(flight.arrival_airport, []),
+                           (flight.arrival_time + ground, tail))
+        rotations[aircraft_type] = type_rotations
+    return TailAssignment(rotations, tails)
+
+
+def fleet_suggestions(fleet_report: Dict[str, Dict[str, int]]) -> List[str]:
+    """Suggestions from TailAssignment.fleet_report: types short of aircraft, and under-used ones"""
+    suggestions = []
+    for aircraft_type, counts in fleet_report.items():
+        required, fleet = counts["required"], counts["fleet"]
+        if required > fleet:
+            suggestions.append(f"{aircraft_type} rotations need {required} aircraft but the fleet has {fleet}: "
+                               f"add aircraft or retime flights")
+        elif required < fleet * FLEET_UTILIZATION_THRESHOLD:
+            suggestions.append(f"Consider increasing flights for {aircraft_type} to improve fleet utilization "
+                               f"({required} of {fleet} aircraft needed)")
+    return suggestions
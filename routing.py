@@ -0,0 +1,133 @@
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Iterable, Tuple
+
+from optimizer import CapacityTree
+
+DEFAULT_CONNECTION_TIME = timedelta(minutes=45)
+
+
+class RouteFlights:
+    """Flights of one (departure, arrival) route in departure order, with remaining cargo capacity"""
+
+    __slots__ = ("flights", "departures", "remaining", "tree")
+
+    def __init__(self, flights: List):
+        self.flights = sorted(flights, key=lambda f: f.departure_time)
+        self.departures = [f.departure_time for f in self.flights]
+        self.remaining = [float(f.cargo_capacity) for f in self.flights]
+        self.tree = CapacityTree(self.remaining)
+
+    def reserve(self, position: int, weight: float):
+        """Use weight tons of one flight's capacity"""
+        self.remaining[position] -= weight
+        self.tree.update(position, self.remaining[position])
+
+    def first_departure(self, earliest: Optional[datetime], weight: float, deadline: datetime) -> int:
+        """First flight leaving at or after earliest with room for weight and landing by deadline, or -1"""
+        position = bisect_left(self.departures, earliest) if earliest is not None else 0
+        while True:
+            position = self.tree.first_fit(weight, position)
+            if position == -1:
+                return -1
+            flight = self.flights[position]
+            if flight.departure_time > deadline:
+                return -1
+            if flight.arrival_time <= deadline:
+                return position
+            position += 1
+
+
+class CargoRouter:
+    """Routes cargo over one or more connecting flights, sharing capacity across legs
+
+    The flights form a time-expanded graph: a flight into airport X connects
+    to any flight out of X departing at least the minimum connection time
+    after it lands. Flights are indexed by route and departure time, so each
+    step of the search is a bisect plus a segment-tree lookup for a flight
+    that still has room.
+    """
+
+    def __init__(self, flights: Iterable, min_connection_times: Optional[Dict[str, timedelta]] = None,
+                 default_connection_time: timedelta = DEFAULT_CONNECTION_TIME, max_legs: int = 2):
+        self.min_connection_times = min_connection_times or {}
+        self.default_connection_time = default_connection_time
+        self.max_legs = max_legs
+        grouped: Dict[Tuple[str, str], List] = {}
+        for flight in flights:
+            grouped.setdefault((flight.departure_airport, flight.arrival_airport), []).append(flight)
+        self.routes = {key: RouteFlights(route_flights) for key, route_flights in grouped.items()}
+        self.positions: Dict[str, Tuple[RouteFlights, int]] = {}
+        self.destinations: Dict[str, List[str]] = {}
+        for (departure, arrival), route in self.routes.items():
+            self.destinations.setdefault(departure, []).append(arrival)
+            for position, flight in enumerate(route.flights):
+                self.positions[flight.flight_number] = (route, position)
+        self.origins: Dict[str, set] = {}
+        for departure, arrival in self.routes:
+            self.origins.setdefault(arrival, set()).add(departure)
+
+    def connection_time(self, airport: str) -> timedelta:
+        """Minimum time between landing at and departing from airport"""
+        return self.min_connection_times.get(airport, self.default_connection_time)
+
+    def reserve(self, flight_number: str, weight: float):
+        """Use capacity on a flight, e.g. for cargo already allocated to it"""
+        route, position = self.positions[flight_number]
+        route.reserve(position, weight)
+
+    def _search(self, origin: str, destination: str, earliest: Optional[datetime], weight: float,
+                deadline: datetime, legs: int, visited: Tuple[str, ...]) -> Optional[List[Tuple]]:
+        """Earliest-arriving itinerary found, as (route, position) legs"""
+        best = None
+        best_arrival = None
+        route = self.routes.get((origin, destination))
+        if route is not None:
+            position = route.first_departure(earliest, weight, deadline)
+            if position != -1:
+                best = [(route, position)]
+                best_arrival = route.flights[position].arrival_time
+        if legs <= 1:
+            return best
+
+        for hub in self.destinations.get(origin, ()):
+            if hub == destination or hub in visited:
+                continue
+            # With two legs left the hub must fly straight to the destination
+            if legs == 2 and hub not in self.origins.get(destination, ()):
+                continue
+            # Take the first leg out that has room; later departures usually
+            # reach the hub later and only make the connection harder
+            first = self.routes[(origin, hub)]
+            position = first.first_departure(earliest, weight, deadline)
+            if position == -1:
+                continue
+            flight = first.flights[position]
+            rest = self._search(hub, destination, flight.arrival_time + self.connection_time(hub),
+                                weight, deadline, legs - 1, visited + (hub,))
+            if rest is None:
+                continue
+            arrival = rest[-1][0].flights[rest[-1][1]].arrival_time
+            if best_arrival is None or arrival < best_arrival:
+                best = [(first, position)] + rest
+                best_arrival = arrival
+        return best
+
+    def route(self, cargo, ready_after: Optional[datetime] = None) -> Optional[List]:
+        """Find and book an itinerary for cargo, returning its flights or None"""
+        legs = self._search(cargo.departure_airport, cargo.arrival_airport, ready_after,
+                            cargo.weight, cargo.deadline, self.max_legs, (cargo.departure_airport,))
+        if legs is None:
+            return None
+        for route, position in legs:
+            route.reserve(position, cargo.weight)
+        return [route.flights[position] for route, position in legs]
+
+    def route_all(self, cargo_requests: Iterable, ready_after: Optional[datetime] = None) -> Dict[str, List]:
+        """Route cargo in priority order (1 is highest), returning cargo_id -> flights"""
+        itineraries = {}
+        for cargo in sorted(cargo_requests, key=lambda x: x.priority):
+            itinerary = self.route(cargo, ready_after)
+            if itinerary is not None:
+                itineraries[cargo.cargo_id] = itinerary
+        return itineraries
@@ -0,0 +1,87 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import List, Dict, Iterable, Tuple
+
+
+def hour_of(value: datetime) -> datetime:
+    """Start of the hour containing value"""
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+class SlotIndex:
+    """Movements (departures plus arrivals) per airport per hour
+
+    Airport capacities are read as movements per hour. Counts are kept in a
+    dict keyed by (airport, hour), so checking whether a flight still has a
+    slot at both ends is O(1) and adding or removing a flight updates two
+    counters.
+    """
+
+    def __init__(self, flights: Iterable = ()):
+        self.counts: Dict[Tuple[str, datetime], int] = defaultdict(int)
+        for flight in flights:
+            self.add(flight)
+
+    @staticmethod
+    def _slots(flight) -> Tuple[Tuple[str, datetime], Tuple[str, datetime]]:
+        return ((flight.departure_airport, hour_of(flight.departure_time)),
+                (flight.arrival_airport, hour_of(flight.arrival_time)))
+
+    def add(self, flight):
+        """Count a flight's departure and arrival"""
+        for slot in self._slots(flight):
+            self.counts[slot] += 1
+
+    def remove(self, flight):
+        """Stop counting a flight's departure and arrival"""
+        for slot in self._slots(flight):
+            count = self.counts.get(slot, 0)
+            if count <= 1:
+                self.counts.pop(slot, None)
+            else:
+                self.counts[slot] = count - 1
+
+    def movements(self, airport: str, hour: datetime) -> int:
+        """Movements already scheduled at airport in the hour starting at hour"""
+        return self.counts.get((airport, hour), 0)
+
+    def full_slot(self, flight, airport_data: Dict[str, int]):
+        """(airport, hour) where adding flight would exceed capacity, or None"""
+        departure, arrival = self._slots(flight)
+        # A flight that leaves and lands in the same airport-hour needs two movements there
+        extra = 2 if departure == arrival else 1
+        for airport, hour in (departure, arrival):
+            if self.counts.get((airport, hour), 0) + extra > airport_data.get(airport, 0):
+                return airport, hour
+        return None
+
+
+def slot_congestion_report(flights: Iterable, airport_data: Dict[str, int]) -> List[Dict]:
+    """Every airport-hour whose movements exceed the airport's hourly capacity
+
+    Sweeps all departures and arrivals in (airport, time) order, closing an
+    airport-hour bucket whenever the sweep moves past it.
+    """
+    events = []
+    for flight in flights:
+        events.append((flight.departure_airport, flight.departure_time))
+        events.append((flight.arrival_airport, flight.arrival_time))
+    events.sort()
+
+    overloaded = []
+    current = None
+    count = 0
+    for airport, time in events + [(None, None)]:
+        bucket = (airport, hour_of(time)) if airport is not None else None
+        if bucket != current:
+            if current is not None and count > airport_data.get(current[0], 0):
+                overloaded.append({
+                    "airport": current[0],
+                    "hour": current[1],
+                    "movements": count,
+                    "capacity": airport_data.get(current[0], 0)
+                })
+            current = bucket
+            count = 0
+        count += 1
+    return overloaded
@@ -0,0 +1,834 @@
+import json
+import os
+import sqlite3
+import threading
+from bisect import bisect_left, insort
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Dict, Optional, Iterable, Iterator, Tuple, Set
+
+import profiling
+from database import (Flight, Cargo, RecordResult, StorageBackend, DatabaseHandler,
+                      validate_flight, validate_cargo)
+from columnar import to_epoch, from_epoch
+
+DEFAULT_STORAGE = "mongodb://localhost:27017/"
+# Overrides DEFAULT_STORAGE for the GUI, importer and batch runs
+STORAGE_ENVIRONMENT_VARIABLE = "AIRLINE_SCHEDULING_STORAGE"
+
+
+def open_storage(url: Optional[str] = None, database_name: str = "airline_scheduling", client=None,
+                 reference_ttl: float = 60.0) -> StorageBackend:
+    """The storage backend a URL names
+
+    mongodb://... (or mongodb+srv://...) is MongoDB, sqlite:///path/to/file.db
+    a SQLite file (sqlite:///:memory: for a private in-memory database) and
+    memory:// a new, empty in-process store. Without a URL the
+    AIRLINE_SCHEDULING_STORAGE environment variable is used, then
+    DEFAULT_STORAGE. A MongoDB client, when given, always wins.
+    """
+    if client is not None:
+        return DatabaseHandler(client=client, database_name=database_name, reference_ttl=reference_ttl)
+    url = url or os.environ.get(STORAGE_ENVIRONMENT_VARIABLE) or DEFAULT_STORAGE
+    if url.startswith(("mongodb://", "mongodb+srv://")):
+        return DatabaseHandler(url, database_name=database_name, reference_ttl=reference_ttl)
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):], reference_ttl=reference_ttl)
+    if url.startswith("memory://"):
+        return MemoryBackend(reference_ttl=reference_ttl)
+    raise ValueError(f"Unknown storage URL: {url}")
+
+
+def _validated(records: Iterable, validate, key) -> Iterator[Tuple[object, RecordResult]]:
+    """(record or None if malformed, its result) for each record"""
+    for record in records:
+        error = validate(record)
+        if error:
+            yield None, RecordResult(str(key(record)), False, error)
+        else:
+            yield record, RecordResult(key(record), True)
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[List]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _record_filter(filters: Optional[Dict]):
+    """Predicate for list filters, with the meaning DatabaseHandler gives them:
+    strings match as prefixes, anything else exactly"""
+    tests = [(field, value) for field, value in (filters or {}).items() if value != ""]
+
+    def match(record) -> bool:
+        for field, value in tests:
+            actual = getattr(record, field)
+            if isinstance(value, str):
+                if not isinstance(actual, str) or not actual.startswith(value):
+                    return False
+            elif actual != value:
+                return False
+        return True
+    return match
+
+
+class _RecordTable:
+    """Records by unique key, in insertion order, with airport and time indexes"""
+
+    def __init__(self, key: str, time_field: str):
+        self.key = key
+        self.time_field = time_field
+        self.records: Dict[str, object] = {}
+        self.sequence: Dict[str, int] = {}  # key -> insertion number, for natural order
+        self.inserted = 0
+        self.by_airport: Dict[str, Set[str]] = {}
+        self.times: List[Tuple[datetime, int, str]] = []  # sorted (time, insertion number, key)
+        # Bumped on every change; the sorted list view is cached per version
+        self.version = 0
+        self.sorted_view = None
+
+    def insert(self, records: List, results: List[RecordResult]):
+        """Insert records, marking duplicate keys as failed in the matching results"""
+        appended = []
+        for record, result in zip(records, results):
+            key = getattr(record, self.key)
+            if key in self.records:
+                result.success = False
+                result.error = f"duplicate {self.key}"
+                continue
+            self.inserted += 1
+            self.records[key] = record
+            self.sequence[key] = self.inserted
+            self.by_airport.setdefault(record.departure_airport, set()).add(key)
+            self.by_airport.setdefault(record.arrival_airport, set()).add(key)
+            appended.append((getattr(record, self.time_field), self.inserted, key))
+        if len(appended) == 1:
+            insort(self.times, appended[0])
+        elif appended:
+            # One sort of mostly ordered data instead of an insort per record
+            self.times.extend(appended)
+            self.times.sort()
+        self.version += 1
+
+    def delete(self, key: str) -> bool:
+        record = self.records.pop(key, None)
+        if record is None:
+            return False
+        sequence = self.sequence.pop(key)
+        for airport in (record.departure_airport, record.arrival_airport):
+            self.by_airport[airport].discard(key)
+        del self.times[bisect_left(self.times, (getattr(record, self.time_field), sequence, key))]
+        self.version += 1
+        return True
+
+    def expire(self, before: datetime) -> List:
+        """Remove and return the records timed before `before`, in time order"""
+        count = bisect_left(self.times, (before,))
+        expired = []
+        for _, _, key in self.times[:count]:
+            record = self.records.pop(key)
+            del self.sequence[key]
+            for airport in (record.departure_airport, record.arrival_airport):
+                self.by_airport[airport].discard(key)
+            expired.append(record)
+        del self.times[:count]
+        if expired:
+            self.version += 1
+        return expired
+
+    def select(self, start: Optional[datetime], end: Optional[datetime],
+               airports: Optional[Iterable[str]]) -> List:
+        """Records timed in [start, end) touching one of airports, in insertion order"""
+        keys = None
+        if start is not None or end is not None:
+            low = 0 if start is None else bisect_left(self.times, (start,))
+            high = len(self.times) if end is None else bisect_left(self.times, (end,))
+            keys = [key for _, _, key in self.times[low:high]]
+        if airports is not None:
+            near = set().union(*(self.by_airport.get(airport, ()) for airport in airports))
+            keys = near if keys is None else [key for key in keys if key in near]
+        if keys is None:
+            return list(self.records.values())
+        return [self.records[key] for key in sorted(keys, key=self.sequence.__getitem__)]
+
+    def matching(self, filters: Optional[Dict], sort_by: str, descending: bool) -> List:
+        """Records matching list filters, sorted with the key as tie-break"""
+        query = (tuple(sorted((filters or {}).items())), sort_by, descending)
+        if self.sorted_view is not None and self.sorted_view[:2] == (self.version, query):
+            return self.sorted_view[2]
+        match = _record_filter(filters)
+        rows = [record for record in self.records.values() if match(record)]
+        key = self.key
+        rows.sort(key=lambda record: (getattr(record, sort_by), getattr(record, key)), reverse=descending)
+        # Scrolling asks for one page after another of the same query
+        self.sorted_view = (self.version, query, rows)
+        return rows
+
+    def page(self, filters: Optional[Dict], sort_by: str, descending: bool, skip: int, limit: int,
+             after: Optional[Tuple]) -> List:
+        """limit matching records from skip, counted from the one past the after anchor if given"""
+        rows = self.matching(filters, sort_by, descending)
+        start = 0
+        if after is not None:
+            # Binary search for the first record past the anchor in the sorted view
+            key = self.key
+            high = len(rows)
+            while start < high:
+                middle = (start + high) // 2
+                record = rows[middle]
+                position = (getattr(record, sort_by), getattr(record, key))
+                if position >= after if descending else position <= after:
+                    start = middle + 1
+                else:
+                    high = middle
+        return rows[start + skip:start + skip + limit]
+
+
+class MemoryBackend(StorageBackend):
+    """Storage in this process's memory, for what-if runs, tests and benchmarks
+
+    Flights and cargo are held in dicts keyed by flight number and cargo ID,
+    which keep insertion order as MongoDB's natural order does, with an
+    airport index and a sorted time index answering windowed loads without a
+    scan. Nothing is persisted, and stored records are handed out without
+    copying, so callers must not modify them.
+    """
+
+    def __init__(self, reference_ttl: float = 60.0):
+        super().__init__(reference_ttl)
+        self.lock = threading.RLock()
+        self.fleet: Dict[str, int] = {}
+        self.airports: Dict[str, int] = {}
+        self.flights = _RecordTable("flight_number", "departure_time")
+        self.cargo = _RecordTable("cargo_id", "deadline")
+        # Records moved out by archive_flights / archive_cargo
+        self.flights_archive: List[Flight] = []
+        self.cargo_archive: List[Cargo] = []
+        self.plans: Dict[int, Dict] = {}
+        self.plan_assignments: Dict[int, List[Tuple[str, List[str]]]] = {}
+
+    def _load_fleet_data(self) -> Dict[str, int]:
+        return dict(self.fleet)
+
+    def _load_airport_data(self) -> Dict[str, int]:
+        return dict(self.airports)
+
+    def update_fleet(self, fleet_data: Dict[str, int]):
+        """Replace the fleet data"""
+        self.fleet = dict(fleet_data)
+        self.reference_cache.invalidate("fleet")
+
+    def update_airports(self, airport_data: Dict[str, int]):
+        """Replace the airport data"""
+        self.airports = dict(airport_data)
+        self.reference_cache.invalidate("airports")
+
+    def _add(self, table: _RecordTable, record, validate, kind: str) -> bool:
+        error = validate(record)
+        if error:
+            print(f"Error adding {kind}: {error}")
+            return False
+        result = RecordResult(getattr(record, table.key), True)
+        with self.lock:
+            table.insert([record], [result])
+        if not result.success:
+            print(f"Error adding {kind}: {result.error}")
+        return result.success
+
+    def add_flight(self, flight: Flight) -> bool:
+        """Add a flight"""
+        return self._add(self.flights, flight, validate_flight, "flight")
+
+    def add_cargo(self, cargo: Cargo) -> bool:
+        """Add a cargo request"""
+        return self._add(self.cargo, cargo, validate_cargo, "cargo")
+
+    def _add_bulk(self, table: _RecordTable, records, validate, chunk_size: int) -> List[RecordResult]:
+        results = []
+        for chunk in _chunks(_validated(records, validate, lambda record: getattr(record, table.key)),
+                             chunk_size):
+            valid = [(record, result) for record, result in chunk if record is not None]
+            with self.lock:
+                table.insert([record for record, _ in valid], [result for _, result in valid])
+            results.extend(result for _, result in chunk)
+        return results
+
+    def add_flights_bulk(self, flights: Iterable[Flight], chunk_size: int = 1000) -> List[RecordResult]:
+        """Validate and insert many flights, reporting the outcome of each"""
+        return self._add_bulk(self.flights, flights, validate_flight, chunk_size)
+
+    def add_cargo_bulk(self, cargo_list: Iterable[Cargo], chunk_size: int = 1000) -> List[RecordResult]:
+        """Validate and insert many cargo requests, reporting the outcome of each"""
+        return self._add_bulk(self.cargo, cargo_list, validate_cargo, chunk_size)
+
+    def iter_flights(self, departure_from: Optional[datetime] = None,
+                     departure_until: Optional[datetime] = None,
+                     airports: Optional[Iterable[str]] = None,
+                     batch_size: int = 1000) -> Iterator[Flight]:
+        """Flights departing in [departure_from, departure_until) or touching one of airports"""
+        with self.lock:
+            return iter(self.flights.select(departure_from, departure_until, airports))
+
+    def iter_cargo(self, deadline_from: Optional[datetime] = None,
+                   deadline_until: Optional[datetime] = None,
+                   airports: Optional[Iterable[str]] = None,
+                   batch_size: int = 1000) -> Iterator[Cargo]:
+        """Cargo requests due in [deadline_from, deadline_until) or touching one of airports"""
+        with self.lock:
+            return iter(self.cargo.select(deadline_from, deadline_until, airports))
+
+    def archive_flights(self, before: datetime, batch_size: int = 1000) -> int:
+        """Move flights departing before `before` to flights_archive"""
+        with self.lock:
+            expired = self.flights.expire(before)
+            self.flights_archive.extend(expired)
+        return len(expired)
+
+    def archive_cargo(self, before: datetime, batch_size: int = 1000) -> int:
+        """Move cargo requests due before `before` to cargo_archive"""
+        with self.lock:
+            expired = self.cargo.expire(before)
+            self.cargo_archive.extend(expired)
+        return len(expired)
+
+    def page_flights(self, filters: Optional[Dict] = None, sort_by: str = "flight_number",
+                     descending: bool = False, skip: int = 0, limit: int = 100,
+                     after: Optional[Tuple] = None) -> List[Flight]:
+        """One page of flights, filtered and sorted"""
+        with self.lock:
+            return self.flights.page(filters, sort_by, descending, skip, limit, after)
+
+    def page_cargo(self, filters: Optional[Dict] = None, sort_by: str = "cargo_id",
+                   descending: bool = False, skip: int = 0, limit: int = 100,
+                   after: Optional[Tuple] = None) -> List[Cargo]:
+        """One page of cargo requests, filtered and sorted"""
+        with self.lock:
+            return self.cargo.page(filters, sort_by, descending, skip, limit, after)
+
+    def count_flights(self, filters: Optional[Dict] = None) -> int:
+        """Number of flights matching filters"""
+        with self.lock:
+            if not filters:
+                return len(self.flights.records)
+            return len(self.flights.matching(filters, self.flights.key, False))
+
+    def count_cargo(self, filters: Optional[Dict] = None) -> int:
+        """Number of cargo requests matching filters"""
+        with self.lock:
+            if not filters:
+                return len(self.cargo.records)
+            return len(self.cargo.matching(filters, self.cargo.key, False))
+
+    def delete_flight(self, flight_number: str) -> bool:
+        """Delete a flight"""
+        with self.lock:
+            return self.flights.delete(flight_number)
+
+    def delete_cargo(self, cargo_id: str) -> bool:
+        """Delete a cargo request"""
+        with self.lock:
+            return self.cargo.delete(cargo_id)
+
+    def save_allocation_plan(self, allocation: Dict[str, List], mode: str, objective: Optional[float] = None,
+                             timings: Optional[Dict[str, float]] = None, label: Optional[str] = None) -> int:
+        """Store an allocation run (cargo IDs only) and return its version number"""
+        loaded = [(number, [cargo.cargo_id for cargo in cargo_list])
+                  for number, cargo_list in allocation.items() if cargo_list]
+        with self.lock:
+            version = max(self.plans, default=0) + 1
+            self.plan_assignments[version] = loaded
+            self.plans[version] = self._plan_metadata(version, allocation, loaded, mode, objective,
+                                                      timings, label)
+        return version
+
+    def list_allocation_plans(self, limit: int = 20) -> List[Dict]:
+        """Metadata of the newest plans, newest first"""
+        with self.lock:
+            return [dict(self.plans[version]) for version in sorted(self.plans, reverse=True)[:limit]]
+
+    def get_allocation_plan(self, version: int) -> Optional[Dict]:
+        """Metadata of one plan, or None"""
+        plan = self.plans.get(version)
+        return dict(plan) if plan is not None else None
+
+    def iter_plan_assignments(self, version: int) -> Iterator[Tuple[str, List[str]]]:
+        """(flight_number, cargo IDs) of each loaded flight in a plan"""
+        return iter(self.plan_assignments.get(version, ()))
+
+    def delete_allocation_plan(self, version: int) -> bool:
+        """Delete a plan"""
+        with self.lock:
+            self.plan_assignments.pop(version, None)
+            return self.plans.pop(version, None) is not None
+
+
+FLIGHT_COLUMNS = ("flight_number", "departure_airport", "arrival_airport", "departure_time",
+                  "arrival_time", "aircraft_type", "capacity", "cargo_capacity")
+CARGO_COLUMNS = ("cargo_id", "weight", "departure_airport", "arrival_airport", "priority", "deadline")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS flights (
+    seq INTEGER PRIMARY KEY,
+    flight_number TEXT NOT NULL UNIQUE,
+    departure_airport TEXT NOT NULL,
+    arrival_airport TEXT NOT NULL,
+    departure_time INTEGER NOT NULL,
+    arrival_time INTEGER NOT NULL,
+    aircraft_type TEXT NOT NULL,
+    capacity INTEGER NOT NULL,
+    cargo_capacity REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cargo (
+    seq INTEGER PRIMARY KEY,
+    cargo_id TEXT NOT NULL UNIQUE,
+    weight REAL NOT NULL,
+    departure_airport TEXT NOT NULL,
+    arrival_airport TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    deadline INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS flights_archive (
+    seq INTEGER PRIMARY KEY,
+    flight_number TEXT NOT NULL,
+    departure_airport TEXT NOT NULL,
+    arrival_airport TEXT NOT NULL,
+    departure_time INTEGER NOT NULL,
+    arrival_time INTEGER NOT NULL,
+    aircraft_type TEXT NOT NULL,
+    capacity INTEGER NOT NULL,
+    cargo_capacity REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cargo_archive (
+    seq INTEGER PRIMARY KEY,
+    cargo_id TEXT NOT NULL,
+    weight REAL NOT NULL,
+    departure_airport TEXT NOT NULL,
+    arrival_airport TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    deadline INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reference (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS allocation_plans (
+    version INTEGER PRIMARY KEY,
+    metadata TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS allocation_plan_flights (
+    version INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    flight_number TEXT NOT NULL,
+    cargo_ids TEXT NOT NULL,
+    PRIMARY KEY (version, position)
+) WITHOUT ROWID;
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS flights_route_time ON flights (departure_airport, arrival_airport, departure_time);
+CREATE INDEX IF NOT EXISTS flights_arrival_airport ON flights (arrival_airport);
+CREATE INDEX IF NOT EXISTS flights_departure_time ON flights (departure_time);
+CREATE INDEX IF NOT EXISTS cargo_route_deadline ON cargo (departure_airport, arrival_airport, deadline, priority);
+CREATE INDEX IF NOT EXISTS cargo_arrival_airport ON cargo (arrival_airport);
+CREATE INDEX IF NOT EXISTS cargo_deadline ON cargo (deadline);
+CREATE INDEX IF NOT EXISTS flights_archive_departure_time ON flights_archive (departure_time);
+CREATE INDEX IF NOT EXISTS cargo_archive_deadline ON cargo_archive (deadline);
+"""
+
+# Statements are fixed strings so sqlite3 compiles each once per connection
+# and reuses it from its statement cache
+INSERT_FLIGHT = f"INSERT INTO flights ({', '.join(FLIGHT_COLUMNS)}) VALUES ({', '.join('?' * len(FLIGHT_COLUMNS))})"
+INSERT_CARGO = f"INSERT INTO cargo ({', '.join(CARGO_COLUMNS)}) VALUES ({', '.join('?' * len(CARGO_COLUMNS))})"
+EXISTING_FLIGHTS = "SELECT flight_number FROM flights WHERE flight_number IN (SELECT value FROM json_each(?))"
+EXISTING_CARGO = "SELECT cargo_id FROM cargo WHERE cargo_id IN (SELECT value FROM json_each(?))"
+# Expired rows are copied to the archive table and deleted in one transaction
+ARCHIVE_FLIGHTS = (f"INSERT INTO flights_archive ({', '.join(FLIGHT_COLUMNS)}) "
+                   f"SELECT {', '.join(FLIGHT_COLUMNS)} FROM flights WHERE departure_time < ? ORDER BY seq")
+ARCHIVE_CARGO = (f"INSERT INTO cargo_archive ({', '.join(CARGO_COLUMNS)}) "
+                 f"SELECT {', '.join(CARGO_COLUMNS)} FROM cargo WHERE deadline < ? ORDER BY seq")
+SELECT_REFERENCE = "SELECT data FROM reference WHERE name = ?"
+UPDATE_REFERENCE = "INSERT OR REPLACE INTO reference (name, data) VALUES (?, ?)"
+# Airport lists are passed as one JSON array, so the statement is the same for any number of airports
+AIRPORT_CONDITION = ("(departure_airport IN (SELECT value FROM json_each(?)) "
+                     "OR arrival_airport IN (SELECT value FROM json_each(?)))")
+
+
+def _flight_row(flight: Flight) -> tuple:
+    return (flight.flight_number, flight.departure_airport, flight.arrival_airport,
+            to_epoch(flight.departure_time), to_epoch(flight.arrival_time), flight.aircraft_type,
+            flight.capacity, flight.cargo_capacity)
+
+
+def _cargo_row(cargo: Cargo) -> tuple:
+    return (cargo.cargo_id, cargo.weight, cargo.departure_airport, cargo.arrival_airport,
+            cargo.priority, to_epoch(cargo.deadline))
+
+
+def _flight_from_row(row: tuple) -> Flight:
+    return Flight(row[0], row[1], row[2], from_epoch(row[3]), from_epoch(row[4]), row[5], row[6], row[7])
+
+
+def _cargo_from_row(row: tuple) -> Cargo:
+    return Cargo(row[0], row[1], row[2], row[3], row[4], from_epoch(row[5]))
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialise {type(value).__name__}")
+
+
+class SQLiteBackend(StorageBackend):
+    """Storage in a SQLite database file
+
+    The file is in WAL mode, so readers (the GUI's list views, other
+    processes of a batch run) are not blocked by a writer. Each thread gets
+    its own connection; writes take the write lock up front (BEGIN
+    IMMEDIATE) and bulk loads insert a chunk per executemany call. Times are
+    stored as integer microseconds (see columnar.to_epoch), so windows and
+    sorts compare integers. path ":memory:" gives a private in-memory
+    database shared by this backend's threads.
+    """
+
+    def __init__(self, path: str, reference_ttl: float = 60.0, timeout: float = 30.0):
+        super().__init__(reference_ttl)
+        if path == ":memory:":
+            self.database = f"file:airline_scheduling_{id(self)}?mode=memory&cache=shared"
+        else:
+            self.database = f"file:{os.path.abspath(path)}"
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # isolation_level=None: transactions are begun explicitly in _transaction
+            connection = sqlite3.connect(self.database, uri=True, timeout=self.timeout, isolation_level=None,
+                                         check_same_thread=False, cached_statements=256)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # Durable at checkpoints rather than every commit, the usual pairing with WAL
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def ensure_indexes(self):
+        """Create the indexes windowed loads rely on (idempotent)"""
+        self._connection().executescript(INDEXES)
+
+    def _load_reference(self, name: str) -> Dict[str, int]:
+        row = self._connection().execute(SELECT_REFERENCE, (name,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def _load_fleet_data(self) -> Dict[str, int]:
+        return self._load_reference("fleet")
+
+    def _load_airport_data(self) -> Dict[str, int]:
+        return self._load_reference("airports")
+
+    def update_fleet(self, fleet_data: Dict[str, int]):
+        """Update fleet data in the database"""
+        with self._transaction() as connection:
+            connection.execute(UPDATE_REFERENCE, ("fleet", json.dumps(fleet_data)))
+        self.reference_cache.invalidate("fleet")
+
+    def update_airports(self, airport_data: Dict[str, int]):
+        """Update airport data in the database"""
+        with self._transaction() as connection:
+            connection.execute(UPDATE_REFERENCE, ("airports", json.dumps(airport_data)))
+        self.reference_cache.invalidate("airports")
+
+    def _add(self, statement: str, record, validate, to_row, kind: str) -> bool:
+        error = validate(record)
+        if error:
+            print(f"Error adding {kind}: {error}")
+            return False
+        try:
+            with self._transaction() as connection:
+                connection.execute(statement, to_row(record))
+            return True
+        except sqlite3.Error as e:
+            print(f"Error adding {kind}: {e}")
+            return False
+
+    def add_flight(self, flight: Flight) -> bool:
+        """Add a flight to the database"""
+        return self._add(INSERT_FLIGHT, flight, validate_flight, _flight_row, "flight")
+
+    def add_cargo(self, cargo: Cargo) -> bool:
+        """Add a cargo request to the database"""
+        return self._add(INSERT_CARGO, cargo, validate_cargo, _cargo_row, "cargo")
+
+    def _add_bulk(self, records, validate, key, to_row, insert: str, existing: str,
+                  chunk_size: int) -> List[RecordResult]:
+        results = []
+        for chunk in _chunks(_validated(records, validate, key), chunk_size):
+            results.extend(result for _, result in chunk)
+            valid = [(record, result) for record, result in chunk if record is not None]
+            try:
+                with self._transaction() as connection:
+                    # Duplicates are found up front, so one executemany inserts the rest
+                    taken = {row[0] for row in connection.execute(
+                        existing, (json.dumps([result.key for _, result in valid]),))}
+                    rows = []
+                    for record, result in valid:
+                        if result.key in taken:
+                            result.success = False
+                            result.error = "duplicate key"
+                        else:
+                            taken.add(result.key)
+                            rows.append(to_row(record))
+                    with profiling.timer("db.insert_many"):
+                        connection.executemany(insert, rows)
+                    profiling.count("db.records_written", len(rows))
+            except sqlite3.Error as e:
+                print(f"Error in bulk insert: {e}")
+                for _, result in valid:
+                    result.success = False
+                    result.error = str(e)
+        return results
+
+    def add_flights_bulk(self, flights: Iterable[Flight], chunk_size: int = 1000) -> List[RecordResult]:
+        """Validate and insert many flights, reporting the outcome of each"""
+        return self._add_bulk(flights, validate_flight, lambda f: f.flight_number, _flight_row,
+                              INSERT_FLIGHT, EXISTING_FLIGHTS, chunk_size)
+
+    def add_cargo_bulk(self, cargo_list: Iterable[Cargo], chunk_size: int = 1000) -> List[RecordResult]:
+        """Validate and insert many cargo requests, reporting the outcome of each"""
+        return self._add_bulk(cargo_list, validate_cargo, lambda c: c.cargo_id, _cargo_row,
+                              INSERT_CARGO, EXISTING_CARGO, chunk_size)
+
+    @staticmethod
+    def _window(field: str, start: Optional[datetime], end: Optional[datetime],
+                airports: Optional[Iterable[str]]) -> Tuple[str, list]:
+        conditions, parameters = [], []
+        if start is not None:
+            conditions.append(f"{field} >= ?")
+            parameters.append(to_epoch(start))
+        if end is not None:
+            conditions.append(f"{field} < ?")
+            parameters.append(to_epoch(end))
+        if airports is not None:
+            airports = json.dumps(list(airports))
+            conditions.append(AIRPORT_CONDITION)
+            parameters += [airports, airports]
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), parameters
+
+    def _rows(self, table: str, columns: Tuple[str, ...], where: str, parameters: list,
+              batch_size: int) -> Iterator[tuple]:
+        cursor = self._connection().execute(
+            f"SELECT {', '.join(columns)} FROM {table}{where} ORDER BY seq", parameters)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+
+    def iter_flights(self, departure_from: Optional[datetime] = None,
+                     departure_until: Optional[datetime] = None,
+                     airports: Optional[Iterable[str]] = None,
+                     batch_size: int = 1000) -> Iterator[Flight]:
+        """Stream flights, optionally only those departing in [departure_from, departure_until)
+        or touching one of airports"""
+        where, parameters = self._window("departure_time", departure_from, departure_until, airports)
+        rows = self._rows("flights", FLIGHT_COLUMNS, where, parameters, batch_size)
+        return profiling.stream("db.iter_flights", rows, _flight_from_row, batch_size)
+
+    def iter_cargo(self, deadline_from: Optional[datetime] = None,
+                   deadline_until: Optional[datetime] = None,
+                   airports: Optional[Iterable[str]] = None,
+                   batch_size: int = 1000) -> Iterator[Cargo]:
+        """Stream cargo requests, optionally only those due in [deadline_from, deadline_until)
+        or touching one of airports"""
+        where, parameters = self._window("deadline", deadline_from, deadline_until, airports)
+        rows = self._rows("cargo", CARGO_COLUMNS, where, parameters, batch_size)
+        return profiling.stream("db.iter_cargo", rows, _cargo_from_row, batch_size)
+
+    @staticmethod
+    def _match_filter(columns: Tuple[str, ...], filters: Optional[Dict]) -> Tuple[str, list]:
+        """WHERE clause for list filters: strings match as prefixes (as an index-friendly range),
+        anything else exactly"""
+        conditions, parameters = [], []
+        for field, value in (filters or {}).items():
+            if field not in columns:
+                raise ValueError(f"Unknown field: {field}")
+            if isinstance(value, str):
+                if value:
+                    conditions.append(f"{field} >= ? AND {field} < ?")
+                    parameters += [value, value + "\U0010ffff"]
+            else:
+                conditions.append(f"{field} = ?")
+                parameters.append(to_epoch(value) if isinstance(value, datetime) else value)
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), parameters
+
+    def _page(self, table: str, columns: Tuple[str, ...], key: str, filters: Optional[Dict], sort_by: str,
+              descending: bool, skip: int, limit: int, after: Optional[Tuple], from_row) -> List:
+        if sort_by not in columns:
+            raise ValueError(f"Unknown field: {sort_by}")
+        where, parameters = self._match_filter(columns, filters)
+        if after is not None:
+            # Seek past the anchor through the sort index rather than stepping over every row before it
+            value, last_key = after
+            later = "<" if descending else ">"
+            if sort_by == key:
+                condition = f"{key} {later} ?"
+                parameters = parameters + [last_key]
+            else:
+                condition = f"({sort_by}, {key}) {later} (?, ?)"
+                parameters = parameters + [to_epoch(value) if isinstance(value, datetime) else value, last_key]
+            where = f"{where} AND {condition}" if where else f" WHERE {condition}"
+        direction = "DESC" if descending else "ASC"
+        # The unique key breaks ties, so pages neither overlap nor skip rows
+        order = f"{sort_by} {direction}" if sort_by == key else f"{sort_by} {direction}, {key} {direction}"
+        rows = self._connection().execute(
+            f"SELECT {', '.join(columns)} FROM {table}{where} ORDER BY {order} LIMIT ? OFFSET ?",
+            parameters + [limit, skip])
+        return [from_row(row) for row in rows]
+
+    @profiling.timed("db.page_flights", counter="db.round_trips")
+    def page_flights(self, filters: Optional[Dict] = None, sort_by: str = "flight_number",
+                     descending: bool = False, skip: int = 0, limit: int = 100,
+                     after: Optional[Tuple] = None) -> List[Flight]:
+        """One page of flights, filtered and sorted by the database"""
+        return self._page("flights", FLIGHT_COLUMNS, "flight_number", filters, sort_by, descending,
+                          skip, limit, after, _flight_from_row)
+
+    @profiling.timed("db.page_cargo", counter="db.round_trips")
+    def page_cargo(self, filters: Optional[Dict] = None, sort_by: str = "cargo_id",
+                   descending: bool = False, skip: int = 0, limit: int = 100,
+                   after: Optional[Tuple] = None) -> List[Cargo]:
+        """One page of cargo requests, filtered and sorted by the database"""
+        return self._page("cargo", CARGO_COLUMNS, "cargo_id", filters, sort_by, descending,
+                          skip, limit, after, _cargo_from_row)
+
+    @profiling.timed("db.count_flights", counter="db.round_trips")
+    def count_flights(self, filters: Optional[Dict] = None) -> int:
+        """Number of flights matching filters"""
+        where, parameters = self._match_filter(FLIGHT_COLUMNS, filters)
+        return self._connection().execute(f"SELECT COUNT(*) FROM flights{where}", parameters).fetchone()[0]
+
+    @profiling.timed("db.count_cargo", counter="db.round_trips")
+    def count_cargo(self, filters: Optional[Dict] = None) -> int:
+        """Number of cargo requests matching filters"""
+        where, parameters = self._match_filter(CARGO_COLUMNS, filters)
+        return self._connection().execute(f"SELECT COUNT(*) FROM cargo{where}", parameters).fetchone()[0]
+
+    @profiling.timed("db.archive", counter="db.round_trips")
+    def archive_flights(self, before: datetime, batch_size: int = 1000) -> int:
+        """Move flights departing before `before` to the flights_archive table"""
+        with self._transaction() as connection:
+            connection.execute(ARCHIVE_FLIGHTS, (to_epoch(before),))
+            return connection.execute("DELETE FROM flights WHERE departure_time < ?",
+                                      (to_epoch(before),)).rowcount
+
+    @profiling.timed("db.archive", counter="db.round_trips")
+    def archive_cargo(self, before: datetime, batch_size: int = 1000) -> int:
+        """Move cargo requests due before `before` to the cargo_archive table"""
+        with self._transaction() as connection:
+            connection.execute(ARCHIVE_CARGO, (to_epoch(before),))
+            return connection.execute("DELETE FROM cargo WHERE deadline < ?", (to_epoch(before),)).rowcount
+
+    @profiling.timed("db.delete_flight", counter="db.round_trips")
+    def delete_flight(self, flight_number: str) -> bool:
+        """Delete a flight from the database"""
+        try:
+            with self._transaction() as connection:
+                return connection.execute("DELETE FROM flights WHERE flight_number = ?",
+                                          (flight_number,)).rowcount > 0
+        except sqlite3.Error as e:
+            print(f"Error deleting flight: {e}")
+            return False
+
+    @profiling.timed("db.delete_cargo", counter="db.round_trips")
+    def delete_cargo(self, cargo_id: str) -> bool:
+        """Delete a cargo request from the database"""
+        try:
+            with self._transaction() as connection:
+                return connection.execute("DELETE FROM cargo WHERE cargo_id = ?", (cargo_id,)).rowcount > 0
+        except sqlite3.Error as e:
+            print(f"Error deleting cargo: {e}")
+            return False
+
+    @profiling.timed("db.save_allocation_plan", counter="db.round_trips")
+    def save_allocation_plan(self, allocation: Dict[str, List], mode: str, objective: Optional[float] = None,
+                             timings: Optional[Dict[str, float]] = None, label: Optional[str] = None) -> int:
+        """Store an allocation run and return its version number
+
+        Only cargo IDs are stored, one row per loaded flight. The plan is
+        written in one transaction, so a listed plan is always complete and
+        concurrent writers never share a version.
+        """
+        loaded = [(number, [cargo.cargo_id for cargo in cargo_list])
+                  for number, cargo_list in allocation.items() if cargo_list]
+        with self._transaction() as connection:
+            version = connection.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM allocation_plans").fetchone()[0]
+            metadata = self._plan_metadata(version, allocation, loaded, mode, objective, timings, label)
+            connection.execute("INSERT INTO allocation_plans (version, metadata) VALUES (?, ?)",
+                               (version, json.dumps(metadata, default=_json_default)))
+            connection.executemany(
+                "INSERT INTO allocation_plan_flights (version, position, flight_number, cargo_ids) "
+                "VALUES (?, ?, ?, ?)",
+                ((version, position, number, json.dumps(cargo_ids))
+                 for position, (number, cargo_ids) in enumerate(loaded)))
+        return version
+
+    @staticmethod
+    def _plan_from_row(row: tuple) -> Dict:
+        plan = json.loads(row[0])
+        plan["created_at"] = datetime.fromisoformat(plan["created_at"])
+        return plan
+
+    def list_allocation_plans(self, limit: int = 20) -> List[Dict]:
+        """Metadata of the newest plans, newest first"""
+        rows = self._connection().execute(
+            "SELECT metadata FROM allocation_plans ORDER BY version DESC LIMIT ?", (limit,))
+        return [self._plan_from_row(row) for row in rows]
+
+    def get_allocation_plan(self, version: int) -> Optional[Dict]:
+        """Metadata of one plan, or None"""
+        row = self._connection().execute("SELECT metadata FROM allocation_plans WHERE version = ?",
+                                         (version,)).fetchone()
+        return self._plan_from_row(row) if row else None
+
+    def iter_plan_assignments(self, version: int) -> Iterator[Tuple[str, List[str]]]:
+        """(flight_number, cargo IDs) of each loaded flight in a plan, streamed from the database"""
+        cursor = self._connection().execute(
+            "SELECT flight_number, cargo_ids FROM allocation_plan_flights WHERE version = ? ORDER BY position",
+            (version,))
+        for number, cargo_ids in cursor:
+            yield number, json.loads(cargo_ids)
+
+    def delete_allocation_plan(self, version: int) -> bool:
+        """Delete a plan and its flights"""
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM allocation_plan_flights WHERE version = ?", (version,))
+            return connection.execute("DELETE FROM allocation_plans WHERE version = ?",
+                                      (version,)).rowcount > 0
+
+    def close(self):
+        """Close every thread's connection"""
+        super().close()
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
@@ -0,0 +1,184 @@
+import math
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List, Dict, Tuple
+
+from database import Flight, Cargo
+
+# Cargo capacity (tons) and cruise speed (km/h) of each aircraft type
+AIRCRAFT_TYPES = {
+    "Airbus A320": (16.0, 780),
+    "Boeing 737": (20.0, 800),
+    "Boeing 777": (60.0, 900),
+}
+PASSENGER_CAPACITY = {"Airbus A320": 180, "Boeing 737": 189, "Boeing 777": 396}
+# Share of cargo requests at each priority, 1 (highest) to 5
+PRIORITY_MIX = {1: 0.10, 2: 0.20, 3: 0.30, 4: 0.25, 5: 0.15}
+
+
+@dataclass
+class NetworkSpec:
+    """Shape of a synthetic airline network and its schedule
+
+    A "hub" network flies spokes to and from hub airports in banks: waves of
+    arrivals followed by waves of departures, as hub carriers do. A "mesh"
+    network flies point to point between any pair of airports, still timed
+    in banks. The same spec and seed always give the same data.
+    """
+    airports: int = 20
+    topology: str = "hub"  # "hub" or "mesh"
+    hubs: int = 2
+    days: int = 7
+    banks_per_day: int = 6
+    bank_minutes: int = 60  # departures in a bank spread over this many minutes
+    flights_per_bank: int = 20  # per hub for "hub", per network for "mesh"
+    start: datetime = datetime(2024, 1, 1)
+    seed: int = 1
+
+
+@dataclass
+class Network:
+    airports: List[str]
+    hubs: List[str]
+    positions: Dict[str, Tuple[float, float]]  # km on a flat map
+    routes: List[Tuple[str, str]]
+
+    def distance(self, departure: str, arrival: str) -> float:
+        (x1, y1), (x2, y2) = self.positions[departure], self.positions[arrival]
+        return math.hypot(x1 - x2, y1 - y2)
+
+
+@dataclass
+class Schedule:
+    network: Network
+    flights: List[Flight]
+    fleet: Dict[str, int]  # aircraft per type, enough to fly the schedule
+    airport_capacity: Dict[str, int]  # movements per hour, enough for the busiest hour
+    cargo: List[Cargo] = field(default_factory=list)
+
+
+def build_network(spec: NetworkSpec) -> Network:
+    """Airports placed on a 4000km square, with routes for the topology"""
+    rng = random.Random(spec.seed)
+    airports = [f"AP{i:03d}" for i in range(spec.airports)]
+    positions = {airport: (rng.uniform(0, 4000), rng.uniform(0, 4000)) for airport in airports}
+    hubs = airports[:max(1, min(spec.hubs, spec.airports - 1))] if spec.topology == "hub" else []
+    if spec.topology == "hub":
+        routes = [(hub, airport) for hub in hubs for airport in airports if airport != hub]
+        routes += [(airport, hub) for hub, airport in routes]
+    elif spec.topology == "mesh":
+        routes = [(a, b) for a in airports for b in airports if a != b]
+    else:
+        raise ValueError(f"Unknown topology: {spec.topology}")
+    return Network(airports, hubs, positions, routes)
+
+
+def _aircraft_for(distance: float, rng: random.Random) -> str:
+    # Widebodies on long sectors, narrowbodies elsewhere
+    if distance > 2500:
+        return "Boeing 777" if rng.random() < 0.7 else "Boeing 737"
+    return "Airbus A320" if rng.random() < 0.5 else "Boeing 737"
+
+
+def _peak_concurrent(flights: List[Flight]) -> Dict[str, int]:
+    events = []
+    for flight in flights:
+        events.append((flight.departure_time, 1, flight.aircraft_type))
+        events.append((flight.arrival_time, -1, flight.aircraft_type))
+    events.sort(key=lambda event: (event[0], event[1]))
+    active, peak = {}, {}
+    for _, change, aircraft_type in events:
+        active[aircraft_type] = active.get(aircraft_type, 0) + change
+        peak[aircraft_type] = max(peak.get(aircraft_type, 0), active[aircraft_type])
+    return peak
+
+
+def _peak_movements(flights: List[Flight]) -> Dict[str, int]:
+    counts: Dict[Tuple[str, datetime], int] = {}
+    for flight in flights:
+        for airport, time in ((flight.departure_airport, flight.departure_time),
+                              (flight.arrival_airport, flight.arrival_time)):
+            key = (airport, time.replace(minute=0, second=0, microsecond=0))
+            counts[key] = counts.get(key, 0) + 1
+    peak: Dict[str, int] = {}
+    for (airport, _), count in counts.items():
+        peak[airport] = max(peak.get(airport, 0), count)
+    return peak
+
+
+def generate_schedule(spec: NetworkSpec) -> Schedule:
+    """Flights in banks over spec.days, with a fleet and airport capacities that fit them"""
+    network = build_network(spec)
+    rng = random.Random(spec.seed + 1)
+    bank_gap = timedelta(hours=24 / spec.banks_per_day)
+    flights = []
+    for day in range(spec.days):
+        for bank in range(spec.banks_per_day):
+            bank_start = spec.start + timedelta(days=day) + bank * bank_gap
+            if spec.topology == "hub":
+                # Spokes fly in so they land just before the hub's departure wave
+                legs = []
+                for hub in network.hubs:
+                    spokes = [a for a in network.airports if a not in network.hubs]
+                    for _ in range(spec.flights_per_bank // 2):
+                        spoke = rng.choice(spokes or network.hubs)
+                        legs.append((spoke, hub, True))
+                        legs.append((hub, rng.choice(spokes or network.hubs), False))
+            else:
+                legs = [(*rng.choice(network.routes), False) for _ in range(spec.flights_per_bank)]
+            for departure, arrival, inbound in legs:
+                if departure == arrival:
+                    continue
+                distance = network.distance(departure, arrival)
+                aircraft = _aircraft_for(distance, rng)
+                block = timedelta(minutes=30 + distance / AIRCRAFT_TYPES[aircraft][1] * 60)
+                offset = timedelta(minutes=rng.randrange(spec.bank_minutes))
+                departure_time = bank_start + offset - (block if inbound else timedelta(0))
+                flights.append(Flight(
+                    flight_number=f"SY{len(flights):07d}",
+                    departure_airport=departure,
+                    arrival_airport=arrival,
+                    departure_time=departure_time,
+                    arrival_time=departure_time + block,
+                    aircraft_type=aircraft,
+                    capacity=PASSENGER_CAPACITY[aircraft],
+                    cargo_capacity=AIRCRAFT_TYPES[aircraft][0]
+                ))
+
+    fleet = {aircraft: math.ceil(peak * 1.1) + 1 for aircraft, peak in _peak_concurrent(flights).items()}
+    movements = _peak_movements(flights)
+    capacity = {airport: math.ceil(movements.get(airport, 0) * 1.2) + 2 for airport in network.airports}
+    return Schedule(network, flights, fleet, capacity)
+
+
+def generate_demand(schedule: Schedule, count: int, seed: int = 2,
+                    priority_mix: Dict[int, float] = PRIORITY_MIX,
+                    mean_slack_hours: float = 36.0) -> List[Cargo]:
+    """Cargo requests spread over routes in proportion to their flights
+
+    Each request is due a random (exponentially distributed, mean
+    mean_slack_hours) time after one of its route's flights lands, so most
+    requests can make some flight and a few are tight. Weights are
+    log-normal, mostly small parcels with the odd heavy shipment.
+    """
+    rng = random.Random(seed)
+    flights = schedule.flights
+    priorities = list(priority_mix)
+    mix = [priority_mix[priority] for priority in priorities]
+    cargo_list = []
+    for i in range(count):
+        # Picking a random flight weights routes by how often they are flown
+        flight = flights[rng.randrange(len(flights))]
+        slack = timedelta(hours=rng.expovariate(1 / mean_slack_hours))
+        cargo_list.append(Cargo(
+            cargo_id=f"SC{i:08d}",
+            weight=round(min(rng.lognormvariate(0.3, 0.8), flight.cargo_capacity), 2),
+            departure_airport=flight.departure_airport,
+            arrival_airport=flight.arrival_airport,
+            priority=rng.choices(priorities, mix)[0],
+            deadline=flight.arrival_time + slack
+        ))
+    schedule.cargo = cargo_list
+    return cargo_list
+
@@ -0,0 +1,398 @@
+import gc
+import multiprocessing
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Iterable, Optional, Set, Tuple
+
+from allocation import allocate_greedy
+from database import Flight, Cargo, validate_flight, validate_cargo, freeze_flight, freeze_cargo
+from importer import parse_flight, parse_cargo
+from incremental import Route, route_of
+from optimizer import cargo_value
+from rotations import assign_tails, fleet_report
+from slots import SlotIndex, hour_of
+
+Slot = Tuple[str, object]  # (airport, hour)
+
+
+class ScheduleSnapshot:
+    """The schedule state what-if scenarios fork from: flights, cargo, fleet, airports and allocation
+
+    Taking a snapshot copies references, not records, so it costs a list
+    and dict copy; the records are shared with the live schedule and must
+    not be modified. With frozen, the snapshot holds read-only copies of the
+    records instead (FrozenFlight, FrozenCargo), so an accidental write
+    raises rather than changing the live schedule, at the cost of a second
+    copy of every record. What evaluation derives from the base (flights and
+    cargo by route, flights by type, slot counts, rotations and totals) is
+    built once, on first use or by prepare(), and shared by every fork.
+    """
+
+    def __init__(self, flights: Iterable[Flight], cargo_requests: Iterable[Cargo], fleet: Dict[str, int],
+                 airports: Dict[str, int], allocation: Optional[Dict[str, List[Cargo]]] = None,
+                 frozen: bool = False):
+        if frozen:
+            flights = [freeze_flight(flight) for flight in flights]
+            frozen_cargo = {cargo.cargo_id: freeze_cargo(cargo) for cargo in cargo_requests}
+            cargo_requests = list(frozen_cargo.values())
+            if allocation is not None:
+                allocation = {number: [frozen_cargo.get(cargo.cargo_id) or freeze_cargo(cargo)
+                                       for cargo in cargo_list]
+                              for number, cargo_list in allocation.items()}
+        self.flights = flights
+        self.cargo_requests = cargo_requests
+        self.fleet = dict(fleet)
+        self.airports = dict(airports)
+        # flight_number -> cargo, as allocate_greedy gives it for these flights and cargo
+        self.allocation = allocation
+        self.prepared = False
+        self._lock = threading.Lock()
+
+    def prepare(self):
+        """Build the shared derived state now, e.g. before forking worker processes so they inherit it"""
+        with self._lock:
+            if self.prepared:
+                return
+            self.route_flights: Dict[Route, List[Flight]] = {}
+            self.type_flights: Dict[str, List[Flight]] = {}
+            self.flights_by_number: Dict[str, Flight] = {}
+            for flight in self.flights:
+                self.route_flights.setdefault(route_of(flight), []).append(flight)
+                self.type_flights.setdefault(flight.aircraft_type, []).append(flight)
+                self.flights_by_number[flight.flight_number] = flight
+            self.route_cargo: Dict[Route, List[Cargo]] = {}
+            self.cargo_by_id: Dict[str, Cargo] = {}
+            for cargo in self.cargo_requests:
+                self.route_cargo.setdefault(route_of(cargo), []).append(cargo)
+                self.cargo_by_id[cargo.cargo_id] = cargo
+            if self.allocation is None:
+                self.allocation = allocate_greedy(self.flights, self.cargo_requests)
+
+            self.slots: Dict[Slot, int] = dict(SlotIndex(self.flights).counts)
+            self.airport_slots: Dict[str, List[Slot]] = {}
+            for slot in self.slots:
+                self.airport_slots.setdefault(slot[0], []).append(slot)
+            self.congested: Set[Slot] = {slot for slot, count in self.slots.items()
+                                         if count > self.airports.get(slot[0], 0)}
+            self.required = assign_tails(self.flights).required_aircraft()
+            self.allocated_cargo = sum(len(cargo_list) for cargo_list in self.allocation.values())
+            self.allocated_weight = sum(cargo.weight for cargo_list in self.allocation.values()
+                                        for cargo in cargo_list)
+            self.objective = sum(cargo_value(cargo) for cargo_list in self.allocation.values()
+                                 for cargo in cargo_list)
+            self.prepared = True
+
+    def __getstate__(self):
+        # Pickled for worker processes that cannot be forked; locks cannot be
+        state = dict(self.__dict__)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def fork(self, name: str) -> "WhatIf":
+        """A new scenario on this snapshot, with no changes yet"""
+        return WhatIf(self, name)
+
+
+class WhatIf:
+    """A scenario forked from a ScheduleSnapshot, holding only its changes
+
+    Cancelled and added flights and cargo, and fleet and airport overrides,
+    are kept as an overlay on the shared base, so forking copies nothing
+    from it. Greedy allocation only moves cargo within a route, so
+    evaluate() reallocates just the routes the changes touch and takes
+    everything else from the base allocation; likewise it re-chains only
+    the aircraft types whose flights changed and rechecks only the slots
+    whose movements or capacity changed.
+    """
+
+    def __init__(self, snapshot: ScheduleSnapshot, name: str):
+        self.snapshot = snapshot
+        self.name = name
+        self.cancelled: Set[str] = set()
+        self.added_flights: Dict[str, Flight] = {}
+        self.withdrawn: Set[str] = set()
+        self.added_cargo: Dict[str, Cargo] = {}
+        self.fleet: Dict[str, int] = {}  # overrides of the snapshot's counts
+        self.airports: Dict[str, int] = {}
+        self.changes: List[str] = []
+
+    def fork(self, name: str) -> "WhatIf":
+        """A new scenario starting from this one's changes"""
+        fork = WhatIf(self.snapshot, name)
+        fork.cancelled = set(self.cancelled)
+        fork.added_flights = dict(self.added_flights)
+        fork.withdrawn = set(self.withdrawn)
+        fork.added_cargo = dict(self.added_cargo)
+        fork.fleet = dict(self.fleet)
+        fork.airports = dict(self.airports)
+        fork.changes = list(self.changes)
+        return fork
+
+    def _has_flight(self, flight_number: str) -> bool:
+        self.snapshot.prepare()
+        return flight_number in self.added_flights or (
+            flight_number in self.snapshot.flights_by_number and flight_number not in self.cancelled)
+
+    def _has_cargo(self, cargo_id: str) -> bool:
+        self.snapshot.prepare()
+        return cargo_id in self.added_cargo or (
+            cargo_id in self.snapshot.cargo_by_id and cargo_id not in self.withdrawn)
+
+    def cancel_flight(self, flight_number: str) -> "WhatIf":
+        if not self._has_flight(flight_number):
+            raise ValueError(f"Unknown flight {flight_number}")
+        if self.added_flights.pop(flight_number, None) is None:
+            self.cancelled.add(flight_number)
+        self.changes.append(f"cancel flight {flight_number}")
+        return self
+
+    def add_flight(self, flight: Flight) -> "WhatIf":
+        error = validate_flight(flight)
+        if error is None and self._has_flight(flight.flight_number):
+            error = f"duplicate flight number {flight.flight_number}"
+        if error:
+            raise ValueError(error)
+        self.added_flights[flight.flight_number] = flight
+        self.changes.append(f"add flight {flight.flight_number}")
+        return self
+
+    def withdraw_cargo(self, cargo_id: str) -> "WhatIf":
+        if not self._has_cargo(cargo_id):
+            raise ValueError(f"Unknown cargo {cargo_id}")
+        if self.added_cargo.pop(cargo_id, None) is None:
+            self.withdrawn.add(cargo_id)
+        self.changes.append(f"withdraw cargo {cargo_id}")
+        return self
+
+    def add_cargo(self, cargo: Cargo) -> "WhatIf":
+        error = validate_cargo(cargo)
+        if error is None and self._has_cargo(cargo.cargo_id):
+            error = f"duplicate cargo ID {cargo.cargo_id}"
+        if error:
+            raise ValueError(error)
+        self.added_cargo[cargo.cargo_id] = cargo
+        self.changes.append(f"add cargo {cargo.cargo_id}")
+        return self
+
+    def set_fleet(self, aircraft_type: str, count: int) -> "WhatIf":
+        if count < 0:
+            raise ValueError(f"Negative fleet count for {aircraft_type}")
+        self.fleet[aircraft_type] = count
+        self.changes.append(f"fleet {aircraft_type} = {count}")
+        return self
+
+    def add_aircraft(self, aircraft_type: str, count: int = 1) -> "WhatIf":
+        return self.set_fleet(aircraft_type, self.fleet_data().get(aircraft_type, 0) + count)
+
+    def set_airport_capacity(self, airport: str, capacity: int) -> "WhatIf":
+        if capacity < 0:
+            raise ValueError(f"Negative capacity for {airport}")
+        self.airports[airport] = capacity
+        self.changes.append(f"capacity {airport} = {capacity}")
+        return self
+
+    def apply(self, changes: Dict) -> "WhatIf":
+        """Apply changes given as JSON, e.g. {"cancel_flights": ["AI101"], "add_aircraft": {"Boeing 777": 3}}
+
+        Keys: cancel_flights, add_flights (flight rows as the importer reads
+        them), withdraw_cargo, add_cargo (cargo rows), fleet and airports
+        (counts to set) and add_aircraft (counts to add).
+        """
+        for flight_number in changes.get("cancel_flights", ()):
+            self.cancel_flight(str(flight_number))
+        for row in changes.get("add_flights", ()):
+            self.add_flight(parse_flight(row))
+        for cargo_id in changes.get("withdraw_cargo", ()):
+            self.withdraw_cargo(str(cargo_id))
+        for row in changes.get("add_cargo", ()):
+            self.add_cargo(parse_cargo(row))
+        for aircraft_type, count in changes.get("fleet", {}).items():
+            self.set_fleet(aircraft_type, int(count))
+        for aircraft_type, count in changes.get("add_aircraft", {}).items():
+            self.add_aircraft(aircraft_type, int(count))
+        for airport, capacity in changes.get("airports", {}).items():
+            self.set_airport_capacity(airport, int(capacity))
+        return self
+
+    def fleet_data(self) -> Dict[str, int]:
+        return {**self.snapshot.fleet, **self.fleet}
+
+    def airport_data(self) -> Dict[str, int]:
+        return {**self.snapshot.airports, **self.airports}
+
+    def flights(self) -> List[Flight]:
+        """The scenario's flights: the base's in order without the cancelled ones, then the added ones"""
+        cancelled = self.cancelled
+        return [flight for flight in self.snapshot.flights if flight.flight_number not in cancelled] + \
+            list(self.added_flights.values())
+
+    def cargo_requests(self) -> List[Cargo]:
+        """The scenario's cargo requests, ordered like flights()"""
+        withdrawn = self.withdrawn
+        return [cargo for cargo in self.snapshot.cargo_requests if cargo.cargo_id not in withdrawn] + \
+            list(self.added_cargo.values())
+
+    def _touched_routes(self) -> Set[Route]:
+        base = self.snapshot
+        routes = {route_of(base.flights_by_number[number]) for number in self.cancelled}
+        routes.update(route_of(flight) for flight in self.added_flights.values())
+        routes.update(route_of(base.cargo_by_id[cargo_id]) for cargo_id in self.withdrawn)
+        routes.update(route_of(cargo) for cargo in self.added_cargo.values())
+        return routes
+
+    def _reallocate(self, routes: Set[Route]) -> Dict[str, List[Cargo]]:
+        """Greedy loads of the flights on routes, with this scenario's flights and cargo"""
+        base = self.snapshot
+        cancelled, withdrawn = self.cancelled, self.withdrawn
+        loads = {}
+        for route in routes:
+            flights = [flight for flight in base.route_flights.get(route, ())
+                       if flight.flight_number not in cancelled]
+            flights += [flight for flight in self.added_flights.values() if route_of(flight) == route]
+            if not flights:
+                continue
+            cargo_list = [cargo for cargo in base.route_cargo.get(route, ()) if cargo.cargo_id not in withdrawn]
+            cargo_list += [cargo for cargo in self.added_cargo.values() if route_of(cargo) == route]
+            loads.update(allocate_greedy(flights, cargo_list))
+        return loads
+
+    def allocation(self) -> Dict[str, List[Cargo]]:
+        """flight_number -> cargo for every flight, as allocate_greedy would give for this scenario"""
+        self.snapshot.prepare()
+        loads = self._reallocate(self._touched_routes())
+        base = self.snapshot.allocation
+        return {flight.flight_number: loads[flight.flight_number] if flight.flight_number in loads
+                else base[flight.flight_number] for flight in self.flights()}
+
+    def evaluate(self) -> Dict:
+        """The scenario's outcome, against the snapshot's, as a JSON-serialisable dict"""
+        started = time.perf_counter()
+        base = self.snapshot
+        base.prepare()
+
+        # Allocation totals are the base's with the touched routes' loads swapped for new ones
+        routes = self._touched_routes()
+        loads = self._reallocate(routes)
+        replaced = [base.allocation[flight.flight_number] for route in routes
+                    for flight in base.route_flights.get(route, ())]
+        allocated_cargo = base.allocated_cargo + sum(len(cargo_list) for cargo_list in loads.values()) - \
+            sum(len(cargo_list) for cargo_list in replaced)
+        allocated_weight = base.allocated_weight + _weight(loads.values()) - _weight(replaced)
+        objective = base.objective + _value(loads.values()) - _value(replaced)
+
+        # Rotations, for the aircraft types whose flights changed
+        required = dict(base.required)
+        cancelled = self.cancelled
+        changed_types = {base.flights_by_number[number].aircraft_type for number in cancelled}
+        changed_types.update(flight.aircraft_type for flight in self.added_flights.values())
+        for aircraft_type in changed_types:
+            flights = [flight for flight in base.type_flights.get(aircraft_type, ())
+                       if flight.flight_number not in cancelled]
+            flights += [flight for flight in self.added_flights.values() if flight.aircraft_type == aircraft_type]
+            required[aircraft_type] = len(assign_tails(flights).rotations.get(aircraft_type, ()))
+            if not required[aircraft_type]:
+                del required[aircraft_type]
+        aircraft = fleet_report(required, self.fleet_data())
+
+        # Slot congestion, rechecking the slots whose movements or capacity changed
+        movements = Counter()
+        for number in cancelled:
+            movements.subtract(_slots(base.flights_by_number[number]))
+        for flight in self.added_flights.values():
+            movements.update(_slots(flight))
+        recheck = set(movements)
+        for airport in self.airports:
+            recheck.update(base.airport_slots.get(airport, ()))
+        capacities = self.airport_data()
+        congested = len(base.congested - recheck) + sum(
+            1 for slot in recheck if base.slots.get(slot, 0) + movements[slot] > capacities.get(slot[0], 0))
+
+        flights = len(base.flights) - len(cancelled) + len(self.added_flights)
+        cargo = len(base.cargo_requests) - len(self.withdrawn) + len(self.added_cargo)
+        return {
+            "scenario": self.name,
+            "changes": list(self.changes),
+            "flights": flights,
+            "cargo": cargo,
+            "allocated_cargo": allocated_cargo,
+            "unallocated_cargo": cargo - allocated_cargo,
+            "allocated_weight": allocated_weight,
+            "objective": objective,
+            "objective_change": objective - base.objective,
+            "aircraft": aircraft,
+            "aircraft_short": {aircraft_type: counts["required"] - counts["fleet"]
+                               for aircraft_type, counts in aircraft.items() if counts["required"] > counts["fleet"]},
+            "congested_slots": congested,
+            "routes_reallocated": len(routes),
+            "evaluate_time": time.perf_counter() - started,
+        }
+
+
+def _slots(flight) -> Tuple[Slot, Slot]:
+    return ((flight.departure_airport, hour_of(flight.departure_time)),
+            (flight.arrival_airport, hour_of(flight.arrival_time)))
+
+
+def _weight(loads: Iterable[List[Cargo]]) -> float:
+    return sum(cargo.weight for cargo_list in loads for cargo in cargo_list)
+
+
+def _value(loads: Iterable[List[Cargo]]) -> float:
+    return sum(cargo_value(cargo) for cargo_list in loads for cargo in cargo_list)
+
+
+# The scenarios a worker process evaluates, set when it starts (see evaluate_all)
+_scenarios: List[WhatIf] = []
+
+
+def _set_scenarios(scenarios: List[WhatIf]):
+    global _scenarios
+    _scenarios = scenarios
+
+
+def _evaluate(index: int) -> Dict:
+    return _scenarios[index].evaluate()
+
+
+def evaluate_all(scenarios: Iterable[WhatIf], workers: int = 1) -> List[Dict]:
+    """Evaluate scenarios side by side, in that many worker processes, returning results in order
+
+    Each snapshot is prepared first. Where processes can be forked the
+    workers inherit the scenarios and their snapshots from this process, so
+    the base data is shared copy-on-write instead of pickled (elsewhere it is
+    pickled once per worker); only the small results come back.
+    """
+    scenarios = list(scenarios)
+    for snapshot in {id(scenario.snapshot): scenario.snapshot for scenario in scenarios}.values():
+        snapshot.prepare()
+    if workers <= 1 or len(scenarios) <= 1:
+        return [scenario.evaluate() for scenario in scenarios]
+
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+    # Frozen objects are left alone by the children's garbage collector,
+    # which would otherwise write to (and so copy) every page it scans
+    gc.freeze()
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(scenarios)), mp_context=context,
+                                 initializer=_set_scenarios, initargs=(scenarios,)) as pool:
+            return list(pool.map(_evaluate, range(len(scenarios))))
+    finally:
+        gc.unfreeze()
+
+
+def comparison_table(results: List[Dict]) -> str:
+    """evaluate() results side by side, one row per scenario"""
+    lines = [f"{'scenario':<30} {'flights':>8} {'cargo':>8} {'allocated':>10} {'objective':>12} "
+             f"{'change':>10} {'congested':>10}  aircraft short"]
+    for result in results:
+        short = ", ".join(f"{aircraft_type} {count}" for aircraft_type, count in result["aircraft_short"].items())
+        lines.append(f"{result['scenario']:<30} {result['flights']:>8} {result['cargo']:>8} "
+                     f"{result['allocated_cargo']:>10} {result['objective']:>12.1f} "
+                     f"{result['objective_change']:>+10.1f} {result['congested_slots']:>10}  {short or '-'}")
+    return "\n".join(lines)
@@ -0,0 +1,134 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+import profiling
+
+
+class Job:
+    """A unit of background work, with cooperative cancellation and progress reporting"""
+
+    def __init__(self, worker: "BackgroundWorker", key: Optional[str], name: str):
+        self.worker = worker
+        self.key = key
+        self.name = name  # for metrics: worker.<name>.queued / .run, ui.<name>
+        self.cancelled = threading.Event()
+        self.future = None
+
+    def cancel(self):
+        """Drop this job's result; it is skipped entirely if it has not started"""
+        self.cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def report_progress(self, message: str):
+        """Show a progress message in the UI (callable from the worker thread)"""
+        if not self.cancelled.is_set():
+            self.worker.results.put((self.worker.on_progress, (message,)))
+
+
+class BackgroundWorker:
+    """Runs blocking calls off the Tk main loop and hands results back to it
+
+    Jobs run one at a time on the worker's own thread. The GUI has two
+    workers: one for the expert system, and one that only pages the lists
+    through the storage backend, whose methods are safe to call from several
+    threads (see StorageBackend). Results travel back
+    through a queue that the UI drains every poll_ms via schedule (normally
+    root.after), so callbacks always run on the UI thread.
+
+    Submitting a job with the same key as an earlier one supersedes it: the
+    earlier job is cancelled if still queued, or its result is discarded if
+    it is already running.
+    """
+
+    def __init__(self, schedule: Callable, poll_ms: int = 20,
+                 on_progress: Callable[[str], None] = lambda message: None,
+                 on_busy: Callable[[bool], None] = lambda busy: None):
+        self.schedule = schedule
+        self.poll_ms = poll_ms
+        self.on_progress = on_progress
+        self.on_busy = on_busy
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scheduler-worker")
+        self.results = queue.Queue()
+        self.latest: Dict[str, Job] = {}
+        self.pending = 0
+        self.closed = False
+        self.schedule(self.poll_ms, self._drain)
+
+    def submit(self, func: Callable, *args, on_done: Callable = None, on_error: Callable = None,
+               key: Optional[str] = None, message: Optional[str] = None, pass_job: bool = False) -> Job:
+        """Run func(*args) in the background, then on_done(result) or on_error(exception) in the UI
+
+        With pass_job, func also receives the Job as its first argument so it
+        can report progress and check job.cancelled.
+        """
+        name = getattr(func, "__name__", "job")
+        name = f"{key}.{name}" if key else name
+        job = Job(self, key, name)
+        if key is not None:
+            previous = self.latest.get(key)
+            if previous is not None:
+                previous.cancel()
+            self.latest[key] = job
+        if message:
+            self.on_progress(message)
+        self.pending += 1
+        self.on_busy(True)
+
+        submitted = time.perf_counter()
+
+        def run():
+            if job.cancelled.is_set():
+                self.results.put((self._finish, (job, None, None)))
+                return
+            profiling.observe(f"worker.{name}.queued", time.perf_counter() - submitted)
+            try:
+                with profiling.timer(f"worker.{name}.run"):
+                    result = func(job, *args) if pass_job else func(*args)
+            except Exception as e:
+                if on_error is None:
+                    print(f"Error in background job: {e}")
+                self.results.put((self._finish, (job, on_error, e)))
+            else:
+                self.results.put((self._finish, (job, on_done, result)))
+
+        def skipped(future):
+            # Cancelled before it started, so run() never reports back
+            if future.cancelled():
+                self.results.put((self._finish, (job, None, None)))
+
+        job.future = self.executor.submit(run)
+        job.future.add_done_callback(skipped)
+        return job
+
+    def _finish(self, job: Job, callback: Optional[Callable], value):
+        self.pending -= 1
+        if self.latest.get(job.key) is job:
+            del self.latest[job.key]
+        if not self.pending:
+            self.on_busy(False)
+        if callback is not None and not job.cancelled.is_set():
+            # Time spent back on the UI thread, e.g. redrawing with the result
+            with profiling.timer(f"ui.{job.name}"):
+                callback(value)
+
+    def _drain(self):
+        # Runs on the UI thread; never blocks
+        while True:
+            try:
+                callback, args = self.results.get_nowait()
+            except queue.Empty:
+                break
+            callback(*args)
+        if not self.closed:
+            self.schedule(self.poll_ms, self._drain)
+
+    def shutdown(self):
+        """Cancel queued jobs and stop polling"""
+        self.closed = True
+        for job in list(self.latest.values()):
+            job.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)